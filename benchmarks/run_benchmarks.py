@@ -0,0 +1,316 @@
+"""Headless benchmarks for the editor's hot paths.
+
+Drives EZCode and CodeEditor on the offscreen Qt platform over generated 1k, 10k and
+100k-line files and writes the timings to JSON:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline baseline.json   # exits 1 on a regression
+    python benchmarks/run_benchmarks.py --output baseline.json     # record a new baseline
+
+Every metric is reported as median, p95 and min over its samples; a metric regresses
+when its median is worse than the baseline's by more than ``--tolerance``. Baselines are
+machine-specific: record one on the machine that will compare against it.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import shutil
+import tempfile
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def generate_source(lines):
+    """Python-looking source of about ``lines`` lines: classes, methods, keywords and comments."""
+    out = []
+    number = 0
+    while len(out) < lines:
+        out.extend([
+            f"class Model{number}(Base):",
+            f'    """Generated model {number}."""',
+            "",
+            f"    def method_{number}(self, value, items=None):",
+            "        # Walk the items and keep the matching ones",
+            "        result = []",
+            "        for item in items or []:",
+            "            if item.key == value:",
+            "                result.append(item)",
+            "            elif item.parent is not None:",
+            "                result.extend(self.lookup(item.parent))",
+            "            else:",
+            "                continue",
+            "        try:",
+            f"            return sorted(result, key=lambda entry: entry.rank * {number})",
+            "        except TypeError:",
+            "            return result",
+            "",
+        ])
+        number += 1
+    return '\n'.join(out[:lines]) + '\n'
+
+
+def summarize(samples, unit='s', higher_is_better=False):
+    ordered = sorted(samples)
+    return {
+        'median': statistics.median(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        'min': ordered[0],
+        'samples': len(ordered),
+        'unit': unit,
+        'higher_is_better': higher_is_better,
+    }
+
+
+class Benchmarks:
+    def __init__(self, app, window, workdir, repeat):
+        self.app = app
+        self.window = window
+        self.workdir = workdir
+        self.repeat = repeat
+        self.results = {}
+
+    def settle(self):
+        # Let queued work (the highlighter's first pass, deferred layout) run, then paint
+        self.app.processEvents()
+        self.window.editor.viewport().repaint()
+
+    def source_file(self, lines):
+        path = os.path.join(self.workdir, f"generated_{lines}.py")
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(generate_source(lines))
+        return path
+
+    def bench_open(self, lines):
+        # open_file only adds a file dialog in front of load_file
+        path = self.source_file(lines)
+        samples = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            self.window.load_file(path)
+            self.settle()
+            samples.append(time.perf_counter() - start)
+            self.window.close_tab(self.window.tab_index(self.window.find_document(path)))
+            self.settle()
+        self.results[f"open/{lines}"] = summarize(samples)
+
+    def bench_highlight(self, lines):
+        from PyQt5.QtGui import QTextDocument
+        from PyQt5.QtWidgets import QPlainTextDocumentLayout
+        from editor.highlighter import SyntaxHighlighter
+        text = generate_source(lines)
+        samples = []
+        for _ in range(self.repeat):
+            document = QTextDocument()
+            document.setDocumentLayout(QPlainTextDocumentLayout(document))
+            document.setPlainText(text)
+            highlighter = SyntaxHighlighter(document)
+            start = time.perf_counter()
+            highlighter.rehighlight()
+            samples.append(time.perf_counter() - start)
+        self.results[f"highlight/{lines}"] = summarize(samples)
+
+    def bench_keystroke(self, lines, keystrokes=60):
+        from PyQt5.QtGui import QTextCursor
+        from PyQt5.QtTest import QTest
+        editor = self.window.editor
+        path = self.source_file(lines)
+        self.window.load_file(path)
+        self.settle()
+        cursor = editor.textCursor()
+        cursor.setPosition(editor.document().findBlockByNumber(lines // 2).position())
+        cursor.movePosition(QTextCursor.EndOfBlock)
+        editor.setTextCursor(cursor)
+        editor.centerCursor()
+        self.settle()
+        samples = []
+        for index in range(keystrokes):
+            start = time.perf_counter()
+            QTest.keyClick(editor, 'x' if index % 8 else ' ')
+            editor.viewport().repaint()
+            editor.line_number_area.repaint()
+            samples.append(time.perf_counter() - start)
+        self.results[f"keystroke_to_repaint/{lines}"] = summarize(samples)
+        editor.document().setModified(False)
+        self.window.close_tab(self.window.tab_index(self.window.find_document(path)))
+        self.settle()
+
+    def bench_scroll(self, lines, frames=120):
+        editor = self.window.editor
+        path = self.source_file(lines)
+        self.window.load_file(path)
+        self.settle()
+        gutter = []
+        paint = editor.line_number_area_paint_event
+
+        def timed_paint(event):
+            start = time.perf_counter()
+            paint(event)
+            gutter.append(time.perf_counter() - start)
+
+        editor.line_number_area_paint_event = timed_paint
+        scroll_bar = editor.verticalScrollBar()
+        step = max(1, scroll_bar.maximum() // frames)
+        samples = []
+        try:
+            for frame in range(frames):
+                start = time.perf_counter()
+                scroll_bar.setValue((frame * step) % (scroll_bar.maximum() + 1))
+                editor.viewport().repaint()
+                editor.line_number_area.repaint()
+                samples.append(time.perf_counter() - start)
+        finally:
+            del editor.line_number_area_paint_event
+        self.results[f"scroll_frame/{lines}"] = summarize(samples)
+        if gutter:
+            self.results[f"scroll_gutter_paint/{lines}"] = summarize(gutter)
+        self.window.close_tab(self.window.tab_index(self.window.find_document(path)))
+        self.settle()
+
+    def bench_theme_switch(self, lines):
+        editor = self.window.editor
+        path = self.source_file(lines)
+        self.window.load_file(path)
+        self.settle()
+        samples = []
+        for index in range(self.repeat * 2):
+            start = time.perf_counter()
+            self.window.apply_theme('Dark' if index % 2 == 0 else 'Light')
+            editor.viewport().repaint()
+            samples.append(time.perf_counter() - start)
+            while editor.highlighter.stale:  # The off-screen lines restyle in the background
+                self.app.processEvents()
+        self.results[f"theme_switch/{lines}"] = summarize(samples)
+        self.window.close_tab(self.window.tab_index(self.window.find_document(path)))
+        self.settle()
+
+    def bench_output(self, megabytes=4, chunk_lines=64):
+        from utils.traceback_parser import TracebackParser
+        line = "step 12345: loss=0.123456 accuracy=0.987654 elapsed=1.234s\n"
+        chunk = line * chunk_lines
+        chunks = max(1, megabytes * 1024 * 1024 // len(chunk))
+        samples = []
+        for _ in range(self.repeat):
+            self.window.output.clear()
+            self.window.traceback_parser = TracebackParser({})
+            start = time.perf_counter()
+            for _chunk in range(chunks):
+                self.window.handle_run_stdout(chunk)
+            self.app.processEvents()
+            samples.append(chunks * len(chunk) / (time.perf_counter() - start) / (1024 * 1024))
+        self.window.output.clear()
+        self.results["output_throughput"] = summarize(samples, unit='MB/s', higher_is_better=True)
+
+    def bench_quick_switcher(self, files=5000, per_directory=50):
+        from ui.ezcode_window import QuickFileSwitcher
+        root = os.path.join(self.workdir, 'tree')
+        if not os.path.exists(root):
+            for index in range(files):
+                directory = os.path.join(root, f"package_{index // per_directory // 10}", f"module_{index // per_directory}")
+                os.makedirs(directory, exist_ok=True)
+                open(os.path.join(directory, f"file_{index}.py"), 'w').close()
+        samples = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            dialog = QuickFileSwitcher(self.window, root)
+            samples.append(time.perf_counter() - start)
+            dialog.deleteLater()
+        self.app.processEvents()
+        self.results[f"quick_switcher/{files}_files"] = summarize(samples)
+
+
+def compare(results, baseline, tolerance):
+    """Prints current vs baseline medians; returns the names of the metrics that regressed."""
+    regressions = []
+    print(f"{'metric':40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:40} {'-':>12} {current['median']:>12.4g} {'new':>8}")
+            continue
+        change = current['median'] / previous['median'] - 1 if previous['median'] else 0.0
+        worse = -change if current['higher_is_better'] else change
+        flag = '  REGRESSION' if worse > tolerance else ''
+        print(f"{name:40} {previous['median']:>12.4g} {current['median']:>12.4g} {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='EZap editor benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='generated file sizes in lines (default: 1000 10000 100000)')
+    parser.add_argument('--repeat', type=int, default=5, help='samples per timing (default: 5)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this results file; exit 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown of a median before it counts as a regression (default: 0.25)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    workdir = tempfile.mkdtemp(prefix='ezap-bench-')
+    # Keep indexes, caches and the session out of the user's data directory
+    os.environ['EZAP_DATA_DIR'] = os.path.join(workdir, 'data')
+
+    from PyQt5.QtCore import QT_VERSION_STR
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication([sys.argv[0]])
+    from ui.ezcode_window import EZCode
+    from utils.background import shutdown_background_tasks
+
+    window = EZCode(workdir)  # Rooted in the scratch directory, so nothing outside it is indexed or watched
+    window.resize(1100, 850)
+    window.show()
+    app.processEvents()
+    benchmarks = Benchmarks(app, window, workdir, args.repeat)
+    for lines in args.sizes:
+        print(f"{lines} lines...", flush=True)
+        benchmarks.bench_open(lines)
+        benchmarks.bench_highlight(lines)
+        benchmarks.bench_keystroke(lines)
+        benchmarks.bench_scroll(lines)
+        benchmarks.bench_theme_switch(lines)
+    print("output console and quick switcher...", flush=True)
+    benchmarks.bench_output()
+    benchmarks.bench_quick_switcher()
+    window.runner.cancel_all()
+    window.symbol_index.close()
+    shutdown_background_tasks()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'qt': QT_VERSION_STR,
+            'platform': platform.platform(),
+            'sizes': args.sizes,
+            'repeat': args.repeat,
+        },
+        'results': benchmarks.results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(benchmarks.results, json.load(file)['results'], args.tolerance)
+    else:
+        for name, result in sorted(benchmarks.results.items()):
+            print(f"{name:40} median {result['median']:.4g} {result['unit']}  p95 {result['p95']:.4g}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
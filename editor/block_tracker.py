@@ -0,0 +1,90 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+def utf16_len(text):
+    """Length of ``text`` in UTF-16 code units, the units of Qt's document positions."""
+    return len(text) if text.isascii() else len(text.encode('utf-16-le', 'surrogatepass')) // 2
+
+
+def utf16_index(text, units):
+    """Index into ``text`` of the character that starts ``units`` UTF-16 code units in."""
+    if text.isascii():
+        return units
+    return len(text.encode('utf-16-le', 'surrogatepass')[:2 * units].decode('utf-16-le', 'surrogatepass'))
+
+
+class BlockTracker(QObject):
+    """Keeps a list mirror of the document's lines and reports every edit incrementally.
+
+    ``lines_changed(first, old, new)`` says that lines ``first .. first + len(old) - 1``
+    were replaced by ``new``; ``text_changed(position, removed, inserted)`` gives the same
+    edit as a character splice. Like Qt's, the position counts UTF-16 code units, so it
+    differs from a Python string index once a character outside the BMP (an emoji)
+    precedes it. Both are computed from the blocks touched by the edit only, so the cost
+    per keystroke does not depend on the document size.
+    """
+    lines_changed = pyqtSignal(int, object, object)  # first line, old lines, new lines
+    text_changed = pyqtSignal(int, str, str)  # position, removed text, inserted text
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.lines = []
+        self.resync()
+        document.contentsChange.connect(self.on_contents_change)
+
+    def resync(self):
+        old = self.lines
+        self.lines = self.block_texts(self.document.firstBlock(), self.document.blockCount())
+        if old != self.lines:
+            self.lines_changed.emit(0, old, self.lines)
+            self.text_changed.emit(0, '\n'.join(old), '\n'.join(self.lines))
+
+    @staticmethod
+    def block_texts(block, count):
+        texts = []
+        while block.isValid() and len(texts) < count:
+            texts.append(block.text())
+            block = block.next()
+        return texts
+
+    def line_count(self):
+        return len(self.lines)
+
+    def on_contents_change(self, position, removed, added):
+        document = self.document
+        delta = document.blockCount() - len(self.lines)
+        first_block = document.findBlock(position)
+        if not first_block.isValid():
+            first_block = document.lastBlock()
+        first = first_block.blockNumber()
+        end_block = document.findBlock(position + added)
+        last = end_block.blockNumber() if end_block.isValid() else document.blockCount() - 1
+        old_last = last - delta
+        if old_last < first or old_last >= len(self.lines):
+            # Qt occasionally reports ranges that include the final paragraph separator
+            self.resync()
+            return
+        old = self.lines[first:old_last + 1]
+        new = self.block_texts(first_block, last - first + 1)
+        if old == new:
+            return  # Formatting-only change
+        self.lines[first:old_last + 1] = new
+
+        old_text = '\n'.join(old)
+        new_text = '\n'.join(new)
+        # Qt counts UTF-16 code units; the block text turns them into string indices
+        offset = utf16_index(new_text, position - first_block.position())
+        end = utf16_index(new_text, position - first_block.position() + added)
+        # Trim to the actual splice; fall back to the common suffix if Qt's counts don't fit
+        tail = len(new_text) - end
+        if tail < 0 or tail > len(old_text) - offset or old_text[len(old_text) - tail:] != new_text[len(new_text) - tail:]:
+            tail = 0
+            limit = min(len(old_text), len(new_text)) - offset
+            while tail < limit and old_text[-1 - tail] == new_text[-1 - tail]:
+                tail += 1
+        removed_text = old_text[offset:len(old_text) - tail]
+        inserted_text = new_text[offset:len(new_text) - tail]
+
+        self.lines_changed.emit(first, old, new)
+        self.text_changed.emit(position, removed_text, inserted_text)
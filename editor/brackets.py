@@ -0,0 +1,357 @@
+import re
+from bisect import bisect_right
+from itertools import accumulate
+from PyQt5.QtGui import QTextBlockUserData
+
+OPENERS = {'(': ')', '[': ']', '{': '}'}
+CLOSERS = {')': '(', ']': '[', '}': '{'}
+QUOTE_STATES = {None: 0, "'''": 1, '"""': 2}
+STATE_QUOTES = {state: quote for quote, state in QUOTE_STATES.items()}
+TOKEN_PATTERN = re.compile(r"""\\.|'''|\"\"\"|['"#()\[\]{}]""")
+ANY_TOKEN = re.compile(r"""[\\'"#()\[\]{}]""")
+QUOTE_OR_COMMENT = re.compile(r"""[\\'"#]""")
+BRACKET_PATTERN = re.compile(r"[()\[\]{}]")
+CHUNK = 64  # Lines per chunk of summaries (chunks hold CHUNK / 2 .. 2 * CHUNK)
+GROUP = 32  # Chunks per group
+
+
+def scan_brackets(text, state=0):
+    """Brackets of one line outside strings and comments: ([(column, char)], state at the line's end).
+
+    ``state`` says whether the line starts inside a triple-quoted string (see QUOTE_STATES).
+    """
+    if not state:
+        # Most lines hold no strings or comments, and many no brackets either
+        if not ANY_TOKEN.search(text):
+            return [], 0
+        if not QUOTE_OR_COMMENT.search(text):
+            return [(match.start(), match.group()) for match in BRACKET_PATTERN.finditer(text)], 0
+    brackets = []
+    quote = STATE_QUOTES.get(state)
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if quote is not None:
+            if token == quote:
+                quote = None
+            continue
+        if token == '#':
+            break
+        if token in OPENERS or token in CLOSERS:
+            brackets.append((match.start(), token))
+        elif token[0] in '\'"':
+            quote = token
+    return brackets, QUOTE_STATES.get(quote, 0)  # A one-line string ends with its line
+
+
+def summarize(brackets):
+    """(net, low, rise) of a run of brackets, counting openers +1 and closers -1.
+
+    ``low`` is the lowest running depth from the start (at most 0) and ``rise`` the highest
+    depth reached counting back from the end (at least 0): a forward search at depth d has
+    its closer in the run if ``low < -d``, a backward search its opener if ``rise > d``.
+    """
+    depth = low = 0
+    for _column, char in brackets:
+        depth += 1 if char in OPENERS else -1
+        low = min(low, depth)
+    rise = depth - low  # The deepest suffix starts right after the lowest point
+    return depth, low, max(rise, 0)
+
+
+def combine(first, second):
+    net1, low1, rise1 = first
+    net2, low2, rise2 = second
+    return net1 + net2, min(low1, net1 + low2), max(rise2, rise1 + net2)
+
+
+EMPTY = (0, 0, 0)
+
+
+class BlockBrackets(QTextBlockUserData):
+    """A block's brackets outside strings and comments, with their summary, set by the highlighter."""
+
+    def __init__(self, brackets):
+        super().__init__()
+        self.brackets = brackets
+        self.summary = summarize(brackets)
+
+
+def block_brackets(block):
+    data = block.userData()
+    return data if isinstance(data, BlockBrackets) else None
+
+
+def block_summary(block):
+    data = block_brackets(block)
+    return data.summary if data is not None else EMPTY
+
+
+class BracketIndex:
+    """Matching brackets and enclosing bracket pairs of a document, from the highlighter's per-block data.
+
+    Each block carries its brackets (BlockBrackets) and a (net, low, rise) depth summary.
+    The summaries are also kept per line in chunks of about CHUNK lines, with a combined
+    summary per chunk and per GROUP of chunks, so a search steps over a group, chunk or
+    line that cannot hold the match with one comparison: a match anywhere in a 100k-line
+    file costs at most a few hundred comparisons. Inserting or removing lines splices one
+    chunk; a block whose brackets changed updates one entry; plain typing changes nothing.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.initial = []  # Summaries collected during the first highlighting pass
+        self.chunks = None  # [[summary per line]], built from ``initial`` by ``build()``
+        self.chunk_sums = []  # Summary per chunk, None to recompute
+        self.group_sums = []  # Summary per GROUP of chunks, None to recompute
+        self.starts = None  # First line of each chunk, rebuilt after splices
+        self.pending = []  # Blocks re-highlighted with new summaries, not yet in the chunks
+
+    def set_block(self, highlighter, text):
+        """Called from highlightBlock: scans the current block and stores its brackets."""
+        brackets, state = scan_brackets(text, max(highlighter.previousBlockState(), 0))
+        old = highlighter.currentBlockUserData()
+        if brackets:
+            data = BlockBrackets(brackets)
+            highlighter.setCurrentBlockUserData(data)
+            summary = data.summary
+        else:
+            if old is not None:
+                highlighter.setCurrentBlockUserData(None)  # Blocks without brackets carry no data
+            summary = EMPTY
+        highlighter.setCurrentBlockState(state)
+        if self.chunks is None:
+            self.initial.append(summary)  # The first pass runs over the blocks in order
+        elif (old.summary if old is not None else EMPTY) != summary:
+            self.pending.append(highlighter.currentBlock())
+
+    # Per-line summaries
+
+    def build(self):
+        """Called once the first highlighting pass is done."""
+        if len(self.initial) != self.document.blockCount():
+            self.initial = [block_summary(block) for block in self.blocks_from(self.document.firstBlock())]
+        self.chunks = [self.initial[start:start + CHUNK] for start in range(0, len(self.initial), CHUNK)] or [[]]
+        self.initial = None
+        self.chunk_sums = [None] * len(self.chunks)
+        self.group_sums = []
+        self.starts = None
+
+    @staticmethod
+    def blocks_from(block, count=None):
+        while block.isValid() and count != 0:
+            yield block
+            block = block.next()
+            if count is not None:
+                count -= 1
+
+    def chunk_of(self, line):
+        """(chunk index, offset in it) of ``line``."""
+        if self.starts is None:
+            self.starts = list(accumulate((len(chunk) for chunk in self.chunks[:-1]), initial=0))
+        index = bisect_right(self.starts, line) - 1
+        return index, line - self.starts[index]
+
+    def set_line(self, line, summary):
+        index, offset = self.chunk_of(line)
+        chunk = self.chunks[index]
+        if offset < len(chunk) and chunk[offset] != summary:
+            chunk[offset] = summary
+            self.chunk_sums[index] = None
+            if index // GROUP < len(self.group_sums):
+                self.group_sums[index // GROUP] = None
+
+    def on_lines_changed(self, first, old, new):
+        # The edited blocks were highlighted before this signal, so their data is current
+        new_summaries = [block_summary(block) for block in
+                         self.blocks_from(self.document.findBlockByNumber(first), len(new))]
+        if len(old) == len(new):
+            for line, summary in enumerate(new_summaries, first):
+                self.set_line(line, summary)
+            self.flush_pending()
+            return
+        index, offset = self.chunk_of(first)
+        last_index, end = index, offset + len(old)
+        while end > len(self.chunks[last_index]) and last_index + 1 < len(self.chunks):
+            end -= len(self.chunks[last_index])
+            last_index += 1
+        merged = self.chunks[index][:offset] + new_summaries + self.chunks[last_index][end:]
+        if len(merged) < CHUNK // 2 and last_index + 1 < len(self.chunks):
+            last_index += 1
+            merged += self.chunks[last_index]
+        pieces = [merged[start:start + CHUNK] for start in range(0, len(merged), CHUNK)] \
+            if len(merged) > 2 * CHUNK else [merged]
+        if not pieces[0] and len(self.chunks) > 1:
+            pieces = []
+        self.chunks[index:last_index + 1] = pieces
+        self.chunk_sums[index:last_index + 1] = [None] * len(pieces)
+        if len(pieces) == last_index + 1 - index:
+            if index // GROUP < len(self.group_sums):
+                self.group_sums[index // GROUP] = None
+        else:
+            del self.group_sums[index // GROUP:]  # Chunks below moved to other groups
+        self.starts = None
+        self.flush_pending()
+
+    def flush_pending(self):
+        pending, self.pending = self.pending, []
+        for block in pending:
+            if block.isValid():
+                self.set_line(block.blockNumber(), block_summary(block))
+
+    def chunk_summary(self, index):
+        summary = self.chunk_sums[index]
+        if summary is None:
+            summary = EMPTY
+            for line_summary in self.chunks[index]:
+                if line_summary is not EMPTY:
+                    summary = combine(summary, line_summary)
+            self.chunk_sums[index] = summary
+        return summary
+
+    def group_summary(self, group):
+        if group >= len(self.group_sums):
+            self.group_sums.extend([None] * (group + 1 - len(self.group_sums)))
+        summary = self.group_sums[group]
+        if summary is None:
+            summary = EMPTY
+            for index in range(group * GROUP, min(group * GROUP + GROUP, len(self.chunks))):
+                summary = combine(summary, self.chunk_summary(index))
+            self.group_sums[group] = summary
+        return summary
+
+    # Queries
+
+    def bracket_near(self, block, column):
+        """(index, column, char) of the bracket just before or at ``column`` in ``block``, or None."""
+        data = block_brackets(block)
+        if data is None:
+            return None
+        for index, (bracket_column, char) in enumerate(data.brackets):
+            if bracket_column == column - 1 and char in CLOSERS:
+                return index, bracket_column, char
+        for index, (bracket_column, char) in enumerate(data.brackets):
+            if bracket_column in (column, column - 1):
+                return index, bracket_column, char
+        return None
+
+    def match(self, line, index):
+        """(line, column, char) of the partner of bracket ``index`` on ``line``, or None if unmatched."""
+        block = self.document.findBlockByNumber(line)
+        brackets = block_brackets(block).brackets
+        if brackets[index][1] in OPENERS:
+            return self.find_closer(block, index + 1, 0)
+        return self.find_opener(block, index, 0)
+
+    def enclosing(self, line, column):
+        """((line, column, char), partner or None) of the innermost bracket pair around a position, or None."""
+        block = self.document.findBlockByNumber(line)
+        data = block_brackets(block)
+        if data is None:
+            return None
+        index = next((index for index, (bracket_column, _char) in enumerate(data.brackets) if bracket_column >= column),
+                     len(data.brackets))
+        opener = self.find_opener(block, index, 0)
+        if opener is None:
+            return None
+        opener_block = self.document.findBlockByNumber(opener[0])
+        opener_index = next(index for index, (bracket_column, _char) in enumerate(block_brackets(opener_block).brackets)
+                            if bracket_column == opener[1])
+        return opener, self.find_closer(opener_block, opener_index + 1, 0)
+
+    def find_closer(self, block, start, depth):
+        """The first closer at ``depth`` (openers deepen) from bracket ``start`` of ``block`` on."""
+        found, depth = self.scan_forward(block, start, depth)
+        if found is not None:
+            return found
+        self.flush_pending()
+        line, depth = self.next_holding(block.blockNumber() + 1, depth, forward=True)
+        return self.scan_forward(self.document.findBlockByNumber(line), 0, depth)[0] if line is not None else None
+
+    def find_opener(self, block, end, depth):
+        """The last opener at ``depth`` (closers deepen) before bracket ``end`` of ``block``."""
+        found, depth = self.scan_backward(block, end, depth)
+        if found is not None:
+            return found
+        self.flush_pending()
+        line, depth = self.next_holding(block.blockNumber() - 1, depth, forward=False)
+        return self.scan_backward(self.document.findBlockByNumber(line), None, depth)[0] if line is not None else None
+
+    def next_holding(self, line, depth, forward):
+        """(first line from ``line`` on, or back, that holds the match at ``depth``, depth entering it).
+
+        Steps over whole groups, then whole chunks, then single lines, that cannot hold it.
+        The line is None if there is no match.
+        """
+        if not 0 <= line < self.document.blockCount():
+            return None, depth
+        step = 1 if forward else -1
+
+        def holds(summary):
+            net, low, rise = summary
+            return low < -depth if forward else rise > depth
+
+        def passed(summary):
+            return depth + summary[0] if forward else depth - summary[0]
+
+        index, offset = self.chunk_of(line)
+        # Lines left in the starting chunk
+        chunk = self.chunks[index]
+        for position in (range(offset, len(chunk)) if forward else range(offset, -1, -1)):
+            if holds(chunk[position]):
+                return line + position - offset, depth
+            depth = passed(chunk[position])
+        index += step
+        # Chunks up to a group boundary, then whole groups
+        while 0 <= index < len(self.chunks):
+            group = index // GROUP
+            if (index % GROUP == 0 if forward else index % GROUP == GROUP - 1 or index == len(self.chunks) - 1):
+                summary = self.group_summary(group)
+                if not holds(summary):
+                    depth = passed(summary)
+                    index = (group + 1) * GROUP if forward else group * GROUP - 1
+                    continue
+            summary = self.chunk_summary(index)
+            if holds(summary):
+                break
+            depth = passed(summary)
+            index += step
+        else:
+            return None, depth
+        chunk = self.chunks[index]
+        start = self.chunk_start(index)
+        for position in (range(len(chunk)) if forward else range(len(chunk) - 1, -1, -1)):
+            if holds(chunk[position]):
+                return start + position, depth
+            depth = passed(chunk[position])
+        return None, depth
+
+    def chunk_start(self, index):
+        if self.starts is None:
+            self.chunk_of(0)
+        return self.starts[index]
+
+    def scan_forward(self, block, start, depth):
+        data = block_brackets(block)
+        if data is None:
+            return None, depth
+        for column, char in data.brackets[start:]:
+            if char in OPENERS:
+                depth += 1
+            elif depth == 0:
+                return (block.blockNumber(), column, char), depth
+            else:
+                depth -= 1
+        return None, depth
+
+    def scan_backward(self, block, end, depth):
+        data = block_brackets(block)
+        if data is None:
+            return None, depth
+        for column, char in reversed(data.brackets[:end]):
+            if char in CLOSERS:
+                depth += 1
+            elif depth == 0:
+                return (block.blockNumber(), column, char), depth
+            else:
+                depth -= 1
+        return None, depth
@@ -1,7 +1,27 @@
 import re
-from PyQt5.QtWidgets import QPlainTextEdit, QWidget, QToolTip
-from PyQt5.QtGui import QFont, QColor, QSyntaxHighlighter, QTextCharFormat, QPainter, QTextCursor
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QPlainTextEdit, QTextEdit, QWidget, QToolTip
+from PyQt5.QtGui import QFont, QColor, QPainter, QTextCursor, QKeySequence, QPolygon, QTextCharFormat
+from PyQt5.QtCore import Qt, QRectF, QPoint, pyqtSignal
+
+from editor.brackets import OPENERS, CLOSERS
+from editor.completion import CompletionPopup
+from editor.diff_gutter import DiffPeek, DELETED, MARKER_COLORS as DIFF_COLORS
+from editor.document import Document
+from editor.find import FindBar
+from editor.minimap import Minimap, MINIMAP_WIDTH
+from utils.diagnostics import ERROR, WARNING
+from utils.perf import timed
+
+MARKER_COLORS = {ERROR: QColor('#e74c3c'), WARNING: QColor('#f39c12')}
+DEFAULT_MARKER_COLOR = QColor('#3498db')
+FIND_MATCH_COLOR = QColor(255, 200, 0, 90)
+FIND_CURRENT_COLOR = QColor(255, 140, 0, 160)
+DIFF_BAR_WIDTH = 4
+FOLD_WIDTH = 12
+FOLD_PLACEHOLDER_COLOR = QColor(128, 128, 128, 70)
+BRACKET_MATCH_COLOR = QColor(0, 200, 150, 110)
+BRACKET_MISMATCH_COLOR = QColor(231, 76, 60, 140)
+BRACKET_SCOPE_COLOR = QColor(128, 128, 128, 60)
 
 class LineNumberArea(QWidget):
     def __init__(self, editor):
@@ -17,56 +37,137 @@ class LineNumberArea(QWidget):
     def mousePressEvent(self, event):
         self.editor.line_number_area_mouse_event(event)
 
-class SyntaxHighlighter(QSyntaxHighlighter):
-    def __init__(self, document):
-        super().__init__(document)
-        self.error_line = -1
-        self.error_format = QTextCharFormat()
-        self.error_format.setBackground(QColor("red"))
-
-        self.keyword_format = QTextCharFormat()
-        self.keyword_format.setForeground(QColor("blue"))
-        self.keywords = ["def", "class", "import", "from", "return", "if", "elif", "else", "while", "for", "try", "except"]
-
-    def highlightBlock(self, text):
-        if self.currentBlock().blockNumber() == self.error_line:
-            self.setFormat(0, len(text), self.error_format)
-        for keyword in self.keywords:
-            expression = re.compile(fr'\b{keyword}\b')
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), self.keyword_format)
-
-    def set_error_line(self, line):
-        self.error_line = line - 1  # Convert to 0-based index
-        self.rehighlight()
-
-    def clear_error_line(self):
-        self.error_line = -1
-        self.rehighlight()
-
 class CodeEditor(QPlainTextEdit):
+    """Shows one Document at a time; ``set_buffer`` switches documents without reloading them."""
+    definition_requested = pyqtSignal(str)  # Identifier under the cursor (F12 / Ctrl+Click)
+    buffer_changed = pyqtSignal(object)  # The Document now shown
+    breakpoints_changed = pyqtSignal()  # A breakpoint was toggled in the gutter
+    show_minimap = True
+
     def __init__(self, *args):
         super().__init__(*args)
         self.setFont(QFont("Courier", 12))
-        self.highlighter = SyntaxHighlighter(self.document())
         self.line_number_area = LineNumberArea(self)
-        self.breakpoints = set()
         self.debugging_mode = False
         self.current_line = -1
         self.error_tooltip = ''
+        self.marker_margin = 12
+        self.gutter_background = QColor(Qt.lightGray)
+        self.gutter_foreground = QColor(Qt.black)
+        self.viewport().setMouseTracking(True)  # Hover tooltips for diagnostics
+        self.doc = None
+        self.completion = CompletionPopup(self, None)
+        self.find_bar = FindBar(self)
+        self.diff_peek = DiffPeek(self)
+        self.minimap = Minimap(self)
+        self.minimap.setVisible(self.show_minimap)
+        self.set_buffer(Document(parent=self))
 
         self.blockCountChanged.connect(self.update_line_number_area_width)
         self.updateRequest.connect(self.update_line_number_area)
+        self.verticalScrollBar().valueChanged.connect(self.restyle_visible)
+        self.cursorPositionChanged.connect(self.reveal_cursor)
+        self.cursorPositionChanged.connect(self.update_brackets)
+
+        self.update_line_number_area_width(0)
+
+    # The services of the document being shown
+    highlighter = property(lambda self: self.doc.highlighter)
+    block_tracker = property(lambda self: self.doc.tracker)
+    completion_index = property(lambda self: self.doc.completion_index)
+    find_index = property(lambda self: self.doc.find_index)
+    lint = property(lambda self: self.doc.lint)
+    diagnostics = property(lambda self: self.doc.diagnostics)
+    line_diagnostics = property(lambda self: self.doc.line_diagnostics)
+    breakpoints = property(lambda self: self.doc.breakpoints)
+
+    def view_state(self):
+        cursor = self.textCursor()
+        return (cursor.position(), cursor.anchor(),
+                self.horizontalScrollBar().value(), self.verticalScrollBar().value())
 
+    def set_buffer(self, document):
+        """Shows ``document``, restoring it first if it was unloaded; the previous one keeps its view state."""
+        if document is self.doc:
+            return
+        if self.doc is not None:
+            if self.doc.loaded:
+                self.doc.view_state = self.view_state()
+            self.doc.diagnostics_changed.disconnect(self.line_number_area.update)
+            self.doc.preview_changed.disconnect(self.update_long_line_mode)
+            if self.doc.loaded:
+                self.doc.line_diff.changed.disconnect(self.on_diff_changed)
+                self.doc.folding.folds_changed.disconnect(self.on_folds_changed)
+        if not document.loaded:
+            document.restore()
+        self.doc = document
+        self.completion.hide()
+        self.diff_peek.hide()
+        self.completion.index = document.completion_index
+        self.setDocument(document.qdoc)
+        # A document that was never shown has no layout font yet
+        document.qdoc.setDefaultFont(self.font())
+        position, anchor, horizontal, vertical = document.view_state
+        cursor = QTextCursor(document.qdoc)
+        limit = document.qdoc.characterCount() - 1
+        cursor.setPosition(min(anchor, limit))
+        cursor.setPosition(min(position, limit), QTextCursor.KeepAnchor)
+        self.setTextCursor(cursor)
+        self.horizontalScrollBar().setValue(horizontal)
+        self.verticalScrollBar().setValue(vertical)
+        self.find_bar.set_index(document.find_index)
+        document.diagnostics_changed.connect(self.line_number_area.update)
+        document.preview_changed.connect(self.update_long_line_mode)
+        document.line_diff.changed.connect(self.on_diff_changed)
+        document.folding.folds_changed.connect(self.on_folds_changed)
+        self.update_long_line_mode()
         self.update_line_number_area_width(0)
+        self.line_number_area.update()
+        self.restyle_visible()
+        self.buffer_changed.emit(document)
+
+    def update_long_line_mode(self):
+        # Wrapping a line of hundreds of KB into thousands of rows is what makes layout crawl
+        self.setLineWrapMode(QPlainTextEdit.NoWrap if self.doc.long_lines else QPlainTextEdit.WidgetWidth)
+        self.setReadOnly(self.doc.preview)
+
+    def restyle_visible(self, *_args):
+        """Brings the visible blocks up to the current theme's formats, if a theme switch left them behind."""
+        if not self.highlighter.stale:
+            return
+        block = self.firstVisibleBlock()
+        first = last = block.blockNumber()
+        top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
+        height = self.viewport().height()
+        while block.isValid() and top <= height:
+            last = block.blockNumber()
+            top += self.blockBoundingRect(block).height()
+            block = self.next_shown_block(block)
+        self.highlighter.restyle(first, last)
+
+    def next_shown_block(self, block):
+        """The block after ``block``, jumping over the lines a fold hides."""
+        end = self.doc.folding.folded.get(block.blockNumber())
+        return self.document().findBlockByNumber(end + 1) if end is not None else block.next()
+
+    def set_gutter_colors(self, background, foreground):
+        self.gutter_background = background
+        self.gutter_foreground = foreground
+        self.line_number_area.update()
+        self.minimap.set_colors(background, foreground)
+
+    def setFont(self, font):
+        super().setFont(font)
+        if getattr(self, 'doc', None) is not None:
+            self.doc.qdoc.setDefaultFont(font)
 
     def line_number_area_width(self):
         digits = len(str(self.blockCount()))
-        space = 3 + self.fontMetrics().width('9') * digits
+        space = self.marker_margin + 3 + self.fontMetrics().width('9') * digits + FOLD_WIDTH + DIFF_BAR_WIDTH + 2
         return space
 
     def update_line_number_area_width(self, _):
-        self.setViewportMargins(self.line_number_area_width(), 0, 0, 0)
+        self.setViewportMargins(self.line_number_area_width(), 0, MINIMAP_WIDTH if self.show_minimap else 0, 0)
 
     def update_line_number_area(self, rect, dy):
         if dy:
@@ -81,21 +182,119 @@ class CodeEditor(QPlainTextEdit):
         super().resizeEvent(event)
         cr = self.contentsRect()
         self.line_number_area.setGeometry(cr.left(), cr.top(), self.line_number_area_width(), cr.height())
+        viewport = self.viewport().geometry()
+        self.minimap.setGeometry(viewport.right() + 1, viewport.top(), MINIMAP_WIDTH, viewport.height())
+        if self.find_bar.isVisible():
+            self.find_bar.reposition()
 
+    @timed('editor paint')
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.find_index.pattern is not None and self.find_index.count:
+            self.paint_find_matches(event.rect())
+        if self.doc.folding.folded:
+            self.paint_fold_placeholders(event.rect())
+
+    def paint_fold_placeholders(self, rect):
+        # A "⋯" box after each visible folded header line
+        painter = QPainter(self.viewport())
+        folded = self.doc.folding.folded
+        offset = self.contentOffset()
+        metrics = self.fontMetrics()
+        block = self.firstVisibleBlock()
+        while block.isValid():
+            geometry = self.blockBoundingGeometry(block).translated(offset)
+            if geometry.top() > rect.bottom():
+                break
+            if block.isVisible() and block.blockNumber() in folded:
+                layout = block.layout()
+                line = layout.lineAt(layout.lineCount() - 1)
+                box = QRectF(geometry.left() + line.naturalTextWidth() + metrics.width(' '),
+                             geometry.top() + line.y() + 1, metrics.width(' ⋯ '), line.height() - 2)
+                painter.fillRect(box, FOLD_PLACEHOLDER_COLOR)
+                painter.setPen(self.palette().text().color())
+                painter.drawText(box, Qt.AlignCenter, '⋯')
+            block = self.next_shown_block(block)
+
+    def paint_find_matches(self, rect):
+        # Only the blocks intersecting the repainted rect are visited, never the whole document
+        painter = QPainter(self.viewport())
+        current = self.find_bar.current
+        offset = self.contentOffset()
+        block = self.firstVisibleBlock()
+        while block.isValid():
+            geometry = self.blockBoundingGeometry(block).translated(offset)
+            if geometry.top() > rect.bottom():
+                break
+            number = block.blockNumber()
+            matches = self.find_index.matches_on(number) if block.isVisible() else ()
+            layout = block.layout()
+            for start, length in matches:
+                end = min(start + length, block.length() - 1)
+                color = FIND_CURRENT_COLOR if current and current[:2] == (number, start) else FIND_MATCH_COLOR
+                position = start
+                while position < end:
+                    # A match can wrap over several visual lines
+                    line = layout.lineForTextPosition(position)
+                    if not line.isValid():
+                        break
+                    segment_end = min(end, line.textStart() + line.textLength())
+                    x1, _ = line.cursorToX(position)
+                    x2, _ = line.cursorToX(segment_end)
+                    painter.fillRect(QRectF(geometry.left() + x1, geometry.top() + line.y(),
+                                            max(x2 - x1, 2), line.height()), color)
+                    if segment_end <= position:
+                        break
+                    position = segment_end
+            block = self.next_shown_block(block)
+
+    @timed('gutter paint')
     def line_number_area_paint_event(self, event):
         painter = QPainter(self.line_number_area)
-        painter.fillRect(event.rect(), Qt.lightGray)
+        painter.fillRect(event.rect(), self.gutter_background)
 
         block = self.firstVisibleBlock()
         block_number = block.blockNumber()
         top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
         bottom = top + self.blockBoundingRect(block).height()
+        last_visible = self.cursorForPosition(QPoint(0, self.viewport().height())).blockNumber()
+        diff_markers = self.doc.line_diff.markers(block_number, last_visible)
+        folding = self.doc.folding
+        number_width = self.line_number_area.width() - FOLD_WIDTH - DIFF_BAR_WIDTH - 2
+        bar_x = self.line_number_area.width() - DIFF_BAR_WIDTH
+        line_height = self.fontMetrics().height()
 
         while block.isValid() and top <= event.rect().bottom():
             if block.isVisible() and bottom >= event.rect().top():
                 number = str(block_number + 1)
-                painter.setPen(Qt.black)
-                painter.drawText(0, int(top), self.line_number_area.width(), self.fontMetrics().height(), Qt.AlignRight, number)
+                painter.setPen(self.gutter_foreground)
+                painter.drawText(0, int(top), number_width, self.fontMetrics().height(), Qt.AlignRight, number)
+                diff_marker = diff_markers.get(block_number)
+                if diff_marker == DELETED:
+                    painter.setPen(Qt.NoPen)
+                    painter.setBrush(DIFF_COLORS[DELETED])
+                    painter.drawPolygon(QPolygon([QPoint(bar_x - 2, int(top) - 4), QPoint(bar_x + DIFF_BAR_WIDTH, int(top)),
+                                                  QPoint(bar_x - 2, int(top) + 4)]))
+                    painter.setBrush(Qt.NoBrush)
+                elif diff_marker is not None:
+                    painter.fillRect(QRectF(bar_x, top, DIFF_BAR_WIDTH, bottom - top), DIFF_COLORS[diff_marker])
+                fold_end = folding.folded.get(block_number)
+                if block_number in self.line_diagnostics:
+                    painter.fillRect(1, int(top) + 3, 8, 8, self.marker_color(block_number))
+                elif fold_end is not None:
+                    # Diagnostics hidden in a fold show on its header
+                    hidden = next((line for line in self.line_diagnostics if block_number < line <= fold_end), None)
+                    if hidden is not None:
+                        painter.fillRect(1, int(top) + 3, 8, 8, self.marker_color(hidden))
+                if fold_end is not None or folding.is_foldable(block_number):
+                    painter.setPen(Qt.NoPen)
+                    painter.setBrush(self.gutter_foreground)
+                    x, y = number_width + 3, int(top) + line_height // 2
+                    if fold_end is not None:
+                        painter.drawPolygon(QPolygon([QPoint(x, y - 4), QPoint(x + 6, y), QPoint(x, y + 4)]))
+                    else:
+                        painter.drawPolygon(QPolygon([QPoint(x - 1, y - 2), QPoint(x + 7, y - 2), QPoint(x + 3, y + 3)]))
+                    painter.setBrush(Qt.NoBrush)
                 if block_number + 1 in self.breakpoints:
                     painter.setPen(Qt.red)
                     painter.drawEllipse(0, int(top), 10, 10)
@@ -103,12 +302,20 @@ class CodeEditor(QPlainTextEdit):
                     painter.setPen(Qt.green)
                     painter.drawText(10, int(top) + self.fontMetrics().ascent(), "→")
 
-            block = block.next()
+            block = self.next_shown_block(block)
             top = bottom
             bottom = top + self.blockBoundingRect(block).height()
-            block_number += 1
+            block_number = block.blockNumber()
 
     def line_number_area_mouse_event(self, event):
+        fold_x = self.line_number_area.width() - FOLD_WIDTH - DIFF_BAR_WIDTH - 2
+        if event.button() == Qt.LeftButton and fold_x <= event.pos().x() < fold_x + FOLD_WIDTH:
+            if self.doc.folding.toggle(self.cursorForPosition(event.pos()).blockNumber()):
+                self.park_hidden_cursor()
+                return
+        if event.button() == Qt.LeftButton and event.pos().x() >= self.line_number_area.width() - DIFF_BAR_WIDTH - 2:
+            if self.show_diff_peek(self.cursorForPosition(event.pos()).blockNumber()):
+                return
         if event.button() == Qt.LeftButton and self.debugging_mode:
             line_number = self.cursorForPosition(event.pos()).blockNumber() + 1
             if line_number in self.breakpoints:
@@ -116,18 +323,267 @@ class CodeEditor(QPlainTextEdit):
             else:
                 self.breakpoints.add(line_number)
             self.update_line_number_area(self.contentsRect(), 0)
+            self.breakpoints_changed.emit()
+
+    def set_minimap_visible(self, visible):
+        self.show_minimap = visible
+        self.minimap.setVisible(visible)
+        self.update_line_number_area_width(0)
+
+    def on_diff_changed(self):
+        self.diff_peek.hide()  # Its hunk may have moved or gone
+        self.line_number_area.update()
+
+    def show_diff_peek(self, line):
+        """Shows the base text of the change marked on ``line`` below it; False if there is none."""
+        line_diff = self.doc.line_diff
+        hunk = line_diff.hunk_at(line)
+        if hunk is None:
+            return False
+        _old_start, _old_count, new_start, new_count = hunk
+        block = self.document().findBlockByNumber(new_start + new_count - 1 if new_count else line)
+        geometry = self.blockBoundingGeometry(block).translated(self.contentOffset())
+        self.diff_peek.show_hunk(hunk, line_diff.base_text(hunk), geometry.bottom())
+        return True
+
+    def revert_hunk(self, hunk):
+        """Puts the base text of ``hunk`` back, as one undoable step."""
+        _old_start, _old_count, new_start, new_count = hunk
+        self.doc.replace_lines(new_start, new_count, self.doc.line_diff.base_text(hunk))
+
+    def on_folds_changed(self):
+        self.line_number_area.update()
+        self.viewport().update()
+
+    def reveal_cursor(self):
+        block = self.textCursor().block()
+        if not block.isVisible():
+            self.doc.folding.reveal(block.blockNumber())
+
+    def fold_current(self):
+        """Folds the innermost range around the cursor that is not folded yet."""
+        folding = self.doc.folding
+        line = self.textCursor().blockNumber()
+        header = folding.enclosing_header(line)
+        while header is not None and header in folding.folded:
+            header = folding.enclosing_header(header, strict=True)
+        if header is not None and folding.fold(header):
+            cursor = self.textCursor()
+            cursor.setPosition(self.document().findBlockByNumber(header).position())
+            self.setTextCursor(cursor)
+
+    def unfold_current(self):
+        folding = self.doc.folding
+        line = self.textCursor().blockNumber()
+        if not folding.unfold(line):
+            header = folding.enclosing_header(line)
+            if header is not None:
+                folding.unfold(header)
+
+    def fold_all(self):
+        self.doc.folding.fold_all()
+        self.park_hidden_cursor()
+
+    def unfold_all(self):
+        self.doc.folding.unfold_all()
+
+    def park_hidden_cursor(self):
+        # Park a cursor that a fold just hid on the fold's first line, rather than unfolding again
+        block = self.textCursor().block()
+        while not block.isVisible() and block.previous().isValid():
+            block = block.previous()
+        if block != self.textCursor().block():
+            cursor = self.textCursor()
+            cursor.setPosition(block.position())
+            self.setTextCursor(cursor)
+
+    def update_brackets(self):
+        """Highlights the bracket at the cursor and its partner, or else the brackets around the cursor.
+
+        Both lookups go through the document's BracketIndex, so neither scans the text.
+        """
+        index = self.highlighter.brackets
+        cursor = self.textCursor()
+        block = cursor.block()
+        line, column = block.blockNumber(), cursor.positionInBlock()
+        selections = []
+        near = index.bracket_near(block, column)
+        if near is not None:
+            bracket_index, bracket_column, char = near
+            partner = index.match(line, bracket_index)
+            matched = partner is not None and (OPENERS.get(char) or CLOSERS.get(char)) == partner[2]
+            color = BRACKET_MATCH_COLOR if matched else BRACKET_MISMATCH_COLOR
+            selections.append(self.bracket_selection(line, bracket_column, color))
+            if partner is not None:
+                selections.append(self.bracket_selection(partner[0], partner[1], color))
+        else:
+            pair = index.enclosing(line, column)
+            if pair is not None:
+                for bracket in pair:
+                    if bracket is not None:
+                        selections.append(self.bracket_selection(bracket[0], bracket[1], BRACKET_SCOPE_COLOR))
+        self.setExtraSelections(selections)
+
+    def bracket_selection(self, line, column, color):
+        selection = QTextEdit.ExtraSelection()
+        selection.format = QTextCharFormat()
+        selection.format.setBackground(color)
+        selection.cursor = QTextCursor(self.document())
+        selection.cursor.setPosition(self.document().findBlockByNumber(line).position() + column)
+        selection.cursor.movePosition(QTextCursor.NextCharacter, QTextCursor.KeepAnchor)
+        return selection
 
     def toggle_debugging_mode(self):
         self.debugging_mode = not self.debugging_mode
 
     def set_current_line(self, line):
         self.current_line = line
+        if line >= 0:
+            self.doc.folding.reveal(line)
         self.viewport().update()
 
+    def apply_external_text(self, text, done=None):
+        """Turns the buffer into ``text`` by editing only the lines that differ.
+
+        Unlike setPlainText this is one undoable step, and the cursor, scroll position and
+        unchanged blocks (with their highlighting) stay where they are. The diff runs in the
+        background; ``done()`` is called once the text is in place.
+        """
+        document = self.doc
+        if document.preview:
+            document.apply_text(text, done)
+            return
+
+        def apply(edits):
+            shown = document is self.doc
+            scroll = self.horizontalScrollBar().value(), self.verticalScrollBar().value()
+            document.apply_edits(edits)
+            if shown:
+                self.horizontalScrollBar().setValue(scroll[0])
+                self.verticalScrollBar().setValue(scroll[1])
+            if done is not None:
+                done()
+
+        document.diff_text(text, apply)
+
+    def set_diagnostics(self, source, diagnostics):
+        """Replaces the diagnostics reported by ``source`` (e.g. 'run', 'lint') for the shown document."""
+        self.doc.set_diagnostics(source, diagnostics)
+
+    def clear_diagnostics(self, source):
+        self.set_diagnostics(source, [])
+
+    def marker_color(self, line):
+        severities = {d.severity for d in self.line_diagnostics.get(line, ())}
+        for severity in (ERROR, WARNING):
+            if severity in severities:
+                return MARKER_COLORS[severity]
+        return DEFAULT_MARKER_COLOR
+
+    def diagnostic_tooltip(self, line):
+        return '\n'.join(d.message for d in self.line_diagnostics.get(line, ()))
+
+    def keyPressEvent(self, event):
+        if self.completion.handle_key(event):
+            return
+        if event.matches(QKeySequence.Undo):
+            self.undo()
+            return
+        if event.matches(QKeySequence.Redo):
+            self.redo()
+            return
+        if event.key() == Qt.Key_Space and event.modifiers() & Qt.ControlModifier:
+            self.completion.update_popup(explicit=True)
+            return
+        if event.key() == Qt.Key_F12:
+            self.request_definition(self.textCursor())
+            return
+        if event.key() == Qt.Key_F and event.modifiers() & Qt.ControlModifier:
+            self.find_bar.open_bar()
+            return
+        if event.key() == Qt.Key_F3 and self.find_bar.isVisible():
+            self.find_bar.find_next(backwards=bool(event.modifiers() & Qt.ShiftModifier))
+            return
+        if event.key() == Qt.Key_Escape and self.find_bar.isVisible():
+            self.find_bar.close_bar()
+            return
+        if event.key() in (Qt.Key_BracketLeft, Qt.Key_BraceLeft) and event.modifiers() & Qt.ControlModifier \
+                and event.modifiers() & Qt.ShiftModifier:
+            self.fold_current()
+            return
+        if event.key() in (Qt.Key_BracketRight, Qt.Key_BraceRight) and event.modifiers() & Qt.ControlModifier \
+                and event.modifiers() & Qt.ShiftModifier:
+            self.unfold_current()
+            return
+        if event.key() == Qt.Key_Escape and self.diff_peek.isVisible():
+            self.diff_peek.hide()
+            return
+        super().keyPressEvent(event)
+        self.completion.after_key(event)
+
+    def undo(self):
+        self.move_cursor_after_history(self.doc.undo_history.undo())
+
+    def redo(self):
+        self.move_cursor_after_history(self.doc.undo_history.redo())
+
+    def move_cursor_after_history(self, position):
+        if position is not None:
+            cursor = self.textCursor()
+            cursor.setPosition(position)
+            self.setTextCursor(cursor)
+
+    def setPlainText(self, text):
+        super().setPlainText(text)
+        self.doc.undo_history.clear()
+
+    def contextMenuEvent(self, event):
+        # The standard Undo/Redo entries drive the (disabled) QTextDocument stack; point them at the history
+        menu = self.createStandardContextMenu()
+        history = self.doc.undo_history
+        for name, slot, available in (('edit-undo', self.undo, history.can_undo()),
+                                      ('edit-redo', self.redo, history.can_redo())):
+            action = next((action for action in menu.actions() if action.objectName() == name), None)
+            if action is not None:
+                action.triggered.disconnect()
+                action.triggered.connect(slot)
+                action.setEnabled(available)
+        menu.exec_(event.globalPos())
+        menu.deleteLater()
+
+    def mouseDoubleClickEvent(self, event):
+        line = self.cursorForPosition(event.pos()).blockNumber()
+        if line in self.doc.preview_lines:
+            self.doc.expand_lines([line])
+            return
+        super().mouseDoubleClickEvent(event)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and event.modifiers() & Qt.ControlModifier:
+            self.request_definition(self.cursorForPosition(event.pos()))
+            return
+        super().mousePressEvent(event)
+
+    def word_at(self, cursor):
+        text = cursor.block().text()
+        column = cursor.positionInBlock()
+        for match in re.finditer(r'[A-Za-z_]\w*', text):
+            if match.start() <= column <= match.end():
+                return match.group(0)
+        return ''
+
+    def request_definition(self, cursor):
+        word = self.word_at(cursor)
+        if word:
+            self.definition_requested.emit(word)
+
     def mouseMoveEvent(self, event):
         cursor = self.cursorForPosition(event.pos())
-        if self.highlighter.error_line >= 0 and cursor.blockNumber() == self.highlighter.error_line and self.error_tooltip:
-            QToolTip.showText(self.mapToGlobal(event.pos()), self.error_tooltip, self)
+        tooltip = self.diagnostic_tooltip(cursor.blockNumber())
+        if not tooltip and self.highlighter.error_line >= 0 and cursor.blockNumber() == self.highlighter.error_line:
+            tooltip = self.error_tooltip
+        if tooltip:
+            QToolTip.showText(self.mapToGlobal(event.pos()), tooltip, self)
         else:
             QToolTip.hideText()
         super().mouseMoveEvent(event) 
\ No newline at end of file
@@ -1,27 +1,218 @@
-from PyQt5.QtCore import QObject, pyqtSignal, QProcess
+import codecs
+import time
+from collections import deque
+from PyQt5.QtCore import QObject, pyqtSignal, QProcess, QTimer, QEventLoop
+
+
+class OutputBuffer:
+    """Keeps the tail of a job's output within ``max_bytes`` (chunks are dropped oldest-first)."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.chunks = deque()
+        self.size = 0
+        self.truncated = False
+
+    def append(self, text):
+        self.chunks.append(text)
+        self.size += len(text)
+        while self.size > self.max_bytes and len(self.chunks) > 1:
+            self.size -= len(self.chunks.popleft())
+            self.truncated = True
+
+    def text(self):
+        return ''.join(self.chunks)
+
+
+class CommandJob(QObject):
+    output = pyqtSignal(str)  # Chunk of (merged) output, coalesced per flush interval
+    started = pyqtSignal()
+    finished = pyqtSignal(int, str, float)  # exit code, status, wall time in seconds
+
+    QUEUED, RUNNING, FINISHED, FAILED, TIMED_OUT, CANCELLED = (
+        'queued', 'running', 'finished', 'failed', 'timeout', 'cancelled')
+
+    def __init__(self, job_id, program, arguments, cwd, timeout, buffer_bytes, parent=None):
+        super().__init__(parent)
+        self.job_id = job_id
+        self.program = program
+        self.arguments = list(arguments)
+        self.cwd = cwd
+        self.timeout = timeout
+        self.buffer = OutputBuffer(buffer_bytes)
+        self.status = self.QUEUED
+        self.exit_code = None
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.pending = []
+
+    @property
+    def wall_time(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def output_text(self):
+        return self.buffer.text()
+
+    def is_active(self):
+        return self.status in (self.QUEUED, self.RUNNING)
+
 
 class CommandRunner(QObject):
-    finished = pyqtSignal(str, str)  # Signal to send stdout and stderr on completion
+    """Runs external commands as jobs, at most ``max_concurrent`` at a time.
+
+    Output is read as it arrives, coalesced into chunks every ``flush_interval`` ms
+    and emitted through each job's ``output`` signal; a bounded copy is kept on the job.
+    """
+    job_started = pyqtSignal(int)
+    job_finished = pyqtSignal(int, int, str, float)  # job id, exit code, status, wall time
+    finished = pyqtSignal(str, str)  # stdout and stderr of the command started by run_command
+
+    def __init__(self, parent=None, max_concurrent=4, buffer_bytes=2 * 1024 * 1024, flush_interval=30):
+        super().__init__(parent)
+        self.max_concurrent = max_concurrent
+        self.buffer_bytes = buffer_bytes
+        self.next_id = 1
+        self.queue = deque()
+        self.running = {}
+        self.jobs = {}
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(flush_interval)
+        self.flush_timer.timeout.connect(self.flush_output)
+
+    def submit(self, program, arguments=(), cwd=None, timeout=None):
+        """Queue ``program`` with ``arguments``; ``timeout`` is in seconds. Returns the CommandJob."""
+        # Jobs are owned by their callers (and by the runner while active), not by Qt parenting
+        job = CommandJob(self.next_id, program, arguments, cwd, timeout, self.buffer_bytes)
+        self.next_id += 1
+        self.jobs[job.job_id] = job
+        self.queue.append(job)
+        self.start_queued()
+        return job
+
+    def set_max_concurrent(self, value):
+        self.max_concurrent = max(1, value)
+        self.start_queued()
+
+    def active_count(self):
+        return len(self.running) + len(self.queue)
+
+    def start_queued(self):
+        while self.queue and len(self.running) < self.max_concurrent:
+            self.start_job(self.queue.popleft())
+
+    def start_job(self, job):
+        process = QProcess(self)
+        process.setProcessChannelMode(QProcess.MergedChannels)
+        if job.cwd:
+            process.setWorkingDirectory(job.cwd)
+        process.readyReadStandardOutput.connect(lambda: self.on_ready_read(job))
+        process.finished.connect(lambda code, exit_status: self.on_finished(job, code, exit_status))
+        process.errorOccurred.connect(lambda error: self.on_error(job, error))
+        job.process = process
+        job.status = CommandJob.RUNNING
+        job.started_at = time.monotonic()
+        self.running[job.job_id] = job
+        if job.timeout:
+            QTimer.singleShot(int(job.timeout * 1000), lambda: self.on_timeout(job))
+        process.start(job.program, job.arguments)
+        job.started.emit()
+        self.job_started.emit(job.job_id)
+
+    def on_ready_read(self, job):
+        data = job.process.readAllStandardOutput().data()
+        text = job.decoder.decode(data)
+        if text:
+            job.pending.append(text)
+            if not self.flush_timer.isActive():
+                self.flush_timer.start()
+
+    def flush_output(self, job=None):
+        jobs = [job] if job is not None else list(self.running.values())
+        for job in jobs:
+            if job.pending:
+                text = ''.join(job.pending)
+                job.pending = []
+                job.buffer.append(text)
+                job.output.emit(text)
+        if not any(job.pending for job in self.running.values()):
+            self.flush_timer.stop()
+
+    def on_timeout(self, job):
+        if job.status == CommandJob.RUNNING:
+            job.status = CommandJob.TIMED_OUT
+            job.process.kill()
+
+    def on_error(self, job, error):
+        # Only start failures need handling here; crashes still deliver finished()
+        if error == QProcess.FailedToStart and job.status == CommandJob.RUNNING:
+            job.status = CommandJob.FAILED
+            job.pending.append(f"Failed to start {job.program}: {job.process.errorString()}\n")
+            self.complete(job, -1)
+
+    def on_finished(self, job, code, exit_status):
+        if job.job_id not in self.running:
+            return
+        self.on_ready_read(job)
+        tail = job.decoder.decode(b'', final=True)
+        if tail:
+            job.pending.append(tail)
+        if job.status == CommandJob.RUNNING:
+            job.status = CommandJob.FINISHED if exit_status == QProcess.NormalExit else CommandJob.FAILED
+        self.complete(job, code if exit_status == QProcess.NormalExit else -1)
+
+    def complete(self, job, exit_code):
+        self.flush_output(job)
+        self.running.pop(job.job_id, None)
+        job.exit_code = exit_code
+        job.finished_at = time.monotonic()
+        if job.process is not None:
+            job.process.deleteLater()
+            job.process = None
+        job.finished.emit(exit_code, job.status, job.wall_time)
+        self.job_finished.emit(job.job_id, exit_code, job.status, job.wall_time)
+        # Finished jobs are forgotten; callers that need the output keep the job object
+        self.jobs.pop(job.job_id, None)
+        self.start_queued()
+
+    def cancel(self, job):
+        if job.status == CommandJob.QUEUED:
+            self.queue.remove(job)
+            job.status = CommandJob.CANCELLED
+            job.started_at = job.finished_at = time.monotonic()
+            job.finished.emit(-1, job.status, 0.0)
+            self.job_finished.emit(job.job_id, -1, job.status, 0.0)
+            self.jobs.pop(job.job_id, None)
+        elif job.status == CommandJob.RUNNING:
+            job.status = CommandJob.CANCELLED
+            job.process.terminate()
+            # Give the process a moment to clean up before killing it outright
+            QTimer.singleShot(2000, lambda: job.process is not None and job.process.kill())
 
-    def run_command(self, command):
-        self.process = QProcess()
-        self.process.setProcessChannelMode(QProcess.MergedChannels)
-        self.process.readyReadStandardOutput.connect(self.on_ready_read)
-        self.process.finished.connect(self.on_finished)
-        self.process.start(command)
+    def cancel_all(self):
+        for job in list(self.queue) + list(self.running.values()):
+            self.cancel(job)
 
-    def on_ready_read(self):
-        output = self.process.readAllStandardOutput().data().decode()
-        self.stdout += output
+    def write(self, job, data):
+        if job.process is not None:
+            job.process.write(data)
 
-    def on_finished(self):
-        self.finished.emit(self.stdout, '')
+    def run_command(self, command, arguments=()):
+        job = self.submit(command, arguments)
+        job.finished.connect(lambda *_: self.finished.emit(job.output_text(), ''))
+        return job
 
     def kill_process(self):
-        self.process.kill()
+        self.cancel_all()
 
-    def run_command_sync(self, command):
-        self.stdout = ''
-        self.run_command(command)
-        self.process.waitForFinished()
-        return self.stdout 
\ No newline at end of file
+    def run_command_sync(self, command, arguments=(), timeout=30):
+        # Spins a local event loop instead of blocking in waitForFinished(), so the GUI keeps painting
+        job = self.submit(command, arguments, timeout=timeout)
+        loop = QEventLoop()
+        job.finished.connect(loop.quit)
+        if job.is_active():
+            loop.exec_()
+        return job.output_text()
@@ -0,0 +1,422 @@
+import os
+import re
+import ast
+import math
+import bisect
+import pkgutil
+import keyword
+import builtins
+import importlib
+import sysconfig
+from collections import OrderedDict
+from importlib.machinery import BuiltinImporter, ExtensionFileLoader, PathFinder, SourceFileLoader
+from PyQt5.QtWidgets import QCompleter
+from PyQt5.QtCore import QObject, Qt, QStringListModel, QTimer
+from PyQt5.QtGui import QTextCursor
+
+from utils.background import process_tasks
+
+IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+IMPORT_RE = re.compile(r'^\s*(?:from\s+([\w.]+)\s+import\b|import\s+(.+))')
+STATIC_NAMES = sorted(set(keyword.kwlist) | {name for name in dir(builtins) if not name.startswith('_')})
+TERMINAL = ''  # Key holding a node's word count; never a child character
+MAX_MODULES = 200  # Resolved modules kept per buffer; the least recently used go first
+
+
+def stdlib_extension_dirs():
+    """Directories holding the standard library's compiled extension modules."""
+    platstdlib = sysconfig.get_paths()['platstdlib']
+    return {platstdlib, os.path.join(platstdlib, 'lib-dynload')}
+
+
+def find_module_spec(module_name):
+    """The spec of ``module_name``, found without importing it or any of its parent packages."""
+    parts = module_name.split('.')
+    path = None
+    spec = None
+    for depth in range(len(parts)):
+        name = '.'.join(parts[:depth + 1])
+        if path is None and depth:
+            return None  # A parent that is not a package
+        spec = BuiltinImporter.find_spec(name) if depth == 0 else None
+        spec = spec or PathFinder.find_spec(name, path)
+        if spec is None:
+            return None
+        path = spec.submodule_search_locations
+    return spec
+
+
+def source_names(source):
+    """Top-level names bound in ``source``, plus the entries of any literal ``__all__``."""
+    tree = ast.parse(source)
+    names = set()
+    for node in tree.body:
+        statements = [node]
+        if isinstance(node, (ast.If, ast.Try)):
+            # Definitions guarded by version checks or try/except ImportError
+            statements = list(node.body) + list(node.orelse) + [s for h in getattr(node, 'handlers', []) for s in h.body]
+        for statement in statements:
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(statement.name)
+            elif isinstance(statement, (ast.Import, ast.ImportFrom)):
+                names.update((alias.asname or alias.name).split('.')[0] for alias in statement.names if alias.name != '*')
+            elif isinstance(statement, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+                targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+                for target in targets:
+                    if isinstance(target, ast.Name) and target.id == '__all__':
+                        try:
+                            names.update(ast.literal_eval(statement.value))
+                        except (ValueError, TypeError, SyntaxError):
+                            pass
+                    names.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+    return names
+
+
+def module_members(module_name):
+    """Worker: public names of ``module_name``, found without running any of its code.
+
+    Python modules are read and scanned with ``ast``; packages add their submodules. Only
+    modules compiled into the interpreter or shipped as extensions of the standard
+    library are imported, since they have no source to scan.
+    """
+    try:
+        spec = find_module_spec(module_name)
+        if spec is None:
+            return []
+        names = set()
+        if isinstance(spec.loader, SourceFileLoader):
+            with open(spec.origin, 'rb') as file:
+                names = source_names(file.read())
+        elif spec.origin == 'built-in' or (isinstance(spec.loader, ExtensionFileLoader)
+                                           and os.path.dirname(spec.origin) in stdlib_extension_dirs()):
+            names = set(dir(importlib.import_module(module_name)))
+        if spec.submodule_search_locations:
+            names.update(info.name for info in pkgutil.iter_modules(spec.submodule_search_locations))
+    except (OSError, SyntaxError, ValueError, ImportError):
+        return []
+    return sorted(name for name in names if isinstance(name, str) and not name.startswith('_'))
+
+
+def is_complete_import(line):
+    """True if ``line`` is a whole import statement, or the opening line of a parenthesized one."""
+    try:
+        ast.parse(line.strip())
+        return True
+    except SyntaxError:
+        return bool(re.match(r'^\s*from\s+[\w.]+\s+import\s*\(', line))
+
+
+class PrefixTrie:
+    """Identifier trie with per-word reference counts, so words can be removed again."""
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    def add(self, word, count=1):
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        if TERMINAL not in node:
+            self.size += 1
+        node[TERMINAL] = node.get(TERMINAL, 0) + count
+
+    def remove(self, word, count=1):
+        path = []
+        node = self.root
+        for char in word:
+            child = node.get(char)
+            if child is None:
+                return
+            path.append((node, char))
+            node = child
+        if TERMINAL not in node:
+            return
+        node[TERMINAL] -= count
+        if node[TERMINAL] > 0:
+            return
+        del node[TERMINAL]
+        self.size -= 1
+        # Prune branches that no longer lead to any word
+        for parent, char in reversed(path):
+            if parent[char]:
+                break
+            del parent[char]
+
+    def count(self, word):
+        node = self.root
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return 0
+        return node.get(TERMINAL, 0)
+
+    def complete(self, prefix, limit=500):
+        """Returns up to ``limit`` (word, count) pairs starting with ``prefix``, shortest first."""
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        results = []
+        level = [(prefix, node)]
+        while level and len(results) < limit:
+            next_level = []
+            for word, current in level:
+                for char, child in current.items():
+                    if char == TERMINAL:
+                        results.append((word, child))
+                    else:
+                        next_level.append((word + char, child))
+            level = next_level
+        return results[:limit]
+
+    def clear(self):
+        self.root = {}
+        self.size = 0
+
+
+class CompletionIndex(QObject):
+    """Identifiers of one buffer, kept current from BlockTracker edits.
+
+    Only the lines touched by an edit are re-tokenised. Large replacements (opening a
+    file) are indexed in time slices so they never stall the GUI thread.
+    """
+
+    def __init__(self, tracker, parent=None, slice_lines=3000):
+        super().__init__(parent)
+        self.tracker = tracker
+        self.trie = PrefixTrie()
+        self.indexed_upto = 0  # Lines [0, indexed_upto) are in the trie
+        self.slice_lines = slice_lines
+        self.modules = OrderedDict()  # imported module name -> sorted member names (None while resolving), oldest first
+        self.aliases = {}  # local name -> module name, from "import x as y"
+        self.pending_imports = set()  # Edited import lines, resolved once the cursor leaves them
+        self.slice_timer = QTimer(self)
+        self.slice_timer.setInterval(0)
+        self.slice_timer.timeout.connect(self.index_next_slice)
+        tracker.lines_changed.connect(self.on_lines_changed)
+        self.reset()
+
+    def reset(self):
+        self.trie.clear()
+        self.indexed_upto = 0
+        self.slice_timer.start()
+
+    def add_lines(self, lines):
+        for line in lines:
+            for word in IDENTIFIER_RE.findall(line):
+                self.trie.add(word)
+
+    def remove_lines(self, lines):
+        for line in lines:
+            for word in IDENTIFIER_RE.findall(line):
+                self.trie.remove(word)
+
+    def index_next_slice(self):
+        end = min(self.indexed_upto + self.slice_lines, self.tracker.line_count())
+        lines = self.tracker.lines[self.indexed_upto:end]
+        self.add_lines(lines)
+        for line in lines:
+            if 'import' in line and is_complete_import(line):
+                self.note_imports(line)
+        self.indexed_upto = end
+        if end >= self.tracker.line_count():
+            self.slice_timer.stop()
+
+    def on_lines_changed(self, first, old, new):
+        if len(old) > self.slice_lines or len(new) > self.slice_lines:
+            self.reset()  # Large replacement or paste: re-indexed in slices
+            return
+        # Lines being typed are only resolved when finished, so "import antigravity" never
+        # resolves "import a", "import an", ...
+        self.pending_imports.difference_update(old)
+        self.pending_imports.update(line for line in new if 'import' in line)
+        if first + len(old) <= self.indexed_upto:
+            self.remove_lines(old)
+            self.add_lines(new)
+            self.indexed_upto += len(new) - len(old)
+        elif first < self.indexed_upto:
+            # The edit straddles the indexed boundary
+            self.remove_lines(old[:self.indexed_upto - first])
+            self.add_lines(new)
+            self.indexed_upto = first + len(new)
+        if self.indexed_upto < self.tracker.line_count() and not self.slice_timer.isActive():
+            self.slice_timer.start()
+
+    def resolve_pending_imports(self, current_line):
+        """Resolve the edited import lines other than ``current_line``, the one under the cursor."""
+        for line in list(self.pending_imports):
+            if line != current_line:
+                self.pending_imports.discard(line)
+                if is_complete_import(line):
+                    self.note_imports(line)
+
+    def note_imports(self, line):
+        match = IMPORT_RE.match(line)
+        if not match:
+            return
+        if match.group(1):
+            self.resolve_module(match.group(1))
+            return
+        for part in match.group(2).split(','):
+            names = part.split()
+            if not names or not IDENTIFIER_RE.fullmatch(names[0].replace('.', '_')):
+                continue
+            self.resolve_module(names[0])
+            if len(names) == 3 and names[1] == 'as':
+                self.aliases[names[2]] = names[0]
+            else:
+                self.aliases[names[0].split('.')[0]] = names[0].split('.')[0]
+
+    def resolve_module(self, module_name):
+        if module_name in self.modules:
+            self.modules.move_to_end(module_name)
+            return
+        self.modules[module_name] = None
+        while len(self.modules) > MAX_MODULES:
+            self.modules.popitem(last=False)
+        process_tasks().submit(module_members, module_name,
+                               callback=lambda names: self.store_members(module_name, names),
+                               error_callback=lambda error: self.store_members(module_name, []))
+
+    def store_members(self, module_name, names):
+        if module_name in self.modules:  # Not evicted while resolving
+            self.modules[module_name] = names
+
+    def candidates(self, prefix, context=None, lines_near=(), limit=50, from_import=False):
+        """Ranked completions for ``prefix``.
+
+        ``context`` is the dotted module name before the prefix ("os.pa" -> "os") or, with
+        ``from_import``, the module of a "from x import" line. ``lines_near`` are the lines
+        around the cursor, nearest first, used to rank by locality on top of buffer frequency.
+        """
+        if context is not None:
+            root, _, rest = context.partition('.')
+            module_name = self.aliases.get(root, root) + ('.' + rest if rest else '')
+            if root in self.aliases or from_import:
+                self.resolve_module(module_name)  # e.g. "os.path" after "import os"
+            members = self.modules.get(module_name) or []
+            start = bisect.bisect_left(members, prefix)
+            words = []
+            for name in members[start:]:
+                if not name.startswith(prefix):
+                    break
+                words.append(name)
+            return words[:limit]
+
+        scores = {}
+        for word, count in self.trie.complete(prefix):
+            if word != prefix:
+                scores[word] = math.log1p(count)
+        for distance, line in enumerate(lines_near):
+            if prefix not in line:
+                continue
+            for word in IDENTIFIER_RE.findall(line):
+                if word in scores and word != prefix:
+                    # Closer occurrences weigh more; only the nearest one counts
+                    scores[word] = max(scores[word], math.log1p(self.trie.count(word)) + 4.0 / (1 + distance / 8))
+        start = bisect.bisect_left(STATIC_NAMES, prefix)
+        for name in STATIC_NAMES[start:]:
+            if not name.startswith(prefix):
+                break
+            scores.setdefault(name, 0.5)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+        return [word for word, _ in ranked[:limit] if word != prefix]
+
+
+class CompletionPopup(QObject):
+    """Drives a QCompleter popup for a CodeEditor from its CompletionIndex."""
+
+    def __init__(self, editor, index, min_prefix=2, locality_lines=100):
+        super().__init__(editor)
+        self.editor = editor
+        self.index = index
+        self.min_prefix = min_prefix
+        self.locality_lines = locality_lines
+        self.model = QStringListModel(self)
+        self.completer = QCompleter(self.model, editor)
+        self.completer.setWidget(editor)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.activated[str].connect(self.insert_completion)
+        self.prefix = ''
+        self.cursor_line = 0
+        editor.cursorPositionChanged.connect(self.on_cursor_moved)
+
+    def is_visible(self):
+        return self.completer.popup().isVisible()
+
+    def handle_key(self, event):
+        """Called before the editor handles a key; returns True if the popup consumed it."""
+        if self.is_visible() and event.key() in (Qt.Key_Enter, Qt.Key_Return, Qt.Key_Tab, Qt.Key_Escape, Qt.Key_Backtab):
+            # QCompleter forwards these after acting on them itself (activated / hide)
+            event.ignore()
+            return True
+        return False
+
+    def after_key(self, event):
+        """Called after the editor handled a key; opens, refreshes or hides the popup."""
+        text = event.text()
+        if not self.is_visible() and (not text or not (text[-1].isalnum() or text[-1] == '_')):
+            return
+        self.update_popup()
+
+    def on_cursor_moved(self):
+        block = self.editor.textCursor().block()
+        if block.blockNumber() != self.cursor_line and self.index is not None:
+            self.index.resolve_pending_imports(block.text())
+        self.cursor_line = block.blockNumber()
+
+    def context_at_cursor(self):
+        cursor = self.editor.textCursor()
+        block = cursor.block()
+        line = block.text()[:cursor.positionInBlock()]
+        prefix = re.search(r'[A-Za-z_]\w*$', line)
+        prefix = prefix.group(0) if prefix else ''
+        context = None
+        from_import = False
+        before = line[:len(line) - len(prefix)]
+        if before.endswith('.'):
+            dotted = re.search(r'([A-Za-z_][\w.]*)\.$', before)
+            context = dotted.group(1) if dotted else None
+        else:
+            import_match = re.match(r'^\s*from\s+([\w.]+)\s+import\s+', before)
+            if import_match:
+                context = import_match.group(1)
+                from_import = True  # The module name is finished once "import" follows it
+        return prefix, context, block.blockNumber(), from_import
+
+    def update_popup(self, explicit=False):
+        prefix, context, line_number, from_import = self.context_at_cursor()
+        if context is None and len(prefix) < self.min_prefix and not explicit:
+            self.hide()
+            return
+        lines = self.index.tracker.lines
+        near = []
+        for distance in range(self.locality_lines):
+            for number in {line_number - distance, line_number + distance}:
+                if 0 <= number < len(lines):
+                    near.append(lines[number])
+        words = self.index.candidates(prefix, context, near, from_import=from_import)
+        if not words:
+            self.hide()
+            return
+        self.prefix = prefix
+        self.model.setStringList(words)
+        popup = self.completer.popup()
+        popup.setCurrentIndex(self.model.index(0, 0))
+        rect = self.editor.cursorRect()
+        rect.setWidth(popup.sizeHintForColumn(0) + popup.verticalScrollBar().sizeHint().width() + 16)
+        self.completer.complete(rect)
+
+    def hide(self):
+        self.completer.popup().hide()
+
+    def insert_completion(self, word):
+        self.hide()
+        if not word:
+            return
+        cursor = self.editor.textCursor()
+        cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor, len(self.prefix))
+        cursor.insertText(word)
+        self.editor.setTextCursor(cursor)
@@ -0,0 +1,287 @@
+import os
+import subprocess
+from bisect import bisect_left
+from PyQt5.QtWidgets import QFrame, QLabel, QPushButton, QHBoxLayout, QVBoxLayout
+from PyQt5.QtGui import QColor, QFont
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from editor.file_watcher import read_file_state
+from utils.background import process_tasks, thread_tasks
+from utils.text_diff import diff_hunks
+
+ADDED, MODIFIED, DELETED = 'added', 'modified', 'deleted'
+MARKER_COLORS = {ADDED: QColor('#2ea043'), MODIFIED: QColor('#1f6feb'), DELETED: QColor('#d73a49')}
+CONTEXT = 3  # Unchanged lines re-diffed on each side of an edit
+INCREMENTAL_MAX_LINES = 5000  # Edits spanning more than this go back to a full diff in a worker
+PEEK_MAX_LINES = 30
+
+
+def git_head_text(path):
+    """Worker: the text of ``path`` as committed at git HEAD, or None if git has no such file."""
+    directory, name = os.path.split(path)
+    try:
+        result = subprocess.run(['git', 'show', f"HEAD:./{name}"], cwd=directory, capture_output=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode('utf-8', 'replace').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def hash_lines(lines):
+    return [hash(line) for line in lines]
+
+
+class LineDiff(QObject):
+    """Added, modified and deleted lines of a document against a base text, for the gutter.
+
+    The base is the saved file (``base_mode`` 'disk') or the file at git HEAD ('head').
+    Lines are compared by hash. The first diff runs in a worker process; after that each
+    edit reported by the BlockTracker re-diffs only the lines around it together with the
+    hunks it touches, so the markers keep up with typing in any file size.
+    """
+    changed = pyqtSignal()
+    base_mode = 'disk'
+
+    def __init__(self, tracker, qdoc, path=None, parent=None):
+        super().__init__(parent)
+        self.tracker = tracker
+        self.path = path
+        self.enabled = True
+        self.closed = False
+        self.base = None  # Hashes of the base lines; None while there is no base
+        self.base_lines = None
+        self.current = hash_lines(tracker.lines)
+        self.hunks = []  # [old_start, old_count, new_start, new_count], sorted, in base / current lines
+        self.starts = None  # new_start of each hunk, rebuilt on demand for lookups
+        self.request = 0  # Bumped whenever a base load or full diff is started; older results are dropped
+        self.pending = False  # A full diff is running in a worker
+        self.dirty = None  # Edits made meanwhile: (first, last line in the diffed snapshot, last line now)
+        tracker.lines_changed.connect(self.on_lines_changed)
+        qdoc.modificationChanged.connect(self.on_modification_changed)
+
+    def start(self, saved):
+        """Sets up the base; a document that matches its saved file is its own base, without reading it."""
+        if self.base_mode == 'disk' and saved and self.path and self.enabled:
+            self.set_base(list(self.tracker.lines))
+        else:
+            self.reload_base()
+
+    def set_path(self, path):
+        self.path = path
+        self.reload_base()
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.reload_base()
+
+    def close(self):
+        self.closed = True
+        self.request += 1
+
+    def reload_base(self):
+        self.request += 1
+        request = self.request
+        if not self.path or not self.enabled:
+            self.set_base(None)
+        elif self.base_mode == 'head':
+            thread_tasks().submit(git_head_text, self.path, callback=lambda text: self.on_base_text(request, text))
+        else:
+            thread_tasks().submit(read_file_state, self.path,
+                                  callback=lambda state: self.on_base_text(request, state and state[3]))
+
+    def on_base_text(self, request, text):
+        if not self.closed and request == self.request:
+            self.set_base(text.split('\n') if text is not None else None)
+
+    def set_base(self, lines):
+        self.base_lines = lines
+        self.base = hash_lines(lines) if lines is not None else None
+        self.hunks = []
+        self.starts = None
+        if self.base is not None and self.base != self.current:
+            self.full_diff()
+        else:
+            self.pending = False
+            self.changed.emit()
+
+    def on_modification_changed(self, modified):
+        if not modified and self.base_mode == 'disk' and self.path and self.enabled:
+            self.request += 1
+            self.set_base(list(self.tracker.lines))  # Saved (or reverted to the saved text)
+
+    # Diffing
+
+    def full_diff(self):
+        self.request += 1
+        request = self.request
+        self.pending = True
+        self.dirty = None
+        process_tasks().submit(diff_hunks, self.base, list(self.current),
+                               callback=lambda hunks: self.on_full_diff(request, hunks))
+
+    def on_full_diff(self, request, hunks):
+        if self.closed or request != self.request:
+            return
+        self.pending = False
+        self.hunks = [list(hunk) for hunk in hunks]
+        self.starts = None
+        if self.dirty is not None:
+            # Lines outside the range edited meanwhile still line up with the diffed snapshot
+            first, snapshot_end, end = self.dirty
+            self.dirty = None
+            self.update(first, snapshot_end - first, end - first)
+        else:
+            self.changed.emit()
+
+    def on_lines_changed(self, first, old, new):
+        self.current[first:first + len(old)] = hash_lines(new)
+        if self.base is None:
+            return
+        if self.pending:
+            delta = len(new) - len(old)
+            if self.dirty is None:
+                self.dirty = (first, first + len(old), first + len(new))
+            else:
+                lo, snapshot_end, end = self.dirty
+                grow = max(end, first + len(old)) - end
+                self.dirty = (min(lo, first), snapshot_end + grow, max(end, first + len(old)) + delta)
+            return
+        self.update(first, len(old), len(new))
+
+    def update(self, first, old_count, new_count):
+        """Re-diffs after lines ``first .. first + old_count - 1`` became ``new_count`` lines.
+
+        Only the edited lines plus CONTEXT on each side, widened to every hunk they touch,
+        are compared; hunks further down just shift.
+        """
+        delta = new_count - old_count
+        hunks = self.hunks
+        lo = max(0, first - CONTEXT)
+        hi = min(first + old_count + CONTEXT, len(self.current) - delta)
+        index = 0
+        offset = 0  # Base lines minus current lines in the hunks above ``lo``
+        while index < len(hunks) and hunks[index][2] + hunks[index][3] < lo:
+            offset += hunks[index][1] - hunks[index][3]
+            index += 1
+        end = index
+        touched = 0
+        while end < len(hunks) and hunks[end][2] <= hi:
+            lo = min(lo, hunks[end][2])
+            hi = max(hi, hunks[end][2] + hunks[end][3])
+            touched += hunks[end][1] - hunks[end][3]
+            end += 1
+        base_lo, base_hi = lo + offset, hi + offset + touched
+        if max(hi + delta, base_hi) - lo > INCREMENTAL_MAX_LINES:
+            self.full_diff()
+            return
+        replaced = [[old_start + base_lo, old_count_, new_start + lo, new_count_] for old_start, old_count_, new_start, new_count_
+                    in diff_hunks(self.base[base_lo:base_hi], self.current[lo:hi + delta])]
+        for hunk in hunks[end:]:
+            hunk[2] += delta
+        hunks[index:end] = replaced
+        self.starts = None
+        self.changed.emit()
+
+    # Queries
+
+    def hunk_index(self, line):
+        """Index of the last hunk starting at or above ``line``, or -1."""
+        if self.starts is None:
+            self.starts = [hunk[2] for hunk in self.hunks]
+        return bisect_left(self.starts, line + 1) - 1
+
+    def markers(self, first, last):
+        """{line: ADDED | MODIFIED | DELETED} for lines ``first .. last``.
+
+        DELETED marks the line below the removed ones (the last line, for a removal at the end).
+        """
+        markers = {}
+        if self.base is None or self.pending:
+            return markers
+        line_count = len(self.current)
+        for hunk in self.hunks[max(self.hunk_index(first), 0):]:
+            _old_start, old_count, new_start, new_count = hunk
+            if new_start > last:
+                break
+            if new_count == 0:
+                line = min(new_start, line_count - 1)
+                if first <= line <= last:
+                    markers.setdefault(line, DELETED)
+                continue
+            kind = ADDED if old_count == 0 else MODIFIED
+            for line in range(max(new_start, first), min(new_start + new_count - 1, last) + 1):
+                markers[line] = kind
+        return markers
+
+    def hunk_at(self, line):
+        """The hunk whose marker is on ``line``, or None."""
+        if self.base is None or self.pending:
+            return None
+        index = self.hunk_index(line)
+        line_count = len(self.current)
+        for hunk in self.hunks[max(index - 1, 0):index + 2]:
+            _old_start, _old_count, new_start, new_count = hunk
+            if new_start <= line < new_start + new_count or (new_count == 0 and min(new_start, line_count - 1) == line):
+                return tuple(hunk)
+        return None
+
+    def base_text(self, hunk):
+        old_start, old_count, _new_start, _new_count = hunk
+        return self.base_lines[old_start:old_start + old_count]
+
+
+class DiffPeek(QFrame):
+    """Inline view of a change under its line: the base text it replaced, with a Revert button."""
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+        self.hunk = None
+        self.setFrameShape(QFrame.StyledPanel)
+        self.setStyleSheet("DiffPeek { background: #fff8e1; border: 1px solid #d0a000; border-radius: 4px; }"
+                           " QLabel { color: #333; background: transparent; }")
+        self.title = QLabel(self)
+        self.text = QLabel(self)
+        self.text.setFont(QFont("Courier", 10))
+        self.text.setStyleSheet("QLabel { color: #b31d28; }")
+        revert_btn = QPushButton("Revert", self)
+        revert_btn.clicked.connect(self.revert)
+        close_btn = QPushButton("✕", self)
+        close_btn.setFixedWidth(28)
+        close_btn.clicked.connect(self.hide)
+        header = QHBoxLayout()
+        header.addWidget(self.title, 1)
+        header.addWidget(revert_btn)
+        header.addWidget(close_btn)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(6, 4, 6, 6)
+        layout.addLayout(header)
+        layout.addWidget(self.text)
+        self.hide()
+
+    def show_hunk(self, hunk, old_lines, top):
+        """Shows ``hunk`` with its base lines, just below the viewport y ``top``."""
+        self.hunk = hunk
+        _old_start, old_count, _new_start, new_count = hunk
+        if old_count == 0:
+            self.title.setText(f"{new_count} added line{'s' if new_count != 1 else ''}")
+        elif new_count == 0:
+            self.title.setText(f"{old_count} deleted line{'s' if old_count != 1 else ''}:")
+        else:
+            self.title.setText(f"Changed from {old_count} line{'s' if old_count != 1 else ''}:")
+        shown = old_lines[:PEEK_MAX_LINES]
+        if len(old_lines) > PEEK_MAX_LINES:
+            shown.append(f"… {len(old_lines) - PEEK_MAX_LINES} more")
+        self.text.setText('\n'.join(shown))
+        self.text.setVisible(bool(old_lines))
+        viewport = self.editor.viewport()
+        self.setFixedWidth(max(300, viewport.width() - 40))
+        self.adjustSize()
+        self.move(viewport.x() + 20, viewport.y() + int(top))
+        self.show()
+        self.raise_()
+
+    def revert(self):
+        self.hide()
+        self.editor.revert_hunk(self.hunk)
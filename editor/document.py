@@ -0,0 +1,385 @@
+import os
+import json
+import zlib
+import itertools
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QTextDocument, QTextCursor
+from PyQt5.QtWidgets import QPlainTextDocumentLayout
+
+from editor.block_tracker import BlockTracker
+from editor.completion import CompletionIndex
+from editor.diff_gutter import LineDiff
+from editor.file_watcher import read_file_state
+from editor.find import FindIndex
+from editor.folding import FoldIndex
+from editor.highlighter import SyntaxHighlighter
+from editor.lint_checker import LintChecker
+from editor.recovery import RecoveryJournal
+from editor.undo import UndoHistory, spill_dir
+from utils.background import process_tasks
+from utils.diagnostics import Diagnostic, ERROR
+from utils.paths import data_dir, stale_files
+from utils.text_diff import line_edits
+
+_untitled_numbers = itertools.count(1)
+_cache_numbers = itertools.count(1)
+
+
+def cache_dir():
+    return data_dir('buffers')
+
+
+def remove_stale_caches():
+    """Deletes unloaded-buffer caches and undo spill files left behind by editor processes that are gone."""
+    for path in stale_files(cache_dir()) + stale_files(spill_dir()):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class Document(QObject):
+    """One open file (or untitled buffer) with the services that follow its text.
+
+    Owns the QTextDocument and, parented to it, the highlighter, BlockTracker, completion
+    and find indexes, lint checker, fold index and diff against the saved file; CodeEditor shows one Document at a time. An
+    inactive Document can be unloaded: its text, view state and markers are written to a
+    compressed cache file and the QTextDocument with all its services is freed, to be
+    rebuilt by ``restore()`` when the document is shown again.
+    """
+    diagnostics_changed = pyqtSignal()
+    modification_changed = pyqtSignal(bool)
+    preview_changed = pyqtSignal()
+    long_line_chars = 10000  # A file with a line longer than this opens in long-line mode
+    preview_chars = 2000
+
+    def __init__(self, path=None, text='', parent=None, digest=None, encoding='utf-8'):
+        """``text=None`` defers loading: the document starts unloaded and reads ``path`` on ``restore()``."""
+        super().__init__(parent)
+        self.path = os.path.abspath(path) if path else None
+        self.untitled_number = None if path else next(_untitled_numbers)
+        self.digest = digest  # Content hash of the file as last loaded or saved
+        self.encoding = encoding  # The file's encoding, used again when saving it
+        self.diagnostics = {}  # source -> [Diagnostic] for this buffer
+        self.line_diagnostics = {}  # 0-based line -> [Diagnostic]
+        self.breakpoints = set()
+        self.view_state = (0, 0, 0, 0)  # cursor position, anchor, horizontal scroll, vertical scroll
+        self.cache_path = None  # Set while unloaded
+        self.unloaded_modified = False
+        self.pending_disk_text = None  # Newer file content that arrived while unloaded
+        self.last_used = 0.0
+        self.lint_enabled = self.is_python()
+        self.long_lines = False
+        self.preview_lines = {}  # Line number -> full text of a line shown truncated
+        self.qdoc = None
+        self.journal = RecoveryJournal(self)
+        self.undo_history = UndoHistory(self)
+        if text is not None:
+            self.materialize(text)
+
+    @property
+    def title(self):
+        return os.path.basename(self.path) if self.path else f"untitled-{self.untitled_number}"
+
+    @property
+    def loaded(self):
+        return self.qdoc is not None
+
+    @property
+    def deferred(self):
+        """Never loaded yet (e.g. reopened from a session): the text is still only on disk."""
+        return not self.loaded and self.cache_path is None
+
+    def is_python(self):
+        return bool(self.path) and self.path.endswith('.py')
+
+    @property
+    def preview(self):
+        """True while long lines are shown truncated; the document is read-only until they are expanded."""
+        return bool(self.preview_lines)
+
+    def is_modified(self):
+        return self.qdoc.isModified() if self.loaded else self.unloaded_modified
+
+    def set_path(self, path):
+        self.path = os.path.abspath(path)
+        self.set_lint_enabled(self.is_python())
+        if self.loaded:
+            self.line_diff.set_path(self.path)
+            self.folding.set_use_ast(self.is_python() and not self.preview)
+
+    def prepare_text(self, text, allow_preview=True):
+        """Detects long-line mode for ``text``; returns the text to show, long lines truncated if previewing."""
+        self.preview_lines = {}
+        # Only text longer than the limit can hold such a line, so ordinary files skip the split
+        lines = text.split('\n') if len(text) > self.long_line_chars else []
+        self.long_lines = any(len(line) > self.long_line_chars for line in lines)
+        if not self.long_lines or not allow_preview:
+            return text
+        for number, line in enumerate(lines):
+            if len(line) > self.preview_chars:
+                self.preview_lines[number] = line
+                lines[number] = (f"{line[:self.preview_chars]} … [{len(line) - self.preview_chars:,} more characters,"
+                                 f" double-click to expand]")
+        return '\n'.join(lines)
+
+    def materialize(self, text, modified=False):
+        text = self.prepare_text(text, allow_preview=not modified)
+        qdoc = QTextDocument(self)
+        qdoc.setDocumentLayout(QPlainTextDocumentLayout(qdoc))
+        qdoc.setUndoRedoEnabled(False)  # UndoHistory keeps the steps, within a memory budget
+        qdoc.setPlainText(text)
+        qdoc.setModified(modified)
+        self.qdoc = qdoc
+        # The text is in place before the services attach, so each indexes it once
+        self.highlighter = SyntaxHighlighter(qdoc)
+        self.tracker = BlockTracker(qdoc, qdoc)
+        self.tracker.lines_changed.connect(self.highlighter.brackets.on_lines_changed)
+        self.completion_index = CompletionIndex(self.tracker, qdoc)
+        self.find_index = FindIndex(self.tracker, qdoc)
+        self.lint = LintChecker(qdoc, qdoc)
+        self.lint.diagnostics_ready.connect(lambda diagnostics: self.set_diagnostics('lint', diagnostics))
+        self.lint.set_enabled(self.lint_enabled and not self.preview)
+        self.line_diff = LineDiff(self.tracker, qdoc, self.path, qdoc)
+        self.line_diff.enabled = not self.preview
+        self.line_diff.start(saved=not modified)
+        self.folding = FoldIndex(self.tracker, qdoc, use_ast=self.is_python() and not self.preview, parent=qdoc)
+        qdoc.modificationChanged.connect(self.modification_changed)
+        self.journal.attach(qdoc, self.tracker)
+        self.undo_history.attach(qdoc, self.tracker)
+        if self.preview:
+            self.undo_history.clear()  # Any steps led to the full text, not to the preview
+        self.update_error_lines()
+
+    def set_lint_enabled(self, enabled):
+        self.lint_enabled = enabled
+        if self.loaded:
+            self.lint.set_enabled(enabled and not self.preview)
+
+    def text(self):
+        """The document's text, with lines shown truncated in long-line mode put back in full."""
+        if not self.preview_lines:
+            return self.qdoc.toPlainText()
+        lines = list(self.tracker.lines)
+        for number, line in self.preview_lines.items():
+            lines[number] = line
+        return '\n'.join(lines)
+
+    def set_text(self, text):
+        """Replaces the whole text (new content, not an edit); clears undo history."""
+        was_preview = self.preview
+        self.qdoc.setPlainText(self.prepare_text(text))
+        self.undo_history.clear()
+        if was_preview or self.preview:
+            self.lint.set_enabled(self.lint_enabled and not self.preview)
+            self.line_diff.set_enabled(not self.preview)
+            self.folding.set_use_ast(self.is_python() and not self.preview)
+            self.preview_changed.emit()
+
+    def expand_lines(self, numbers):
+        """Replaces the truncated previews of lines ``numbers`` with their full text."""
+        numbers = sorted((number for number in numbers if number in self.preview_lines), reverse=True)
+        if not numbers:
+            return
+        cursor = QTextCursor(self.qdoc)
+        cursor.beginEditBlock()
+        for number in numbers:
+            block = self.qdoc.findBlockByNumber(number)
+            cursor.setPosition(block.position())
+            cursor.setPosition(block.position() + block.length() - 1, QTextCursor.KeepAnchor)
+            cursor.insertText(self.preview_lines.pop(number))
+        cursor.endEditBlock()
+        # Expanding shows more of the file; it is not an edit
+        self.qdoc.setModified(False)
+        self.undo_history.clear()
+        if not self.preview:
+            self.lint.set_enabled(self.lint_enabled)
+            self.line_diff.set_enabled(True)
+            self.folding.set_use_ast(self.is_python())
+        self.preview_changed.emit()
+
+    def expand_all(self):
+        self.expand_lines(list(self.preview_lines))
+
+    def apply_text(self, text, done=None):
+        """Turns the text into ``text`` by editing only the lines that differ, as one undoable step.
+
+        The line diff runs in a worker process; its edits are applied on the GUI thread only
+        if the text is still the one diffed, else it is diffed again. ``done()`` is called
+        once the text is in place. Cursors on the document and unchanged blocks (with their
+        highlighting) stay put.
+        """
+        if self.preview:
+            self.set_text(text)  # Read-only preview: nothing to preserve, and the new text needs truncating too
+            if done is not None:
+                done()
+            return
+
+        def apply(edits):
+            self.apply_edits(edits)
+            if done is not None:
+                done()
+
+        self.diff_text(text, apply)
+
+    def diff_text(self, text, callback):
+        """Calls ``callback(edits)`` with the ``line_edits`` from the current text to ``text``.
+
+        The edits are only handed over while the text is still the one they were computed
+        from. If the document is unloaded meanwhile, ``text`` is kept for its restore instead.
+        """
+        qdoc, lines = self.qdoc, list(self.tracker.lines)
+        new_lines = text.split('\n')
+
+        def on_edits(edits):
+            if self.qdoc is not qdoc:
+                self.pending_disk_text = text  # Unloaded meanwhile: restore() materializes it
+                callback([])
+            elif self.tracker.lines != lines:
+                self.diff_text(text, callback)  # Edited meanwhile: the line numbers no longer fit
+            else:
+                callback(edits)
+
+        process_tasks().submit(line_edits, lines, new_lines, callback=on_edits)
+
+    def apply_edits(self, edits):
+        """Applies ``line_edits`` output as one undoable step."""
+        if not edits or not self.loaded:
+            return
+        cursor = QTextCursor(self.qdoc)
+        cursor.beginEditBlock()
+        for first, count, new_lines in reversed(edits):
+            # Later edits first, so the line numbers of earlier ones stay valid
+            self.splice_lines(cursor, first, count, new_lines)
+        cursor.endEditBlock()
+
+    def replace_lines(self, first, count, new_lines):
+        """Replaces lines ``first .. first + count - 1`` with ``new_lines``, as one undoable step."""
+        cursor = QTextCursor(self.qdoc)
+        cursor.beginEditBlock()
+        self.splice_lines(cursor, first, count, new_lines)
+        cursor.endEditBlock()
+
+    def splice_lines(self, cursor, first, count, new_lines):
+        document = self.qdoc
+        replacement = '\n'.join(new_lines)
+        if count and new_lines:
+            start = document.findBlockByNumber(first).position()
+            last = document.findBlockByNumber(first + count - 1)
+            end = last.position() + last.length() - 1
+        elif count:
+            # Drop whole lines together with one line separator
+            start = document.findBlockByNumber(first).position()
+            if first + count < document.blockCount():
+                end = document.findBlockByNumber(first + count).position()
+            else:
+                last = document.findBlockByNumber(first + count - 1)
+                end = last.position() + last.length() - 1
+                start = max(start - 1, 0)
+        elif first < document.blockCount():
+            start = end = document.findBlockByNumber(first).position()
+            replacement += '\n'
+        else:
+            last = document.lastBlock()
+            start = end = last.position() + last.length() - 1
+            replacement = '\n' + replacement
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        cursor.insertText(replacement)
+
+    def set_diagnostics(self, source, diagnostics):
+        """Replaces the diagnostics reported by ``source`` (e.g. 'run', 'lint') for this buffer."""
+        self.diagnostics[source] = [d for d in diagnostics if d.path is None]
+        self.line_diagnostics = {}
+        for entries in self.diagnostics.values():
+            for diagnostic in entries:
+                self.line_diagnostics.setdefault(diagnostic.line - 1, []).append(diagnostic)
+        if self.loaded:
+            self.update_error_lines()
+        self.diagnostics_changed.emit()
+
+    def update_error_lines(self):
+        self.highlighter.set_error_lines(
+            {line for line, entries in self.line_diagnostics.items() if any(d.severity == ERROR for d in entries)})
+
+    def memory_estimate(self):
+        """Rough bytes held by the loaded document: text, block layouts, the line mirror and indexes."""
+        if not self.loaded:
+            return 0
+        return self.qdoc.characterCount() * 6 + self.qdoc.blockCount() * 300 + self.undo_history.memory
+
+    def unload(self):
+        """Writes the document to its cache file and frees the QTextDocument and its services."""
+        if not self.loaded:
+            return
+        state = {
+            'text': self.text(),
+            'modified': self.qdoc.isModified(),
+            'view_state': list(self.view_state),
+            'breakpoints': sorted(self.breakpoints),
+            'folds': sorted(self.folding.folded),
+            'diagnostics': {source: [list(d) for d in entries] for source, entries in self.diagnostics.items()},
+        }
+        self.cache_path = os.path.join(cache_dir(), f"{os.getpid()}-{next(_cache_numbers)}.json.z")
+        with open(self.cache_path, 'wb') as file:
+            file.write(zlib.compress(json.dumps(state).encode('utf-8'), 1))
+        self.unloaded_modified = state['modified']
+        self.journal.detach()
+        self.undo_history.detach()
+        self.lint.diagnostics_ready.disconnect()
+        self.lint.set_enabled(False)
+        self.line_diff.close()
+        self.folding.close()
+        self.qdoc.deleteLater()
+        self.qdoc = self.highlighter = self.tracker = self.completion_index = self.find_index = self.lint = None
+        self.line_diff = self.folding = None
+
+    def restore(self):
+        """Rebuilds an unloaded document from its cache (or from newer disk content, if any arrived)."""
+        if self.loaded:
+            return
+        if self.deferred:
+            text = self.pending_disk_text  # Read ahead in the background, if that finished
+            if text is None:
+                state = read_file_state(self.path)
+                text = state[3] if state is not None else ''
+                self.digest = state[2] if state is not None else None
+                self.encoding = state[4] if state is not None else self.encoding
+            self.pending_disk_text = None
+            self.materialize(text)
+            return
+        with open(self.cache_path, 'rb') as file:
+            state = json.loads(zlib.decompress(file.read()).decode('utf-8'))
+        self.discard_cache()
+        self.breakpoints = set(state['breakpoints'])
+        self.view_state = tuple(state['view_state'])
+        self.diagnostics = {source: [Diagnostic(*d) for d in entries]
+                            for source, entries in state['diagnostics'].items()}
+        self.line_diagnostics = {}
+        if self.pending_disk_text is not None:
+            self.materialize(self.pending_disk_text)
+            self.pending_disk_text = None
+            self.undo_history.clear()  # The steps led to the cached text, not to this one
+        else:
+            self.materialize(state['text'], state['modified'])
+            self.folding.fold_lines(state.get('folds', []))
+        self.set_diagnostics('run', self.diagnostics.get('run', []))
+
+    def discard_cache(self):
+        if self.cache_path:
+            try:
+                os.remove(self.cache_path)
+            except OSError:
+                pass
+            self.cache_path = None
+
+    def close(self):
+        self.discard_cache()
+        self.journal.discard()
+        self.undo_history.clear()
+        if self.loaded:
+            self.lint.set_enabled(False)
+            self.line_diff.close()
+            self.folding.close()
+            self.qdoc.deleteLater()
+            self.qdoc = None
@@ -0,0 +1,141 @@
+import io
+import os
+import hashlib
+import tokenize
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+from utils.background import thread_tasks
+from utils.perf import timed
+
+
+FALLBACK_ENCODING = 'latin-1'  # Decodes any bytes and encodes them back unchanged
+
+
+def decode_file(data):
+    """(text, encoding) of file content ``data``.
+
+    The encoding is the one a BOM or PEP 263 coding line declares, else UTF-8, and is
+    decoded strictly. Content that does not decode falls back to FALLBACK_ENCODING, so
+    saving writes the same bytes back instead of losing them to replacement characters.
+    """
+    try:
+        encoding, _lines = tokenize.detect_encoding(io.BytesIO(data).readline)
+        return data.decode(encoding), encoding
+    except (SyntaxError, LookupError, UnicodeDecodeError):
+        return data.decode(FALLBACK_ENCODING), FALLBACK_ENCODING
+
+
+@timed('file read')
+def read_file_state(path):
+    """Worker: (mtime_ns, size, digest, text, encoding) of ``path``, or None if it is gone.
+
+    ``text`` is decoded by ``decode_file`` with newlines normalised to '\\n', as the editor holds it.
+    """
+    try:
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            data = file.read()
+    except OSError:
+        return None
+    text, encoding = decode_file(data)
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return stat.st_mtime_ns, stat.st_size, content_hash(data), text, encoding
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class FileWatcher(QObject):
+    """Tells open documents when their file changed on disk.
+
+    Bursts of events (a checkout, a formatter rewriting files) are coalesced by a short
+    debounce. A file whose mtime and size are unchanged is skipped without being read;
+    one whose content hash still matches what the editor last loaded or saved is only
+    re-stamped, so touching a file never triggers a reload.
+    """
+    file_changed = pyqtSignal(str, str, str)  # path, new text, its encoding
+    file_removed = pyqtSignal(str)
+
+    def __init__(self, parent=None, delay=300):
+        super().__init__(parent)
+        self.known = {}  # path -> (mtime_ns, size, digest) as last loaded or saved
+        self.dirty = set()
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.check_dirty)
+
+    def watch(self, path, digest=None):
+        """Starts watching ``path``, whose content the editor now holds, e.g. right after loading or saving it.
+
+        ``digest`` is the content hash the editor loaded; it is computed from the file when omitted.
+        """
+        path = os.path.abspath(path)
+        state = read_file_state(path) if digest is None else None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        self.known[path] = (stat.st_mtime_ns, stat.st_size, digest or (state[2] if state else ''))
+        if path not in self.watcher.files():
+            self.watcher.addPath(path)
+
+    def unwatch(self, path):
+        path = os.path.abspath(path)
+        self.known.pop(path, None)
+        self.dirty.discard(path)
+        if path in self.watcher.files():
+            self.watcher.removePath(path)
+
+    def changed_on_disk(self, path):
+        """True if the file differs from what was last loaded or saved (checked synchronously)."""
+        path = os.path.abspath(path)
+        known = self.known.get(path)
+        if known is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+        if (stat.st_mtime_ns, stat.st_size) == known[:2]:
+            return False
+        state = read_file_state(path)
+        return state is None or state[2] != known[2]
+
+    def on_file_changed(self, path):
+        self.dirty.add(path)
+        self.timer.start()
+
+    def check_dirty(self):
+        dirty, self.dirty = self.dirty, set()
+        for path in dirty:
+            known = self.known.get(path)
+            if known is None:
+                continue
+            if path not in self.watcher.files() and os.path.exists(path):
+                # Saving via rename replaces the inode, which drops the watch
+                self.watcher.addPath(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self.file_removed.emit(path)
+                continue
+            if (stat.st_mtime_ns, stat.st_size) == known[:2]:
+                continue
+            thread_tasks().submit(read_file_state, path,
+                                  callback=lambda state, path=path: self.on_read(path, state))
+
+    def on_read(self, path, state):
+        known = self.known.get(path)
+        if known is None:
+            return  # Closed meanwhile
+        if state is None:
+            self.file_removed.emit(path)
+            return
+        mtime, size, digest, text, encoding = state
+        self.known[path] = (mtime, size, digest)
+        if digest != known[2]:
+            self.file_changed.emit(path, text, encoding)
@@ -0,0 +1,335 @@
+import re
+import bisect
+from itertools import accumulate
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLineEdit, QLabel, QToolButton
+from PyQt5.QtCore import QObject, Qt, QTimer, pyqtSignal
+
+from utils.search import SearchSpec, compile_spec
+
+
+class FindIndex(QObject):
+    """Matches of the find query in one buffer, one entry per line, kept current from BlockTracker edits.
+
+    ``line_matches[n]`` is a tuple of (column, length) pairs for line ``n`` (empty when
+    the line has no match). A new query is indexed in time slices; edits re-scan only
+    the lines they touched. Matches never span lines.
+
+    For ``ordinal`` the indexed lines are also grouped into chunks of about
+    ``chunk_lines`` lines with their match counts and prefix sums; an edit re-counts
+    only the chunks it touched, and a lookup bisects to its chunk.
+    """
+    matches_changed = pyqtSignal()
+    chunk_lines = 256
+
+    def __init__(self, tracker, parent=None, slice_lines=2000):
+        super().__init__(parent)
+        self.tracker = tracker
+        self.pattern = None
+        self.line_matches = []
+        self.indexed_upto = 0  # Lines [0, indexed_upto) are in line_matches
+        self.count = 0
+        self.chunk_sizes = []  # Lines in each chunk of line_matches
+        self.chunk_counts = []  # Matches in each chunk
+        self.chunk_starts = []  # First line of each chunk
+        self.chunk_before = []  # Matches before each chunk
+        self.slice_lines = slice_lines
+        self.slice_timer = QTimer(self)
+        self.slice_timer.setInterval(0)
+        self.slice_timer.timeout.connect(self.index_next_slice)
+        tracker.lines_changed.connect(self.on_lines_changed)
+
+    def set_query(self, spec):
+        """Starts indexing ``spec`` (a SearchSpec); None or an empty pattern clears the index.
+
+        Raises re.error for an invalid regex, leaving the index unchanged.
+        """
+        self.pattern = compile_spec(spec, binary=False) if spec and spec.pattern else None
+        self.restart()
+
+    def restart(self):
+        self.line_matches = []
+        self.indexed_upto = 0
+        self.count = 0
+        self.chunk_sizes, self.chunk_counts = [], []
+        self.update_chunks(0, 0, 0)
+        self.slice_timer.stop()
+        if self.pattern is not None:
+            self.slice_timer.start()
+        self.matches_changed.emit()
+
+    def is_complete(self):
+        return self.pattern is None or self.indexed_upto >= self.tracker.line_count()
+
+    def scan(self, lines):
+        pattern = self.pattern
+        found = []
+        for line in lines:
+            matches = tuple((m.start(), m.end() - m.start()) for m in pattern.finditer(line) if m.end() > m.start())
+            self.count += len(matches)
+            found.append(matches)
+        return found
+
+    def forget(self, entries):
+        self.count -= sum(len(matches) for matches in entries)
+
+    def update_chunks(self, first, removed, added):
+        """Re-counts the chunks around lines [first, first + removed), now replaced by ``added`` lines."""
+        sizes, counts = self.chunk_sizes, self.chunk_counts
+        start = max(bisect.bisect_right(self.chunk_starts, first) - 1, 0)
+        end = bisect.bisect_right(self.chunk_starts, first + max(removed - 1, 0)) + 1  # Takes in the next chunk too
+        region_start = self.chunk_starts[start] if sizes else 0
+        region_end = region_start + sum(sizes[start:end]) - removed + added
+        pieces = list(range(region_start, region_end, self.chunk_lines)) + [region_end]
+        if len(pieces) > 2 and pieces[-1] - pieces[-2] < self.chunk_lines // 2:
+            del pieces[-2]  # A short remainder joins the piece before it
+        sizes[start:end] = [stop - begin for begin, stop in zip(pieces, pieces[1:]) if stop > begin]
+        counts[start:end] = [sum(len(matches) for matches in self.line_matches[begin:stop])
+                             for begin, stop in zip(pieces, pieces[1:]) if stop > begin]
+        self.chunk_starts = list(accumulate(sizes, initial=0))[:-1]
+        self.chunk_before = list(accumulate(counts, initial=0))[:-1]
+
+    def index_next_slice(self):
+        end = min(self.indexed_upto + self.slice_lines, self.tracker.line_count())
+        self.line_matches.extend(self.scan(self.tracker.lines[self.indexed_upto:end]))
+        self.update_chunks(self.indexed_upto, 0, end - self.indexed_upto)
+        self.indexed_upto = end
+        if end >= self.tracker.line_count():
+            self.slice_timer.stop()
+        self.matches_changed.emit()
+
+    def on_lines_changed(self, first, old, new):
+        if self.pattern is None:
+            return
+        if first == 0 and len(old) > self.slice_lines:
+            self.restart()  # Whole-document replacement
+            return
+        if len(new) > self.slice_lines and first < self.indexed_upto:
+            # Large paste: the lines from it on are re-scanned in slices
+            self.forget(self.line_matches[first:])
+            del self.line_matches[first:]
+            self.update_chunks(first, self.indexed_upto - first, 0)
+            self.indexed_upto = first
+        elif first + len(old) <= self.indexed_upto:
+            self.forget(self.line_matches[first:first + len(old)])
+            self.line_matches[first:first + len(old)] = self.scan(new)
+            self.update_chunks(first, len(old), len(new))
+            self.indexed_upto += len(new) - len(old)
+        elif first < self.indexed_upto:
+            # The edit straddles the indexed boundary; the rest is picked up by the next slice
+            self.forget(self.line_matches[first:])
+            del self.line_matches[first:]
+            self.line_matches.extend(self.scan(new))
+            self.update_chunks(first, self.indexed_upto - first, len(new))
+            self.indexed_upto = first + len(new)
+        else:
+            return
+        if self.indexed_upto < self.tracker.line_count() and not self.slice_timer.isActive():
+            self.slice_timer.start()
+        self.matches_changed.emit()
+
+    def matches_on(self, line):
+        return self.line_matches[line] if line < self.indexed_upto else ()
+
+    def next_match(self, line, column, backwards=False):
+        """The (line, column, length) of the nearest indexed match after (or before) the position, wrapping."""
+        count = self.indexed_upto
+        if not count or not self.count:
+            return None
+        for step in range(count + 1):
+            number = (line - step if backwards else line + step) % count
+            matches = self.line_matches[number]
+            if not matches:
+                continue
+            if step == 0:
+                candidates = [m for m in matches if (m[0] < column if backwards else m[0] >= column)]
+            elif step == count:
+                candidates = [m for m in matches if (m[0] >= column if backwards else m[0] < column)]
+            else:
+                candidates = list(matches)
+            if candidates:
+                start, length = candidates[-1] if backwards else candidates[0]
+                return number, start, length
+        return None
+
+    def ordinal(self, line, column):
+        """1-based position of the match starting at (line, column) among all matches."""
+        if line >= self.indexed_upto:
+            return self.count + 1
+        chunk = bisect.bisect_right(self.chunk_starts, line) - 1
+        before = self.chunk_before[chunk] + sum(len(matches) for matches in self.line_matches[self.chunk_starts[chunk]:line])
+        return before + sum(1 for start, _ in self.matches_on(line) if start < column) + 1
+
+
+class FindBar(QWidget):
+    """Incremental find bar shown over the top-right corner of a CodeEditor."""
+    closed = pyqtSignal()
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+        self.index = None
+        self.anchor = None  # (line, column) where typing started; incremental search restarts there
+        self.current = None  # (line, column, length) of the selected match
+        self.setAutoFillBackground(True)
+        self.query_edit = QLineEdit(self)
+        self.query_edit.setPlaceholderText("Find")
+        self.query_edit.setMinimumWidth(220)
+        self.count_label = QLabel(self)
+        self.count_label.setMinimumWidth(90)
+        self.case_button = self.toggle_button("Aa", "Match Case")
+        self.word_button = self.toggle_button("W", "Whole Word")
+        self.regex_button = self.toggle_button(".*", "Regex")
+        previous_button = QToolButton(self)
+        previous_button.setText("↑")
+        previous_button.setToolTip("Previous Match (Shift+Enter)")
+        previous_button.clicked.connect(lambda: self.find_next(backwards=True))
+        next_button = QToolButton(self)
+        next_button.setText("↓")
+        next_button.setToolTip("Next Match (Enter)")
+        next_button.clicked.connect(self.find_next)
+        close_button = QToolButton(self)
+        close_button.setText("✕")
+        close_button.clicked.connect(self.close_bar)
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(4, 2, 4, 2)
+        for widget in (self.query_edit, self.count_label, self.case_button, self.word_button, self.regex_button,
+                       previous_button, next_button, close_button):
+            layout.addWidget(widget)
+
+        self.query_edit.textChanged.connect(self.on_query_changed)
+        self.query_edit.installEventFilter(self)
+        self.hide()
+
+    def set_index(self, index):
+        """Switches to the FindIndex of another document, carrying an active query over to it."""
+        if self.index is not None:
+            try:
+                self.index.matches_changed.disconnect(self.on_matches_changed)
+                self.index.set_query(None)
+            except RuntimeError:
+                pass  # Its document was unloaded
+        self.index = index
+        self.current = None
+        index.matches_changed.connect(self.on_matches_changed)
+        if self.isVisible():
+            self.anchor = None
+            self.on_query_changed()
+
+    def toggle_button(self, text, tooltip):
+        button = QToolButton(self)
+        button.setText(text)
+        button.setToolTip(tooltip)
+        button.setCheckable(True)
+        button.toggled.connect(self.on_query_changed)
+        return button
+
+    def open_bar(self):
+        cursor = self.editor.textCursor()
+        selected = cursor.selectedText()
+        block = self.editor.document().findBlock(cursor.selectionStart())
+        self.anchor = (block.blockNumber(), cursor.selectionStart() - block.position())
+        self.show()
+        self.reposition()
+        if selected and '\u2029' not in selected:  # Single-line selections only
+            self.query_edit.setText(selected)
+        elif self.query_edit.text():
+            self.on_query_changed()
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+
+    def close_bar(self):
+        self.hide()
+        self.index.set_query(None)
+        self.current = None
+        self.editor.setFocus()
+        self.editor.viewport().update()
+        self.closed.emit()
+
+    def reposition(self):
+        self.adjustSize()
+        viewport = self.editor.viewport().geometry()
+        self.move(viewport.right() - self.width() - 16, viewport.top() + 4)
+
+    def spec(self):
+        return SearchSpec(self.query_edit.text(), self.regex_button.isChecked(),
+                          self.case_button.isChecked(), self.word_button.isChecked())
+
+    def on_query_changed(self, *_):
+        self.current = None
+        try:
+            self.index.set_query(self.spec())
+        except re.error as error:
+            self.index.set_query(None)
+            self.count_label.setText("Invalid")
+            self.count_label.setToolTip(str(error))
+            return
+        self.count_label.setToolTip('')
+
+    def on_matches_changed(self):
+        if not self.isVisible():
+            return
+        if self.current is None and self.anchor is not None and self.index.count:
+            # Incremental search: select the first match at or after where the search started,
+            # as soon as the index has reached it
+            found = self.index.next_match(*self.anchor)
+            if found and (found[:2] >= tuple(self.anchor) or self.index.is_complete()):
+                self.select(found)
+        elif self.current is not None:
+            # Edits move the selection along with the text; keep it current while it is still a match
+            self.current = self.selected_match()
+        self.update_count()
+        self.editor.viewport().update()
+
+    def update_count(self):
+        if not self.query_edit.text():
+            self.count_label.setText('')
+            return
+        total = f"{self.index.count}" if self.index.is_complete() else f"{self.index.count}…"
+        if self.current is not None:
+            self.count_label.setText(f"{self.index.ordinal(self.current[0], self.current[1])} of {total}")
+        else:
+            self.count_label.setText(f"{total} matches" if self.index.count else "No results")
+
+    def find_next(self, backwards=False):
+        if self.current is not None:
+            line, column, length = self.current
+            column = column if backwards else column + max(length, 1)
+        else:
+            cursor = self.editor.textCursor()
+            line = cursor.block().blockNumber()
+            column = (cursor.selectionStart() if backwards else cursor.selectionEnd()) - cursor.block().position()
+        found = self.index.next_match(line, column, backwards)
+        if found:
+            self.select(found)
+            self.anchor = found[:2]
+            self.update_count()
+
+    def selected_match(self):
+        cursor = self.editor.textCursor()
+        if not cursor.hasSelection():
+            return None
+        block = self.editor.document().findBlock(cursor.selectionStart())
+        match = (cursor.selectionStart() - block.position(), cursor.selectionEnd() - cursor.selectionStart())
+        return (block.blockNumber(),) + match if match in self.index.matches_on(block.blockNumber()) else None
+
+    def select(self, match):
+        line, column, length = match
+        self.current = match
+        block = self.editor.document().findBlockByNumber(line)
+        cursor = self.editor.textCursor()
+        cursor.setPosition(block.position() + column)
+        cursor.setPosition(block.position() + column + length, cursor.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.centerCursor()
+        self.editor.viewport().update()
+
+    def eventFilter(self, obj, event):
+        if obj is self.query_edit and event.type() == event.KeyPress:
+            if event.key() in (Qt.Key_Return, Qt.Key_Enter):
+                self.find_next(backwards=bool(event.modifiers() & Qt.ShiftModifier))
+                return True
+            if event.key() == Qt.Key_Escape:
+                self.close_bar()
+                return True
+        return super().eventFilter(obj, event)
@@ -0,0 +1,239 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from utils.background import process_tasks
+from utils.folding import BLANK, line_indent, ast_fold_ranges
+
+
+class FoldIndex(QObject):
+    """Fold ranges of a document and which of them are folded.
+
+    Ranges come from indentation, kept per line and updated for just the lines an edit
+    touched, and for Python from the ``ast`` (brackets, strings, ``if`` before ``else``),
+    recomputed in a worker process once typing pauses. Folding hides the blocks of a
+    range with ``QTextBlock.setVisible`` and marks only those blocks for re-layout.
+    """
+    folds_changed = pyqtSignal()
+
+    def __init__(self, tracker, qdoc, use_ast=False, parent=None, delay=1000):
+        super().__init__(parent)
+        self.tracker = tracker
+        self.qdoc = qdoc
+        self.indents = [line_indent(line) for line in tracker.lines]
+        self.ast_ranges = {}  # First line -> last line, from the last text that parsed
+        self.folded = {}  # Header line -> last hidden line
+        self.use_ast = use_ast
+        self.in_flight = False
+        self.dirty = False
+        self.closed = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.parse_now)
+        tracker.lines_changed.connect(self.on_lines_changed)
+        if use_ast:
+            self.timer.start()
+
+    def set_use_ast(self, use_ast):
+        self.use_ast = use_ast
+        if use_ast:
+            self.timer.start()
+        else:
+            self.timer.stop()
+            self.ast_ranges = {}
+
+    def close(self):
+        self.closed = True
+        self.timer.stop()
+
+    def parse_now(self):
+        if not self.use_ast or self.closed:
+            return
+        if self.in_flight:
+            self.dirty = True
+            return
+        self.in_flight = True
+        self.dirty = False
+        process_tasks().submit(ast_fold_ranges, self.qdoc.toPlainText(), callback=self.on_ranges,
+                               error_callback=lambda error: self.on_ranges(None))
+
+    def on_ranges(self, ranges):
+        self.in_flight = False
+        if self.closed or not self.use_ast:
+            return
+        if self.dirty or self.timer.isActive():
+            self.timer.start()  # Line numbers of the parsed text are already stale
+        elif ranges is not None:
+            self.ast_ranges = ranges
+            self.folds_changed.emit()
+
+    def on_lines_changed(self, first, old, new):
+        delta = len(new) - len(old)
+        self.indents[first:first + len(old)] = [line_indent(line) for line in new]
+        edited_last = first + len(old) - 1
+        if delta:
+            # Ranges below the edit move with it; ranges around it stretch; ranges cut by it wait for the next parse
+            shifted = {}
+            for start, end in self.ast_ranges.items():
+                if end < first:
+                    shifted[start] = end
+                elif start > edited_last:
+                    shifted[start + delta] = end + delta
+                elif start < first and end >= edited_last:
+                    shifted[start] = end + delta
+            self.ast_ranges = shifted
+        if self.folded:
+            self.update_folds(first, edited_last, len(old), len(new))
+        if self.use_ast:
+            self.timer.start()
+
+    def update_folds(self, first, edited_last, old_count, new_count):
+        delta = new_count - old_count
+        folded = {}
+        reopened = []
+        for header, end in self.folded.items():
+            if end < first:
+                folded[header] = end
+            elif header > edited_last:
+                folded[header + delta] = end + delta
+            elif header == first and old_count == new_count == 1:
+                folded[header] = end  # Typing on the header line keeps its fold
+            else:
+                reopened.append((header, end))
+        self.folded = folded
+        for header, end in reopened:
+            self.show_lines(header, min(end + delta, len(self.indents) - 1))
+        if reopened:
+            self.folds_changed.emit()
+
+    # Ranges
+
+    def indent_end(self, line):
+        """Last line of the block indented under ``line``, or None if nothing is."""
+        indents = self.indents
+        indent = indents[line]
+        if indent == BLANK:
+            return None
+        end = None
+        for number in range(line + 1, len(indents)):
+            if indents[number] == BLANK:
+                continue
+            if indents[number] <= indent:
+                break
+            end = number
+        return end
+
+    def fold_end(self, line):
+        """Last line of the range ``line`` opens, or None if it opens none."""
+        end = self.ast_ranges.get(line)
+        if end is not None and end < len(self.indents):
+            return end
+        return self.indent_end(line)
+
+    def is_foldable(self, line):
+        if line in self.ast_ranges:
+            return True
+        indents = self.indents
+        indent = indents[line]
+        if indent == BLANK:
+            return False
+        for number in range(line + 1, len(indents)):
+            if indents[number] != BLANK:
+                return indents[number] > indent
+        return False
+
+    def enclosing_header(self, line, strict=False):
+        """The nearest line at or above ``line`` (above only, if ``strict``) whose range contains it, or None."""
+        indents = self.indents
+        # A blank line belongs with the code below it
+        indent = next((indent for indent in indents[line:] if indent != BLANK), 0)
+        for number in range(line - 1 if strict else line, -1, -1):
+            candidate = indents[number]
+            if (number != line or strict) and (candidate == BLANK or candidate >= indent):
+                continue
+            end = self.fold_end(number)
+            if end is not None and end >= line:
+                return number
+            if candidate == 0:
+                return None
+        return None
+
+    # Folding
+
+    def fold(self, line):
+        end = self.fold_end(line)
+        if end is None or line in self.folded:
+            return False
+        self.folded[line] = end
+        self.set_lines_visible(line + 1, end, False)
+        self.folds_changed.emit()
+        return True
+
+    def unfold(self, line):
+        end = self.folded.pop(line, None)
+        if end is None:
+            return False
+        self.show_lines(line + 1, end)
+        self.folds_changed.emit()
+        return True
+
+    def toggle(self, line):
+        return self.unfold(line) or self.fold(line)
+
+    def fold_lines(self, lines):
+        for line in sorted(lines, reverse=True):  # Inner folds first, so outer ones still hide everything
+            if 0 <= line < len(self.indents):
+                self.fold(line)
+
+    def fold_all(self):
+        for line in range(len(self.indents)):
+            if line not in self.folded and self.is_foldable(line):
+                end = self.fold_end(line)
+                if end is not None:
+                    self.folded[line] = end
+        # Nested ranges are already hidden by the outermost ones
+        hidden_until = -1
+        for header in sorted(self.folded):
+            if header > hidden_until:
+                self.set_lines_visible(header + 1, self.folded[header], False)
+                hidden_until = self.folded[header]
+        self.folds_changed.emit()
+
+    def unfold_all(self):
+        if not self.folded:
+            return
+        self.folded = {}
+        self.set_lines_visible(0, len(self.indents) - 1, True)
+        self.folds_changed.emit()
+
+    def reveal(self, line):
+        """Unfolds every fold hiding ``line``."""
+        hiding = [header for header, end in self.folded.items() if header < line <= end]
+        for header in sorted(hiding):
+            self.unfold(header)
+        return bool(hiding)
+
+    def show_lines(self, first, last):
+        """Shows lines ``first .. last``, except those still hidden by folds nested inside."""
+        line = first
+        while line <= last:
+            end = line
+            while end < last and end not in self.folded:
+                end += 1
+            self.set_lines_visible(line, end, True)
+            nested_end = self.folded.get(end)  # A folded header stays visible; its range does not
+            line = nested_end + 1 if nested_end is not None else end + 1
+
+    def set_lines_visible(self, first, last, visible):
+        block = self.qdoc.findBlockByNumber(first)
+        if not block.isValid() or last < first:
+            return
+        start = block.position()
+        end_block = block
+        for _ in range(last - first + 1):
+            if not block.isValid():
+                break
+            block.setVisible(visible)
+            end_block = block
+            block = block.next()
+        # Only the blocks whose visibility changed are laid out again
+        self.qdoc.markContentsDirty(start, end_block.position() + end_block.length() - start)
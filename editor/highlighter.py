@@ -0,0 +1,148 @@
+import re
+import time
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QColor, QSyntaxHighlighter, QTextCharFormat
+
+from editor.brackets import BracketIndex
+from utils.perf import record
+
+COLUMN_LIMIT = 4000  # Columns past this are left plain, so very long lines cost no more than this
+RESTYLE_STEP = 500  # Blocks restyled per event-loop turn after a theme switch
+
+
+class HighlightEngine:
+    """Compiled highlighting rules and formats, shared by the highlighters of all open documents."""
+
+    def __init__(self):
+        self.error_format = QTextCharFormat()
+        self.error_format.setBackground(QColor("red"))
+        self.keyword_format = QTextCharFormat()
+        self.keyword_format.setForeground(QColor("blue"))
+        self.keywords = ["def", "class", "import", "from", "return", "if", "elif", "else", "while", "for", "try", "except"]
+        # One alternation instead of one pattern per keyword: a single pass over each line
+        self.keyword_pattern = re.compile(r'\b(?:' + '|'.join(self.keywords) + r')\b')
+        self.generation = 0  # Bumped whenever the formats change
+
+    def set_formats(self, formats):
+        """Swaps in a theme's formats; each highlighter restyles its document on its next ``restyle()``."""
+        self.keyword_format = formats['keyword']
+        self.error_format = formats['error']
+        self.generation += 1
+
+    def highlight(self, highlighter, text, is_error):
+        if is_error:
+            highlighter.setFormat(0, len(text), self.error_format)
+        for match in self.keyword_pattern.finditer(text, 0, COLUMN_LIMIT):
+            highlighter.setFormat(match.start(), match.end() - match.start(), self.keyword_format)
+
+
+_engine = None
+
+
+def shared_engine():
+    global _engine
+    if _engine is None:
+        _engine = HighlightEngine()
+    return _engine
+
+
+class SyntaxHighlighter(QSyntaxHighlighter):
+    """Per-document adapter: keeps the document's error lines and delegates to the shared engine.
+
+    Each pass also records the block's brackets for the document's BracketIndex.
+    """
+
+    def __init__(self, document, engine=None):
+        super().__init__(document)
+        self.engine = engine or shared_engine()
+        self.error_lines = set()
+        self.brackets = BracketIndex(document)
+        self.generation = self.engine.generation
+        self.restyle_from = None  # Blocks from here on still carry the previous theme's formats
+        self.restyle_timer = QTimer(self)
+        self.restyle_timer.setInterval(0)
+        self.restyle_timer.timeout.connect(self.restyle_step)
+        # The first pass runs now rather than from Qt's deferred timer, so it too goes
+        # through rehighlight() below
+        self.rehighlight()
+        self.brackets.build()
+
+    @property
+    def error_line(self):
+        return min(self.error_lines) if self.error_lines else -1
+
+    def rehighlight(self):
+        self.keep_modified(super().rehighlight)
+        self.generation = self.engine.generation
+        self.restyle_from = None
+        self.restyle_timer.stop()
+
+    def rehighlightBlock(self, block):
+        self.keep_modified(super().rehighlightBlock, block)
+
+    @property
+    def stale(self):
+        """True while some blocks may still show formats from before the last theme switch."""
+        return self.generation != self.engine.generation or self.restyle_from is not None
+
+    def restyle(self, first, last):
+        """Brings blocks ``first``..``last`` (the visible ones) up to the engine's current formats now.
+
+        After a theme switch the rest of the document follows in small steps from the event
+        loop, so switching costs only the visible region up front.
+        """
+        if self.generation != self.engine.generation:
+            self.generation = self.engine.generation
+            self.restyle_from = 0
+            self.restyle_timer.start()
+        elif self.restyle_from is None or last < self.restyle_from:
+            return
+        self.rehighlight_blocks(self.document().findBlockByNumber(first), last - first + 1)
+
+    def restyle_step(self):
+        block = self.document().findBlockByNumber(self.restyle_from)
+        self.rehighlight_blocks(block, RESTYLE_STEP)
+        self.restyle_from += RESTYLE_STEP
+        if self.restyle_from >= self.document().blockCount():
+            self.restyle_from = None
+            self.restyle_timer.stop()
+
+    def rehighlight_blocks(self, block, count):
+        self.keep_modified(self.rehighlight_run, block, count)
+
+    def rehighlight_run(self, block, count):
+        while block.isValid() and count > 0:
+            super().rehighlightBlock(block)
+            block = block.next()
+            count -= 1
+
+    def keep_modified(self, rehighlight, *args):
+        # QSyntaxHighlighter wraps a rehighlight in an edit block, and with Qt's undo stack
+        # disabled (see UndoHistory) even an edit block that changes no text marks the
+        # document modified
+        document = self.document()
+        modified = document.isModified()
+        rehighlight(*args)
+        if not modified:
+            document.setModified(False)
+
+    def highlightBlock(self, text):
+        start = time.perf_counter()
+        self.engine.highlight(self, text, self.currentBlock().blockNumber() in self.error_lines)
+        self.brackets.set_block(self, text)
+        record('highlight', time.perf_counter() - start)
+
+    def set_error_line(self, line):
+        self.set_error_lines({line - 1})  # Convert to 0-based index
+
+    def clear_error_line(self):
+        self.set_error_lines(set())
+
+    def set_error_lines(self, lines):
+        # Only re-highlight the blocks whose error state actually changed
+        changed = self.error_lines ^ set(lines)
+        self.error_lines = set(lines)
+        for line in changed:
+            block = self.document().findBlockByNumber(line)
+            if block.isValid():
+                self.rehighlightBlock(block)
@@ -0,0 +1,143 @@
+import logging
+import os
+import sys
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from utils.background import BackgroundTasks, thread_tasks
+from utils.interpreters import (VENV, CONDA, discover_interpreters, probe_interpreter,
+                                load_interpreter_cache, save_interpreter_cache)
+
+logger = logging.getLogger(__name__)
+
+
+class InterpreterManager(QObject):
+    """The Pythons available to a workspace and the one selected for it.
+
+    Discovery only stats files on a worker thread. Each interpreter is probed (version,
+    prefix, site-packages, packages) by running it once; probes run side by side on a
+    pool of their own, so a slow interpreter never holds up the shared one, and results
+    are cached on disk keyed on the interpreter's and its site-packages' mtimes, so a
+    launch re-runs only interpreters that changed. Interpreters shipped inside the
+    workspace are only run once the user selects one of them.
+    """
+    interpreters_changed = pyqtSignal()
+
+    def __init__(self, root, parent=None):
+        super().__init__(parent)
+        self.cache = load_interpreter_cache()
+        self.found = []  # [(path, kind)] for the current root, in discovery order
+        self.probing = set()
+        self.probe_tasks = BackgroundTasks(self, max_workers=2)
+        self.generation = 0  # Bumped on every discovery; results for an older root are dropped
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(500)
+        self.save_timer.timeout.connect(self.save)
+        self.root = None
+        self.set_root(root)
+
+    def set_root(self, root):
+        self.root = os.path.abspath(root)
+        self.found = []
+        self.refresh()
+
+    def refresh(self):
+        self.generation += 1
+        generation = self.generation
+        thread_tasks().submit(discover_interpreters, self.root, dict(self.cache['probes']),
+                              callback=lambda result: self.on_discovered(generation, result))
+
+    def on_discovered(self, generation, result):
+        if generation != self.generation:
+            return
+        self.found, stale = result
+        for path, kind in stale:
+            if not self.in_workspace(path) or self.cache['selected'].get(self.root) == path:
+                self.probe(path, kind)
+        self.interpreters_changed.emit()
+
+    def probe(self, path, kind):
+        if path in self.probing:
+            return
+        self.probing.add(path)
+        self.probe_tasks.submit(probe_interpreter, path, kind, callback=lambda entry: self.on_probed(path, entry),
+                                error_callback=lambda error: self.probing.discard(path))
+
+    def on_probed(self, path, entry):
+        self.probing.discard(path)
+        self.cache['probes'][path] = entry
+        self.save_timer.start()
+        self.interpreters_changed.emit()
+
+    def reprobe(self, path):
+        """Probes ``path`` again now, e.g. after pip changed its packages."""
+        entry = self.cache['probes'].get(path)
+        self.probe(path, entry['kind'] if entry else dict(self.found).get(path, VENV))
+
+    def save(self):
+        thread_tasks().submit(save_interpreter_cache, {'probes': dict(self.cache['probes']),
+                                                       'selected': dict(self.cache['selected'])},
+                              error_callback=lambda error: logger.warning(f"Could not save the interpreter cache: {error!r}"))
+
+    def close(self):
+        self.probe_tasks.shutdown()
+
+    # Queries
+
+    def in_workspace(self, path):
+        """True for an interpreter inside the workspace, which the workspace's author controls."""
+        return path.startswith(self.root + os.sep)
+
+    def unchecked(self, path):
+        """True for a workspace interpreter that was never run, since nobody selected it yet."""
+        return self.in_workspace(path) and path not in self.probing and path not in self.cache['probes']
+
+    def interpreters(self):
+        """[(path, entry)] of the working interpreters found; entry is None while one is being probed or is unchecked."""
+        probes = self.cache['probes']
+        listed = []
+        for path, _kind in self.found:
+            entry = probes.get(path)
+            if path in self.probing or entry is None:
+                listed.append((path, None))
+            elif entry.get('version'):
+                listed.append((path, entry))
+        return listed
+
+    def selected(self):
+        """The interpreter for the workspace: the one picked for it, else an environment inside it, else the editor's own."""
+        path = self.cache['selected'].get(self.root)
+        if path and os.path.isfile(path):
+            return path
+        # Until discovery finishes, the cache already knows the environments probed before
+        found = self.found or [(path, entry['kind']) for path, entry in self.cache['probes'].items()]
+        for path, kind in found:
+            if kind in (VENV, CONDA) and self.in_workspace(path) and os.path.isfile(path):
+                return path
+        return sys.executable
+
+    def select(self, path):
+        self.cache['selected'][self.root] = path
+        self.save_timer.start()
+        if self.unchecked(path):
+            self.probe(path, dict(self.found).get(path, VENV))  # Selecting it is the user's go-ahead to run it
+        self.interpreters_changed.emit()
+
+    def packages(self, path):
+        """[(name, version)] installed for ``path`` as of its last probe, or None if it has none."""
+        entry = self.cache['probes'].get(path)
+        if entry is None or path in self.probing or not entry.get('version'):
+            return None
+        return [tuple(package) for package in entry['packages']]
+
+    def describe(self, path):
+        entry = self.cache['probes'].get(path)
+        kind = entry['kind'] if entry else dict(self.found).get(path)
+        version = entry.get('version') if entry else None
+        label = f"Python {version}" if version else "Python"
+        prefix = (entry or {}).get('prefix') or os.path.dirname(os.path.dirname(path))
+        if self.in_workspace(path):
+            where = os.path.relpath(prefix, self.root)
+        else:
+            where = prefix.replace(os.path.expanduser('~'), '~', 1)
+        return f"{label} ({kind or 'unknown'}: {where})"
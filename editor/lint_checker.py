@@ -0,0 +1,74 @@
+import hashlib
+from collections import OrderedDict
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from utils.background import process_tasks
+from utils.lint import analyze_source
+
+
+class LintChecker(QObject):
+    """Re-checks a document in a worker process once typing pauses.
+
+    Results are cached by content hash, so undoing back to a checked state (or
+    re-opening an unchanged file) never re-analyses it. At most one analysis is in
+    flight; edits made meanwhile are picked up when it returns.
+    """
+    diagnostics_ready = pyqtSignal(list)
+
+    def __init__(self, document, parent=None, delay=400, cache_size=32):
+        super().__init__(parent)
+        self.document = document
+        self.enabled = True
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.in_flight = None  # content hash being analysed
+        self.dirty = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.check_now)
+        document.contentsChanged.connect(self.schedule)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if enabled:
+            self.schedule()
+        else:
+            self.timer.stop()
+            self.diagnostics_ready.emit([])
+
+    def schedule(self):
+        if self.enabled:
+            self.timer.start()
+
+    def check_now(self):
+        if not self.enabled:
+            return
+        if self.in_flight is not None:
+            self.dirty = True
+            return
+        text = self.document.toPlainText()
+        key = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.diagnostics_ready.emit(self.cache[key])
+            return
+        self.in_flight = key
+        process_tasks().submit(analyze_source, text,
+                               callback=lambda result: self.on_result(key, result),
+                               error_callback=lambda error: self.on_result(key, None))
+
+    def on_result(self, key, diagnostics):
+        self.in_flight = None
+        if not self.enabled:
+            return  # Disabled (or its document unloaded) while the analysis ran
+        if diagnostics is not None:
+            self.cache[key] = diagnostics
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        if self.dirty or self.timer.isActive():
+            # The buffer moved on while we were busy; these line numbers are already stale
+            self.dirty = False
+            self.timer.start()
+        elif diagnostics is not None and self.enabled:
+            self.diagnostics_ready.emit(diagnostics)
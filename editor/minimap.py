@@ -0,0 +1,256 @@
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtGui import QColor, QImage, QPainter
+from PyQt5.QtCore import Qt, QPoint, QRect, QTimer
+
+from editor.diff_gutter import ADDED, MODIFIED, DELETED, MARKER_COLORS as DIFF_COLORS
+from utils.background import thread_tasks
+from utils.folding import TAB_WIDTH
+
+TILE_LINES = 128  # Lines per cached image
+LINE_PIXELS = 2  # A row of ink and a row of gap per line
+MAP_COLUMNS = 80  # One pixel per character; longer lines are cut off
+RULER_WIDTH = 6
+MINIMAP_WIDTH = MAP_COLUMNS + RULER_WIDTH
+MAX_TILES = 64  # Cached images beyond this are dropped, farthest from the view first
+RENDER_DELAY = 100  # ms after the last edit before the visible tiles are redrawn
+SLIDER_COLOR = QColor(128, 128, 128, 60)
+FIND_COLOR = QColor(255, 170, 0)
+BREAKPOINT_COLOR = QColor(Qt.red)
+
+# Byte -> color index: 0 blank, 1 word characters, 2 everything else
+INK = bytes(0 if chr(byte) in ' \t\0' else 1 if chr(byte).isalnum() or byte == ord('_') else 2 for byte in range(256))
+
+
+def render_tile(lines, colors):
+    """Worker: an image of ``lines``, one row of pixels per line and one per character.
+
+    Characters are classed with one ``bytes.translate`` per line, so a tile costs the
+    GUI thread nothing and the worker very little.
+    """
+    gap = bytes(MAP_COLUMNS * (LINE_PIXELS - 1))
+    rows = []
+    for line in lines:
+        row = line[:MAP_COLUMNS].expandtabs(TAB_WIDTH)[:MAP_COLUMNS].encode('latin-1', 'replace').translate(INK)
+        rows.append(row.ljust(MAP_COLUMNS, b'\0'))
+        rows.append(gap)
+    data = b''.join(rows)
+    image = QImage(data, MAP_COLUMNS, len(lines) * LINE_PIXELS, MAP_COLUMNS, QImage.Format_Indexed8).copy()
+    image.setColorTable(colors)
+    return image
+
+
+class Minimap(QWidget):
+    """Overview of the shown document beside the editor, with a ruler of its markers.
+
+    The text is drawn into images of TILE_LINES lines, rendered on a worker thread from a
+    snapshot of the BlockTracker lines; painting only blits them. An edit marks the tiles
+    it touches stale, and those are redrawn once typing pauses and only while in view.
+    The ruler at the right edge spans the whole document: diff changes, search hits,
+    diagnostics and breakpoints. Clicking or dragging scrolls the editor there.
+    """
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+        self.doc = None
+        self.generation = 0  # Bumped when the document or colors change; older renders are dropped
+        self.tiles = {}  # Tile -> QImage, possibly stale
+        self.stale = set()  # Tiles whose image no longer matches the text
+        self.in_flight = set()
+        self.wanted = []  # Tiles in view at the last paint
+        self.marks = None  # [(lane, first line, last line, color)] for the ruler; None until rebuilt
+        self.background = QColor(Qt.lightGray)
+        self.colors = []
+        self.set_colors(QColor(Qt.lightGray), QColor(Qt.black))
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.setInterval(RENDER_DELAY)
+        self.render_timer.timeout.connect(self.render_stale)
+        self.setCursor(Qt.PointingHandCursor)
+        editor.buffer_changed.connect(self.set_document)
+        editor.breakpoints_changed.connect(self.invalidate_marks)
+        editor.verticalScrollBar().valueChanged.connect(self.update)
+
+    def set_colors(self, background, foreground):
+        self.background = background
+        word, other = QColor(foreground), QColor(foreground)
+        word.setAlpha(170)
+        other.setAlpha(90)
+        self.colors = [QColor(0, 0, 0, 0).rgba(), word.rgba(), other.rgba()]
+        self.reset()
+
+    def set_document(self, document):
+        if self.doc is not None and self.doc.loaded:
+            self.doc.tracker.lines_changed.disconnect(self.on_lines_changed)
+            self.doc.diagnostics_changed.disconnect(self.invalidate_marks)
+            self.doc.find_index.matches_changed.disconnect(self.invalidate_marks)
+            self.doc.line_diff.changed.disconnect(self.invalidate_marks)
+        self.doc = document
+        document.tracker.lines_changed.connect(self.on_lines_changed)
+        document.diagnostics_changed.connect(self.invalidate_marks)
+        document.find_index.matches_changed.connect(self.invalidate_marks)
+        document.line_diff.changed.connect(self.invalidate_marks)
+        self.reset()
+
+    def reset(self):
+        self.generation += 1
+        self.tiles = {}
+        self.stale = set()
+        self.in_flight = set()
+        self.marks = None
+        self.update()
+
+    def on_lines_changed(self, first, old, new):
+        first_tile = first // TILE_LINES
+        if len(old) == len(new):
+            last_tile = (first + max(len(new), 1) - 1) // TILE_LINES
+        else:
+            last_tile = None  # Every line below moved
+        for tile in list(self.tiles) + list(self.in_flight):
+            if tile >= first_tile and (last_tile is None or tile <= last_tile):
+                self.stale.add(tile)
+        if last_tile is None:
+            self.marks = None
+        self.update()
+
+    def invalidate_marks(self):
+        self.marks = None
+        self.update()
+
+    def resizeEvent(self, event):
+        self.marks = None  # Search hits are gathered per ruler row
+        super().resizeEvent(event)
+
+    # Geometry
+
+    def line_count(self):
+        return self.doc.tracker.line_count()
+
+    def top_line(self):
+        """First document line at the top of the map; the map scrolls in step with the editor."""
+        spare = self.line_count() - self.height() // LINE_PIXELS
+        if spare <= 0:
+            return 0
+        scroll_bar = self.editor.verticalScrollBar()
+        return round(spare * scroll_bar.value() / max(scroll_bar.maximum(), 1))
+
+    def line_at(self, pos):
+        if pos.x() >= MAP_COLUMNS:
+            line = pos.y() * self.line_count() // max(self.height(), 1)  # The ruler spans the whole document
+        else:
+            line = self.top_line() + pos.y() // LINE_PIXELS
+        return max(0, min(line, self.line_count() - 1))
+
+    # Rendering
+
+    def request(self, tile):
+        if tile in self.in_flight:
+            return
+        first = tile * TILE_LINES
+        lines = self.doc.tracker.lines[first:first + TILE_LINES]
+        if not lines:
+            return
+        self.stale.discard(tile)
+        self.in_flight.add(tile)
+        generation = self.generation
+        thread_tasks().submit(render_tile, lines, self.colors,
+                              callback=lambda image: self.on_tile(generation, tile, image),
+                              error_callback=lambda error: self.on_tile(generation, tile, None))
+
+    def on_tile(self, generation, tile, image):
+        if generation != self.generation:
+            return
+        self.in_flight.discard(tile)
+        if image is None:
+            return
+        self.tiles[tile] = image
+        if len(self.tiles) > MAX_TILES:
+            center = self.top_line() // TILE_LINES
+            for old in sorted(self.tiles, key=lambda old: abs(old - center))[MAX_TILES:]:
+                del self.tiles[old]
+                self.stale.discard(old)
+        self.update()
+
+    def render_stale(self):
+        for tile in self.wanted:
+            if tile in self.stale:
+                self.request(tile)
+
+    def paintEvent(self, event):
+        if self.doc is None or not self.doc.loaded:
+            return
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), self.background)
+        line_count = self.line_count()
+        top = self.top_line()
+        bottom = min(top + self.height() // LINE_PIXELS, line_count - 1)
+        self.wanted = list(range(top // TILE_LINES, bottom // TILE_LINES + 1))
+        for tile in self.wanted:
+            image = self.tiles.get(tile)
+            if image is None:
+                self.request(tile)
+            else:
+                painter.drawImage(QPoint(0, (tile * TILE_LINES - top) * LINE_PIXELS), image)
+                if tile in self.stale and not self.render_timer.isActive():
+                    self.render_timer.start()
+        # The lines the editor shows
+        editor = self.editor
+        first = editor.firstVisibleBlock().blockNumber()
+        last = editor.cursorForPosition(QPoint(0, editor.viewport().height())).blockNumber()
+        painter.fillRect(QRect(0, (first - top) * LINE_PIXELS, MAP_COLUMNS, (last - first + 1) * LINE_PIXELS), SLIDER_COLOR)
+        self.paint_ruler(painter, line_count)
+
+    def paint_ruler(self, painter, line_count):
+        if self.marks is None:
+            self.marks = self.collect_marks()
+        scale = self.height() / max(line_count, 1)
+        lane_width = RULER_WIDTH // 3
+        painted = set()
+        for lane, first, last, color in self.marks:
+            y = int(first * scale)
+            height = max(int((last + 1) * scale) - y, 2)
+            if (lane, y, height) in painted:
+                continue  # Dense marks land on the same pixel rows; paint each row once
+            painted.add((lane, y, height))
+            painter.fillRect(MAP_COLUMNS + lane * lane_width, y, lane_width, height, color)
+
+    def collect_marks(self):
+        doc = self.doc
+        marks = []
+        line_diff = doc.line_diff
+        if line_diff.base is not None and not line_diff.pending:
+            for _old_start, old_count, new_start, new_count in line_diff.hunks:
+                kind = DELETED if new_count == 0 else ADDED if old_count == 0 else MODIFIED
+                marks.append((0, new_start, new_start + max(new_count, 1) - 1, DIFF_COLORS[kind]))
+        find_index = doc.find_index
+        if find_index.pattern is not None and find_index.count:
+            # One mark per ruler row that has a hit, not per hit: a row covers many lines of a long file
+            line_matches = find_index.line_matches
+            step = max(self.line_count() / max(self.height(), 1), 1)
+            row = 0
+            while int(row * step) < find_index.indexed_upto:
+                first, end = int(row * step), max(int((row + 1) * step), int(row * step) + 1)
+                if any(line_matches[first:end]):
+                    marks.append((1, first, end - 1, FIND_COLOR))
+                row += 1
+        marks.extend((2, line, line, self.editor.marker_color(line)) for line in doc.line_diagnostics)
+        marks.extend((2, line - 1, line - 1, BREAKPOINT_COLOR) for line in doc.breakpoints)
+        return marks
+
+    # Scrolling
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.scroll_to(self.line_at(event.pos()))
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton:
+            self.scroll_to(self.line_at(event.pos()))
+
+    def scroll_to(self, line):
+        """Scrolls the editor so ``line`` is in the middle of its view."""
+        editor = self.editor
+        block = editor.document().findBlockByNumber(line)
+        visible_lines = editor.viewport().height() // max(editor.fontMetrics().height(), 1)
+        # The scroll bar counts laid-out lines, so wrapped and folded lines come out right
+        editor.verticalScrollBar().setValue(block.firstLineNumber() - visible_lines // 2)
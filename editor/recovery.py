@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import itertools
+from PyQt5.QtCore import QObject, QTimer
+
+from editor.block_tracker import utf16_len
+from utils.paths import data_dir, stale_files
+
+_journal_numbers = itertools.count(1)
+
+CHECKPOINT_MIN_BYTES = 256 * 1024
+REPLAY_CHUNK = 8192  # Bytes of UTF-16; even, so a chunk never splits a code unit
+
+
+def journal_dir():
+    return data_dir('recovery')
+
+
+def replay(text, records):
+    """Applies ``[position, removed_length, inserted]`` records to ``text``.
+
+    Positions and lengths count UTF-16 code units, as the BlockTracker reports them, so
+    the text is replayed as UTF-16 bytes. It is held as a list of chunks and each edit
+    walks there from the previous one, so an edit copies one chunk instead of the whole text.
+    """
+    def split(data):
+        return [data[i:i + REPLAY_CHUNK] for i in range(0, len(data), REPLAY_CHUNK)] or [b'']
+
+    chunks = split(text.encode('utf-16-le', 'surrogatepass'))
+    index, start = 0, 0  # Chunk of the previous edit and its byte offset in the text
+    for position, removed, inserted in records:
+        position, removed = 2 * position, 2 * removed
+        while index > 0 and position < start:
+            index -= 1
+            start -= len(chunks[index])
+        while index < len(chunks) - 1 and position > start + len(chunks[index]):
+            start += len(chunks[index])
+            index += 1
+        last, end = index, start + len(chunks[index])
+        while last < len(chunks) - 1 and position + removed > end:
+            last += 1
+            end += len(chunks[last])
+        old = b''.join(chunks[index:last + 1])
+        offset = position - start
+        chunks[index:last + 1] = split(old[:offset] + inserted.encode('utf-16-le', 'surrogatepass') + old[offset + removed:])
+    return b''.join(chunks).decode('utf-16-le', 'surrogatepass')
+
+
+def read_journal(path):
+    """(header, text) recovered from a journal file, or None if it holds no checkpoint.
+
+    A torn last record (the process died mid-write) ends the replay.
+    """
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    header, records = None, []
+    for line in data.split(b'\n'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            break
+        if isinstance(record, dict):
+            header, records = record, []
+        elif header is not None:
+            records.append(record)
+    if header is None:
+        return None
+    return header, replay(header['text'], records)
+
+
+def recoverable_journals():
+    """[(journal path, header, text)] left behind by editor processes that did not exit cleanly.
+
+    When several crashed editors journaled the same file, only the newest journal is offered.
+    """
+    journals = []
+    for path in sorted(stale_files(journal_dir())):
+        if not path.endswith('.journal'):
+            discard_journals([path])  # A checkpoint that was never moved into place
+            continue
+        recovered = read_journal(path)
+        if recovered is not None:
+            journals.append((path, *recovered))
+    newest = {}
+    for path, header, _text in sorted(journals, key=lambda journal: journal[1]['time']):
+        newest[header['path'] or path] = path
+    keep = set(newest.values())
+    discard_journals(path for path, _header, _text in journals if path not in keep)
+    return [journal for journal in journals if journal[0] in keep]
+
+
+def discard_journals(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class RecoveryJournal(QObject):
+    """Append-only log of a document's unsaved edits, replayed after a crash.
+
+    While the document is modified each edit reported by its BlockTracker is queued as a
+    ``[position, removed_length, inserted]`` record, so a keystroke costs the same on any
+    file size. Queued records are written with one fsync per flush interval. The file
+    starts with a checkpoint holding the full text; once the records written since
+    outweigh the text, a fresh checkpoint atomically replaces the file. Saving, or undoing
+    back to the saved text, deletes the journal.
+    """
+
+    def __init__(self, document, flush_interval=1000):
+        super().__init__(document)
+        self.document = document
+        self.qdoc = None
+        self.tracker = None
+        self.path = None
+        self.file = None
+        self.pending = []
+        self.pending_bytes = 0
+        self.journal_bytes = 0  # Record bytes written since the last checkpoint
+        self.checkpoint_due = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(flush_interval)
+        self.timer.timeout.connect(self.flush)
+
+    @property
+    def active(self):
+        return self.path is not None or self.checkpoint_due
+
+    def attach(self, qdoc, tracker):
+        """Follows a newly materialized QTextDocument (on creation or restore from unload)."""
+        self.qdoc, self.tracker = qdoc, tracker
+        tracker.text_changed.connect(self.on_text_changed)
+        qdoc.modificationChanged.connect(self.on_modification_changed)
+        if not qdoc.isModified():
+            self.discard()
+        elif self.path is not None:
+            self.file = open(self.path, 'ab')  # Restored text is exactly what the journal holds
+        else:
+            self.schedule_checkpoint()
+
+    def detach(self):
+        """Writes out queued records before the QTextDocument goes away (the file is kept)."""
+        self.flush()
+        self.close_file()
+        self.qdoc = self.tracker = None
+
+    def on_text_changed(self, position, removed, inserted):
+        if not self.active or self.checkpoint_due:
+            return  # Nothing to log yet, or the coming checkpoint includes this edit
+        record = json.dumps([position, utf16_len(removed), inserted], separators=(',', ':')) + '\n'
+        self.pending.append(record)
+        self.pending_bytes += len(record)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def on_modification_changed(self, modified):
+        if not modified:
+            self.discard()
+        elif not self.active:
+            self.schedule_checkpoint()
+
+    def schedule_checkpoint(self):
+        self.checkpoint_due = True
+        self.pending.clear()
+        self.pending_bytes = 0
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        if self.qdoc is None or not self.active:
+            return
+        if self.checkpoint_due or self.journal_bytes + self.pending_bytes > max(CHECKPOINT_MIN_BYTES,
+                                                                               self.qdoc.characterCount()):
+            self.write_checkpoint()
+        elif self.pending:
+            self.file.write(''.join(self.pending).encode('ascii'))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.journal_bytes += self.pending_bytes
+        self.pending.clear()
+        self.pending_bytes = 0
+
+    def write_checkpoint(self):
+        header = {
+            'path': self.document.path,
+            'title': self.document.title,
+            'time': time.time(),
+            'text': '\n'.join(self.tracker.lines),
+        }
+        self.close_file()
+        if self.path is None:
+            self.path = os.path.join(journal_dir(), f"{os.getpid()}-{next(_journal_numbers)}.journal")
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(json.dumps(header).encode('ascii') + b'\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        self.file = open(self.path, 'ab')
+        self.journal_bytes = 0
+        self.checkpoint_due = False
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        self.timer.stop()
+        self.pending.clear()
+        self.pending_bytes = 0
+        self.checkpoint_due = False
+        self.close_file()
+        if self.path is not None:
+            discard_journals([self.path])
+            self.path = None
@@ -0,0 +1,91 @@
+import json
+import getpass
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+
+def server_name():
+    # One server per user so two accounts on the same machine never share an editor
+    return f"ezap-editor-{getpass.getuser()}"
+
+
+def send_to_running_instance(files, timeout=200):
+    """Forward ``files`` ([(path, line, column), ...]) to a running editor.
+
+    Returns True when a running instance has the request, in which case the caller can
+    exit without ever creating a QApplication. An instance too busy to acknowledge in
+    time still has the request in its socket and handles it later, so only a rejected
+    request or a dropped connection counts as not delivered.
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(server_name())
+    if not socket.waitForConnected(timeout):
+        return False
+    payload = json.dumps({"files": [list(entry) for entry in files]}) + "\n"
+    socket.write(payload.encode('utf-8'))
+    socket.flush()
+    while socket.bytesToWrite() and socket.waitForBytesWritten(timeout):
+        pass
+    if socket.bytesToWrite() or socket.state() != QLocalSocket.ConnectedState:
+        return False
+    # Wait for the acknowledgement so the request is not lost if we exit too early
+    if socket.waitForReadyRead(timeout * 5):
+        delivered = socket.readAll().data().startswith(b"ok")
+    else:
+        delivered = socket.state() == QLocalSocket.ConnectedState  # Busy, not gone
+    socket.disconnectFromServer()
+    return delivered
+
+
+class SingleInstanceServer(QObject):
+    files_requested = pyqtSignal(list)  # [(path, line, column), ...]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.on_new_connection)
+        self.buffers = {}
+
+    def listen(self):
+        name = server_name()
+        if self.server.listen(name):
+            return True
+        # The name is taken. Only if nothing answers on it did a crashed instance leave its
+        # socket file behind; a live instance (e.g. one started at the same time) keeps it.
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(200):
+            probe.disconnectFromServer()
+            return False
+        QLocalServer.removeServer(name)
+        return self.server.listen(name)
+
+    def close(self):
+        self.server.close()
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = b''
+            socket.readyRead.connect(lambda s=socket: self.on_ready_read(s))
+            socket.disconnected.connect(lambda s=socket: self.on_disconnected(s))
+
+    def on_ready_read(self, socket):
+        self.buffers[socket] += socket.readAll().data()
+        if not self.buffers[socket].endswith(b"\n"):
+            return
+        data = self.buffers[socket]
+        self.buffers[socket] = b''
+        try:
+            request = json.loads(data.decode('utf-8'))
+            files = [(path, line, column) for path, line, column in request.get("files", [])]
+        except (ValueError, TypeError):
+            socket.write(b"error\n")
+            return
+        socket.write(b"ok\n")
+        socket.flush()
+        self.files_requested.emit(files)
+
+    def on_disconnected(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
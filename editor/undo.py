@@ -0,0 +1,325 @@
+import os
+import sys
+import json
+import time
+import zlib
+import itertools
+from PyQt5.QtCore import QObject
+from PyQt5.QtGui import QTextCursor
+
+from editor.block_tracker import utf16_len
+from utils.paths import data_dir
+
+_spill_numbers = itertools.count(1)
+
+ENTRY_OVERHEAD = 120  # Bytes for the entry object itself
+KEEP_RAW = 32  # Newest steps kept as plain text, so everyday undo never unpacks anything
+PACK_MIN_CHARS = 1024
+MERGE_WINDOW = 2.0  # Seconds between keystrokes that still join one undo step
+MERGE_MAX_CHARS = 256
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+def spill_dir():
+    return data_dir('undo')
+
+
+class UndoEntry:
+    """One undo step: at ``position`` the text ``removed`` was replaced by ``inserted``.
+
+    Positions count UTF-16 code units, like Qt's cursor positions they are applied with.
+    The two texts are held as strings, as zlib-packed bytes, or as an (offset, length)
+    slice of the history's spill file.
+    """
+    __slots__ = ('position', 'removed', 'inserted', 'time', 'packed', 'spilled')
+
+    def __init__(self, position, removed, inserted):
+        self.position = position
+        self.removed = removed
+        self.inserted = inserted
+        self.time = time.monotonic()
+        self.packed = None
+        self.spilled = None
+
+    @property
+    def raw(self):
+        return self.removed is not None
+
+    def memory(self):
+        if self.raw:
+            return ENTRY_OVERHEAD + sys.getsizeof(self.removed) + sys.getsizeof(self.inserted)
+        return ENTRY_OVERHEAD + (len(self.packed) if self.packed is not None else 0)
+
+    def pack(self):
+        if self.raw:
+            self.packed = zlib.compress(json.dumps([self.removed, self.inserted]).encode('ascii'), 1)
+            self.removed = self.inserted = None
+
+
+class UndoHistory(QObject):
+    """Undo and redo for one Document, in place of QTextDocument's unbounded undo stack.
+
+    Steps come from the BlockTracker, one per edit block; runs of typing, backspacing or
+    deleting merge into one step. The newest steps stay plain text and older large ones
+    are zlib-packed. Once the history outgrows ``memory_budget`` its oldest steps move to
+    a spill file, so undo still reaches back through the whole session; only beyond
+    ``disk_budget`` are the oldest steps dropped.
+    """
+    memory_budget = 16 * 1024 * 1024
+    disk_budget = 256 * 1024 * 1024
+
+    def __init__(self, document):
+        super().__init__(document)
+        self.qdoc = None
+        self.undo_entries = []  # Oldest first
+        self.redo_entries = []  # Next redo last
+        self.clean = 0  # len(undo_entries) when the document was last saved; None once unreachable
+        self.memory = 0  # Bytes held in RAM by all entries
+        self.spilled_upto = 0  # undo_entries[:spilled_upto] all live in the spill file
+        self.spill_path = None
+        self.spill_size = 0
+        self.spill_live = 0  # Spill file bytes still referenced by an entry
+        self.applying = False
+
+    def attach(self, qdoc, tracker):
+        """Follows a newly materialized QTextDocument, whose text matches the history."""
+        self.qdoc = qdoc
+        tracker.text_changed.connect(self.on_text_changed)
+        qdoc.modificationChanged.connect(self.on_modification_changed)
+
+    def detach(self):
+        """Moves every step to the spill file, as the document is being unloaded to free memory."""
+        self.spill([entry for entry in self.undo_entries + self.redo_entries if not entry.spilled])
+        self.spilled_upto = len(self.undo_entries)
+        self.qdoc = None
+
+    def can_undo(self):
+        return bool(self.undo_entries)
+
+    def can_redo(self):
+        return bool(self.redo_entries)
+
+    # Recording
+
+    def on_text_changed(self, position, removed, inserted):
+        if self.applying:
+            return
+        self.clear_redo()
+        top = self.undo_entries[-1] if self.undo_entries else None
+        if top is not None and self.merge(top, position, removed, inserted):
+            return
+        entry = UndoEntry(position, removed, inserted)
+        self.undo_entries.append(entry)
+        self.memory += entry.memory()
+        self.pack_old()
+        self.enforce_budget()
+
+    def merge(self, top, position, removed, inserted):
+        """Extends ``top`` with a keystroke that continues it; False if it starts a new step."""
+        if (not top.raw or len(self.undo_entries) == self.clean
+                or time.monotonic() - top.time > MERGE_WINDOW):
+            return False
+        before = top.memory()
+        if not removed and len(inserted) == 1 and inserted != '\n':
+            if position != top.position + utf16_len(top.inserted) or len(top.inserted) >= MERGE_MAX_CHARS:
+                return False
+            top.inserted += inserted
+        elif not inserted and not top.inserted and len(removed) == 1 and removed != '\n':
+            if len(top.removed) >= MERGE_MAX_CHARS:
+                return False
+            if position + utf16_len(removed) == top.position:  # Backspace
+                top.position = position
+                top.removed = removed + top.removed
+            elif position == top.position:  # Delete
+                top.removed += removed
+            else:
+                return False
+        else:
+            return False
+        top.time = time.monotonic()
+        self.memory += top.memory() - before
+        return True
+
+    def on_modification_changed(self, modified):
+        if not modified and not self.applying:
+            self.clean = len(self.undo_entries)  # Saved
+
+    # Undo and redo
+
+    def undo(self):
+        """Reverts the last step; returns the cursor position after it, or None if there was none."""
+        if not self.undo_entries:
+            return None
+        entry = self.undo_entries.pop()
+        self.spilled_upto = min(self.spilled_upto, len(self.undo_entries))
+        removed, inserted = self.texts(entry)
+        self.redo_entries.append(entry)
+        self.apply(entry.position, utf16_len(inserted), removed)
+        return entry.position + utf16_len(removed)
+
+    def redo(self):
+        if not self.redo_entries:
+            return None
+        entry = self.redo_entries.pop()
+        removed, inserted = self.texts(entry)
+        if entry.spilled and self.spilled_upto == len(self.undo_entries):
+            self.spilled_upto += 1
+        self.undo_entries.append(entry)
+        self.apply(entry.position, utf16_len(removed), inserted)
+        return entry.position + utf16_len(inserted)
+
+    def apply(self, position, length, text):
+        self.applying = True
+        try:
+            cursor = QTextCursor(self.qdoc)
+            cursor.setPosition(position)
+            cursor.setPosition(position + length, QTextCursor.KeepAnchor)
+            cursor.insertText(text)
+        finally:
+            self.applying = False
+        self.qdoc.setModified(len(self.undo_entries) != self.clean)
+
+    def texts(self, entry):
+        if entry.raw:
+            return entry.removed, entry.inserted
+        if entry.packed is not None:
+            packed = entry.packed
+        else:
+            offset, length = entry.spilled
+            with open(self.spill_path, 'rb') as file:
+                file.seek(offset)
+                packed = file.read(length)
+        return tuple(json.loads(zlib.decompress(packed)))
+
+    # Memory
+
+    def pack_old(self):
+        # Constant work per step: only the entry just leaving the raw window is considered
+        index = len(self.undo_entries) - KEEP_RAW - 1
+        if index < self.spilled_upto:
+            return
+        entry = self.undo_entries[index]
+        if entry.raw and len(entry.removed) + len(entry.inserted) >= PACK_MIN_CHARS:
+            before = entry.memory()
+            entry.pack()
+            self.memory += entry.memory() - before
+
+    def enforce_budget(self):
+        if self.memory <= self.memory_budget:
+            return
+        # Spill down to three quarters of the budget, so this runs once per many steps. The
+        # newest steps go last, and only if the older ones alone don't free enough.
+        projected = self.memory
+        batch = []
+        for limit, target in ((len(self.undo_entries) - KEEP_RAW, self.memory_budget * 3 // 4),
+                              (len(self.undo_entries), self.memory_budget)):
+            while self.spilled_upto < limit and projected > target:
+                entry = self.undo_entries[self.spilled_upto]
+                self.spilled_upto += 1
+                if not entry.spilled:
+                    batch.append(entry)
+                    projected -= entry.memory() - ENTRY_OVERHEAD
+        self.spill(batch)
+        self.drop_oldest()
+
+    def spill(self, entries):
+        if not entries:
+            return
+        if self.spill_path is None:
+            self.spill_path = os.path.join(spill_dir(), f"{os.getpid()}-{next(_spill_numbers)}.undo")
+        chunks = []
+        offset = self.spill_size
+        for entry in entries:
+            before = entry.memory()
+            entry.pack()
+            chunks.append(entry.packed)
+            entry.spilled = (offset, len(entry.packed))
+            offset += len(entry.packed)
+            entry.packed = None
+            self.memory += entry.memory() - before
+        with open(self.spill_path, 'ab') as file:
+            file.write(b''.join(chunks))
+        self.spill_live += offset - self.spill_size
+        self.spill_size = offset
+
+    def drop_oldest(self):
+        """Forgets the oldest spilled steps while the spill file holds more than the disk budget."""
+        count = 0
+        live = self.spill_live
+        while count < self.spilled_upto and live > self.disk_budget:
+            live -= self.undo_entries[count].spilled[1]
+            count += 1
+        if not count:
+            return
+        del self.undo_entries[:count]
+        self.memory -= count * ENTRY_OVERHEAD
+        self.spill_live = live
+        self.spilled_upto -= count
+        if self.clean is not None:
+            self.clean = self.clean - count if self.clean >= count else None
+        self.compact()
+
+    def clear_redo(self):
+        if not self.redo_entries:
+            if self.clean is not None and self.clean > len(self.undo_entries):
+                self.clean = None
+            return
+        for entry in self.redo_entries:
+            self.memory -= entry.memory()
+            if entry.spilled:
+                self.spill_live -= entry.spilled[1]
+        self.redo_entries.clear()
+        if self.clean is not None and self.clean > len(self.undo_entries):
+            self.clean = None  # The saved state was undone past and is now unreachable
+        self.compact()
+
+    def compact(self):
+        """Rewrites the spill file without dead bytes once they make up most of it."""
+        if self.spill_path is None or (self.spill_live and (self.spill_size < COMPACT_MIN_BYTES
+                                                             or self.spill_live * 2 > self.spill_size)):
+            return
+        spilled = [entry for entry in self.undo_entries + self.redo_entries if entry.spilled]
+        if not spilled:
+            self.remove_spill_file()
+            return
+        temporary = self.spill_path + '.tmp'
+        offset = 0
+        with open(self.spill_path, 'rb') as source, open(temporary, 'wb') as target:
+            for entry in spilled:
+                source.seek(entry.spilled[0])
+                data = source.read(entry.spilled[1])
+                target.write(data)
+                entry.spilled = (offset, len(data))
+                offset += len(data)
+        os.replace(temporary, self.spill_path)
+        self.spill_size = self.spill_live = offset
+
+    def remove_spill_file(self):
+        if self.spill_path is not None:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+        self.spill_path = None
+        self.spill_size = self.spill_live = 0
+
+    def clear(self):
+        """Forgets all steps, e.g. when the text was replaced wholesale."""
+        self.undo_entries.clear()
+        self.redo_entries.clear()
+        self.clean = 0 if self.qdoc is None or not self.qdoc.isModified() else None
+        self.memory = 0
+        self.spilled_upto = 0
+        self.remove_spill_file()
+
+    def stats(self):
+        entries = self.undo_entries + self.redo_entries
+        return {
+            'undo': len(self.undo_entries),
+            'redo': len(self.redo_entries),
+            'raw': sum(entry.raw for entry in entries),
+            'packed': sum(entry.packed is not None for entry in entries),
+            'spilled': sum(entry.spilled is not None for entry in entries),
+            'memory': self.memory,
+            'disk': self.spill_size,
+        }
@@ -0,0 +1,173 @@
+import logging
+import os
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+from utils.background import BackgroundTasks, thread_tasks
+from utils.symbol_index import SymbolDatabase, database_path, search_symbols, sync_index, watch_paths
+
+logger = logging.getLogger(__name__)
+
+
+class WorkspaceIndex(QObject):
+    """Keeps the on-disk symbol index of a workspace current and answers lookups.
+
+    Syncs run on a worker thread (parsing fans out to worker processes when many files
+    changed). After the first full sync only what the file system reports is re-synced:
+    the workspace's directories and (up to WATCH_LIMIT) its files are watched, and
+    changes are collected for ``delay`` ms. Exact lookups read the SQLite database
+    directly from the GUI thread; searches, which may scan the whole table, run on a
+    worker thread.
+    """
+    index_updated = pyqtSignal(int, int, int)  # parsed, unchanged, removed
+
+    def __init__(self, root, parent=None, delay=300):
+        super().__init__(parent)
+        self.root = None
+        self.database = None
+        self.running = False
+        self.pending_full = False
+        self.pending_paths = set()
+        self.pending_directories = set()
+        self.rewatch = False  # Directories were synced, so new ones may need watching
+        self.generation = 0  # Bumped on re-root; watch lists for the old root are dropped
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+        self.changed_paths = set()
+        self.changed_directories = set()
+        self.change_timer = QTimer(self)
+        self.change_timer.setSingleShot(True)
+        self.change_timer.setInterval(delay)
+        self.change_timer.timeout.connect(self.refresh_changed)
+        # A thread of its own: on the shared pool a search could wait behind interpreter probes
+        self.search_tasks = BackgroundTasks(self, max_workers=1)
+        self.searching = False
+        self.next_search = None  # (query, callback, limit) waiting for the running search
+        self.set_root(root)
+
+    def set_root(self, root):
+        if self.database is not None:
+            self.database.close()
+        self.root = os.path.abspath(root)
+        self.db_path = database_path(self.root)
+        self.database = SymbolDatabase(self.db_path)
+        self.generation += 1
+        self.unwatch()
+        self.refresh()
+
+    def refresh(self, paths=None, directories=()):
+        """Re-indexes ``paths`` and the files under ``directories``, or the whole workspace if neither is given."""
+        if paths is None and not directories:
+            self.pending_full = True
+        else:
+            self.pending_paths.update(os.path.abspath(p) for p in paths or ()
+                                      if p.endswith('.py') and os.path.abspath(p).startswith(self.root + os.sep))
+            self.pending_directories.update(os.path.abspath(d) for d in directories
+                                            if os.path.abspath(d) == self.root
+                                            or os.path.abspath(d).startswith(self.root + os.sep))
+        self.start_pending()
+
+    def start_pending(self):
+        if self.running or not (self.pending_full or self.pending_paths or self.pending_directories):
+            return
+        if self.pending_full:
+            paths, directories = None, []
+        else:
+            paths, directories = sorted(self.pending_paths), sorted(self.pending_directories)
+        self.rewatch = self.rewatch or paths is None or bool(directories)
+        self.pending_full = False
+        self.pending_paths = set()
+        self.pending_directories = set()
+        self.running = True
+        thread_tasks().submit(sync_index, self.root, self.db_path, paths, directories,
+                              callback=self.on_synced, error_callback=self.on_failed)
+
+    def on_synced(self, counts):
+        self.running = False
+        self.index_updated.emit(*counts)
+        self.start_pending()
+        if not self.running and self.rewatch:
+            self.rewatch = False
+            generation = self.generation
+            thread_tasks().submit(watch_paths, self.root, self.db_path,
+                                  callback=lambda result: self.on_watch_paths(generation, result))
+
+    # Watching
+
+    def on_watch_paths(self, generation, result):
+        if generation != self.generation:
+            return
+        directories, files = result
+        wanted = set(directories) | set(files)
+        watched = set(self.watcher.directories()) | set(self.watcher.files())
+        if watched - wanted:
+            self.watcher.removePaths(list(watched - wanted))
+        if wanted - watched:
+            self.watcher.addPaths(sorted(wanted - watched))
+
+    def unwatch(self):
+        watched = self.watcher.directories() + self.watcher.files()
+        if watched:
+            self.watcher.removePaths(watched)
+        self.changed_paths.clear()
+        self.changed_directories.clear()
+        self.change_timer.stop()
+
+    def on_directory_changed(self, directory):
+        self.changed_directories.add(directory)
+        self.change_timer.start()
+
+    def on_file_changed(self, path):
+        self.changed_paths.add(path)
+        self.change_timer.start()
+
+    def refresh_changed(self):
+        paths, self.changed_paths = self.changed_paths, set()
+        directories, self.changed_directories = self.changed_directories, set()
+        for path in paths:
+            if path not in self.watcher.files() and os.path.exists(path):
+                self.watcher.addPath(path)  # Replacing the file by a rename dropped the watch
+        self.refresh(sorted(paths), sorted(directories))
+
+    def on_failed(self, error):
+        self.running = False
+        logger.error(f"Symbol indexing failed: {error!r}")
+        self.start_pending()
+
+    def search(self, query, limit=200):
+        return self.database.search(query, limit)
+
+    def search_async(self, query, callback, limit=200):
+        """Runs ``search`` on a worker thread and passes the rows to ``callback``.
+
+        One search runs at a time and only the newest query waits behind it, so fast typing
+        does not queue a table scan per keystroke; results of superseded queries are dropped.
+        """
+        self.next_search = (query, callback, limit)
+        if not self.searching:
+            self.start_search()
+
+    def start_search(self):
+        query, callback, limit = self.next_search
+        self.next_search = None
+        self.searching = True
+        self.search_tasks.submit(search_symbols, self.db_path, query, limit,
+                                 callback=lambda rows: self.on_searched(callback, rows),
+                                 error_callback=lambda error: self.on_searched(callback, []))
+
+    def on_searched(self, callback, rows):
+        self.searching = False
+        if self.next_search is not None:
+            self.start_search()  # A newer query is waiting; these rows are already out of date
+        else:
+            callback(rows)
+
+    def definitions(self, name):
+        return self.database.definitions(name)
+
+    def close(self):
+        self.unwatch()
+        self.search_tasks.shutdown()
+        if self.database is not None:
+            self.database.close()
+            self.database = None
@@ -1,25 +1,47 @@
 import sys
 import os
+import argparse
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import QTimer
 
-from ui.ezcode_window import EZCode
-from editor.splash import SplashScreen
+from editor.single_instance import SingleInstanceServer, send_to_running_instance
+from utils.helpers import parse_file_argument
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='ezap', description='EZap Editor')
+    parser.add_argument('files', nargs='*', help='files to open, optionally as path:line[:column]')
+    parser.add_argument('--new-instance', action='store_true',
+                        help='start a separate editor instead of reusing the running one')
+    return parser.parse_args(argv)
 
 
 def main():
+    args = parse_args(sys.argv[1:])
+    files = [parse_file_argument(argument) for argument in args.files]
+
+    # Hand the files over to an already running editor before paying for any GUI start-up
+    if not args.new_instance and send_to_running_instance(files):
+        sys.exit(0)
+
+    # Imported lazily so forwarding to a running instance stays fast
+    from ui.ezcode_window import EZCode
+    from editor.splash import SplashScreen
+    from utils.session import initial_workspace_root
+
     print("Starting application...")
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1])
 
     # Get the path to the image file
     base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
     image_path = os.path.join(base_path, 'images', 'splash.jpg')
     icon_path = os.path.join(base_path, 'images', 'icon.png')
-    
+
     # Set the application icon
     app.setWindowIcon(QIcon(icon_path))
-    
+
     print(f"Loading splash screen with image: {image_path}")
     splash = SplashScreen(image_path)
     splash.show()
@@ -29,11 +51,21 @@ def main():
     QTimer.singleShot(3000, splash.close)
 
     print("Initializing main editor window...")
-    editor = EZCode()
+    editor = EZCode(initial_workspace_root([path for path, _line, _column in files]))
+    editor.restore_session()  # Before the first paint, so the window opens as it was left
     editor.show()
     splash.finish(editor)
+    editor.offer_recovery()
+
+    if not args.new_instance:
+        server = SingleInstanceServer(app)
+        server.files_requested.connect(editor.open_requested_files)
+        server.listen()
+        app.aboutToQuit.connect(server.close)
+    editor.open_requested_files(files)
 
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    multiprocessing.freeze_support()  # Background analysis runs in worker processes
+    main()
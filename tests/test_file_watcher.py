@@ -0,0 +1,18 @@
+from editor.file_watcher import FALLBACK_ENCODING, read_file_state
+
+
+def test_read_file_state_keeps_undecodable_bytes(tmp_path):
+    path = tmp_path / 'legacy.py'
+    path.write_bytes('caf\xe9 = "\xa9"\r\n'.encode('cp1252'))
+    _mtime, _size, _digest, text, encoding = read_file_state(str(path))
+    assert encoding == FALLBACK_ENCODING and text == 'caf\xe9 = "\xa9"\n'
+    assert text.replace('\n', '\r\n').encode(encoding) == path.read_bytes()
+
+
+def test_read_file_state_honours_bom_and_coding_line(tmp_path):
+    bom = tmp_path / 'bom.py'
+    bom.write_bytes('\ufeffname = "€"\n'.encode('utf-8'))
+    assert read_file_state(str(bom))[3:] == ('name = "€"\n', 'utf-8-sig')
+    declared = tmp_path / 'declared.py'
+    declared.write_bytes('# -*- coding: cp1252 -*-\nname = "€"\n'.encode('cp1252'))
+    assert read_file_state(str(declared))[3:] == ('# -*- coding: cp1252 -*-\nname = "€"\n', 'cp1252')
@@ -0,0 +1,10 @@
+import os
+
+from utils.helpers import parse_file_argument
+
+
+def test_parse_file_argument(tmp_path):
+    path = str(tmp_path / 'missing.py')
+    assert parse_file_argument(f"{path}:12:3") == (path, 12, 3)
+    assert parse_file_argument(f"{path}:12") == (path, 12, None)
+    assert parse_file_argument('') == (os.path.abspath(''), None, None)
@@ -0,0 +1,107 @@
+import random
+import sys
+
+from PyQt5.QtGui import QTextCursor, QTextDocument
+from PyQt5.QtWidgets import QPlainTextDocumentLayout
+
+from editor.block_tracker import BlockTracker
+from editor.completion import CompletionIndex, module_members
+from editor.find import FindIndex
+from utils.search import SearchSpec
+
+
+def make_tracker(text):
+    qdoc = QTextDocument()
+    qdoc.setDocumentLayout(QPlainTextDocumentLayout(qdoc))
+    qdoc.setPlainText(text)
+    return qdoc, BlockTracker(qdoc, qdoc)
+
+
+def finish(qapp, index):
+    while index.slice_timer.isActive():
+        qapp.processEvents()
+
+
+def paste(qdoc, line, text):
+    cursor = QTextCursor(qdoc.findBlockByNumber(line))
+    cursor.insertText(text)
+
+
+PASTE = ''.join(f"pasted_{number} = 1\n" for number in range(500))
+
+
+def make_document():
+    return make_tracker('\n'.join(f"head_{number} = 0" for number in range(100)))
+
+
+def test_completion_indexes_large_paste_in_slices(qapp):
+    qdoc, tracker = make_document()
+    completion = CompletionIndex(tracker, qdoc, slice_lines=50)
+    finish(qapp, completion)
+    paste(qdoc, 40, PASTE)
+    assert completion.indexed_upto < 50 and completion.slice_timer.isActive()  # Nothing pasted was indexed yet
+    finish(qapp, completion)
+    assert completion.trie.count('pasted_499') == 1 and completion.trie.count('head_99') == 1
+
+
+def test_module_members_does_not_run_module_code(tmp_path, monkeypatch):
+    (tmp_path / 'noisy_module.py').write_text("import os\nraise SystemExit('ran')\ndef visible(): pass\n_hidden = 1\n")
+    package = tmp_path / 'noisy_package'
+    package.mkdir()
+    (package / '__init__.py').write_text("__all__ = ['exported']\nraise SystemExit('ran')\n")
+    (package / 'child.py').write_text('')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    assert module_members('noisy_module') == ['os', 'visible']
+    assert module_members('noisy_package') == ['child', 'exported']
+    assert module_members('noisy_package.child') == []
+    assert 'noisy_module' not in sys.modules and 'noisy_package' not in sys.modules
+
+
+def test_completion_resolves_only_finished_import_lines(qapp, monkeypatch):
+    qdoc, tracker = make_tracker('')
+    completion = CompletionIndex(tracker, qdoc)
+    finish(qapp, completion)
+    resolved = []
+    monkeypatch.setattr(completion, 'resolve_module', resolved.append)
+    cursor = QTextCursor(qdoc)
+    for character in 'import json':
+        cursor.insertText(character)
+        completion.resolve_pending_imports(tracker.lines[0])  # The cursor is still on the line
+    assert resolved == []
+    cursor.insertText('\n')
+    completion.resolve_pending_imports(tracker.lines[1])
+    assert resolved == ['json'] and not completion.pending_imports
+
+
+def test_find_rescans_large_paste_in_slices(qapp):
+    qdoc, tracker = make_document()
+    find = FindIndex(tracker, qdoc, slice_lines=50)
+    find.set_query(SearchSpec('_9', False, True, False))
+    finish(qapp, find)
+    paste(qdoc, 40, PASTE)
+    assert find.indexed_upto == 40 and find.slice_timer.isActive()  # Lines before the paste keep their matches
+    assert find.count == 1  # head_9
+    finish(qapp, find)
+    assert find.indexed_upto == tracker.line_count()
+    assert find.count == sum(line.count('_9') for line in tracker.lines)
+
+
+def test_find_ordinal_follows_edits(qapp):
+    qdoc, tracker = make_tracker('\n'.join(f"x{number % 7} = x" for number in range(3000)))
+    find = FindIndex(tracker, qdoc, slice_lines=500)
+    find.chunk_lines = 16
+    find.set_query(SearchSpec('x', False, True, False))
+    finish(qapp, find)
+    generator = random.Random(7)
+    for _ in range(200):
+        cursor = QTextCursor(qdoc.findBlockByNumber(generator.randrange(tracker.line_count())))
+        if generator.random() < 0.5:
+            cursor.insertText(generator.choice(['x', '\n', 'x\nx\n', 'yy']) * generator.randrange(1, 40))
+        else:
+            cursor.movePosition(QTextCursor.Down, QTextCursor.KeepAnchor, generator.randrange(60))
+            cursor.removeSelectedText()
+        finish(qapp, find)
+        line = generator.randrange(tracker.line_count())
+        column = generator.randrange(len(tracker.lines[line]) + 1)
+        expected = sum(line_text.count('x') for line_text in tracker.lines[:line])
+        assert find.ordinal(line, column) == expected + tracker.lines[line][:column].count('x') + 1
@@ -0,0 +1,36 @@
+import os
+import sys
+import time
+
+import pytest
+
+from editor.interpreters import InterpreterManager
+
+
+def wait_for(qapp, condition, timeout=20):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="the fake interpreter is a shell script")
+def test_workspace_interpreters_run_only_once_selected(qapp, tmp_path):
+    marker = tmp_path / 'ran'
+    env = tmp_path / '.venv'
+    (env / 'bin').mkdir(parents=True)
+    (env / 'pyvenv.cfg').write_text('home = /usr/bin\n')
+    python = env / 'bin' / 'python'
+    python.write_text(f"#!/bin/sh\ntouch '{marker}'\nexec '{sys.executable}' \"$@\"\n")
+    python.chmod(0o755)
+    manager = InterpreterManager(str(tmp_path))
+    try:
+        assert wait_for(qapp, lambda: manager.found and not manager.probing)
+        assert (str(python), 'venv') in manager.found
+        assert manager.unchecked(str(python)) and not marker.exists()
+        manager.select(str(python))
+        assert wait_for(qapp, lambda: manager.packages(str(python)) is not None)
+        assert marker.exists()
+    finally:
+        manager.close()
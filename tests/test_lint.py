@@ -0,0 +1,24 @@
+from utils.lint import analyze_source
+
+
+def undefined_names(source):
+    return [d.message for d in analyze_source(source) if d.message.startswith('Undefined name')]
+
+
+def test_class_cell_resolves_in_methods_only():
+    source = ('class A:\n'
+              '    def f(self):\n'
+              '        return __class__, lambda: __class__\n'
+              'def g():\n'
+              '    return __class__\n')
+    assert undefined_names(source) == ["Undefined name '__class__'"]
+
+
+def test_walrus_in_comprehension_binds_in_enclosing_scope():
+    source = ('def f(x):\n'
+              '    found = [m for i in x if (m := i)]\n'
+              '    nested = [[n for j in i if (n := j)] for i in x]\n'
+              '    return m, n, found, nested\n'
+              'values = [y for y in range(3) if (last := y)]\n'
+              'print(last, values)\n')
+    assert undefined_names(source) == []
@@ -0,0 +1,49 @@
+import json
+
+from PyQt5.QtGui import QTextCursor, QTextDocument
+from PyQt5.QtWidgets import QPlainTextDocumentLayout
+
+from editor.block_tracker import BlockTracker, utf16_len
+from editor.recovery import RecoveryJournal, replay
+
+
+def journaled_document(text, tmp_path):
+    qdoc = QTextDocument()
+    qdoc.setDocumentLayout(QPlainTextDocumentLayout(qdoc))
+    qdoc.setPlainText(text)
+    tracker = BlockTracker(qdoc, qdoc)
+    journal = RecoveryJournal(None)
+    journal.path = str(tmp_path / 'test.journal')  # Active, as after its first checkpoint
+    tracker.text_changed.connect(journal.on_text_changed)
+    return qdoc, journal
+
+
+def records(journal):
+    return [json.loads(record) for record in journal.pending]
+
+
+def test_replay_of_edits_after_astral_characters(qapp, tmp_path):
+    original = "x = '😀😀'\ny = 1"
+    qdoc, journal = journaled_document(original, tmp_path)
+    cursor = QTextCursor(qdoc)
+    cursor.setPosition(utf16_len("x = '😀"))
+    cursor.insertText('Z')
+    cursor.setPosition(utf16_len("x = '😀Z😀"))
+    cursor.insertText('Q')
+    assert qdoc.toPlainText() == "x = '😀Z😀Q'\ny = 1"
+    assert replay(original, records(journal)) == qdoc.toPlainText()
+
+
+def test_replay_of_removals_and_multiline_edits_with_non_bmp_text(qapp, tmp_path):
+    original = '\n'.join(f"line {i}: '𝔘𝔫𝔦𝔠𝔬𝔡𝔢' 😀 {i}" for i in range(3000))
+    qdoc, journal = journaled_document(original, tmp_path)
+    cursor = QTextCursor(qdoc)
+    for line in (2500, 10, 1200):
+        start = qdoc.findBlockByNumber(line).position()
+        cursor.setPosition(start + utf16_len(f"line {line}: '𝔘"))
+        cursor.setPosition(start + utf16_len(f"line {line}: '𝔘𝔫𝔦"), QTextCursor.KeepAnchor)
+        cursor.insertText('🐍\nsplit ')
+        cursor.setPosition(qdoc.findBlockByNumber(line + 3).position())
+        cursor.setPosition(qdoc.findBlockByNumber(line + 5).position(), QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+    assert replay(original, records(journal)) == qdoc.toPlainText()
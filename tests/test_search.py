@@ -0,0 +1,15 @@
+from utils.search import SearchSpec, compile_spec, replace_in_files, search_files
+
+
+def test_replace_changes_what_search_found_and_skips_undecodable(tmp_path):
+    utf8 = tmp_path / 'a.py'
+    utf8.write_bytes('naïve = 1\r\nname = naïve\r\n'.encode('utf-8'))
+    latin1 = tmp_path / 'b.py'
+    latin1.write_bytes('naïve = 2\nname = 3\n'.encode('latin-1'))
+    spec = SearchSpec(r'\bna\w+', True, False, False)
+    found = dict(search_files([str(utf8), str(latin1)], spec))
+    counts, skipped = replace_in_files(list(found), spec, 'x')
+    assert counts == {str(utf8): len(found[str(utf8)])}
+    assert skipped == [str(latin1)]
+    assert utf8.read_bytes() == compile_spec(spec).sub(b'x', 'naïve = 1\r\nname = naïve\r\n'.encode('utf-8'))
+    assert latin1.read_bytes() == 'naïve = 2\nname = 3\n'.encode('latin-1')
@@ -0,0 +1,30 @@
+import random
+
+from utils.text_diff import line_edits
+
+
+def apply(old, edits):
+    lines = list(old)
+    for first, count, new_lines in reversed(edits):
+        lines[first:first + count] = new_lines
+    return lines
+
+
+def test_line_edits_touch_only_changed_lines():
+    old = [f"line {number}" for number in range(1000)]
+    new = list(old)
+    new[10] = 'changed'
+    del new[500:503]
+    new.insert(900, 'inserted')
+    edits = line_edits(old, new)
+    assert apply(old, edits) == new
+    assert sum(count for _first, count, _lines in edits) == 4
+
+
+def test_line_edits_rebuild_shuffled_text():
+    generator = random.Random(7)
+    words = ['a', 'b', 'c', 'pass', 'return x', '', '    if y:']
+    for _attempt in range(200):
+        old = [generator.choice(words) for _line in range(generator.randrange(30))]
+        new = [generator.choice(words) for _line in range(generator.randrange(30))]
+        assert apply(old, line_edits(old, new)) == new
@@ -0,0 +1,72 @@
+from PyQt5.QtGui import QTextCursor, QTextDocument
+from PyQt5.QtWidgets import QPlainTextDocumentLayout
+
+from editor.block_tracker import BlockTracker, utf16_len
+from editor.undo import UndoHistory
+
+
+def make_document(text):
+    qdoc = QTextDocument()
+    qdoc.setDocumentLayout(QPlainTextDocumentLayout(qdoc))  # Qt reports contentsChange only with a layout
+    qdoc.setPlainText(text)
+    qdoc.setUndoRedoEnabled(False)
+    tracker = BlockTracker(qdoc, qdoc)
+    history = UndoHistory(None)
+    history.attach(qdoc, tracker)
+    return qdoc, tracker, history
+
+
+def insert(qdoc, position, text):
+    cursor = QTextCursor(qdoc)
+    cursor.setPosition(position)
+    cursor.insertText(text)
+
+
+def remove(qdoc, position, length):
+    cursor = QTextCursor(qdoc)
+    cursor.setPosition(position)
+    cursor.setPosition(position + length, QTextCursor.KeepAnchor)
+    cursor.removeSelectedText()
+
+
+def test_splice_counts_utf16_units_after_astral_characters(qapp):
+    qdoc, tracker, _history = make_document("s = '😀'")
+    edits = []
+    tracker.text_changed.connect(lambda *edit: edits.append(edit))
+    insert(qdoc, utf16_len("s = '😀"), '!')
+    assert edits == [(7, '', '!')]
+    assert tracker.lines == ["s = '😀!'"]
+
+
+def test_undo_redo_round_trip_with_astral_characters(qapp):
+    original = "s = '😀'\nt = '𝔘𝔫𝔦' + '😀😀'"
+    qdoc, tracker, history = make_document(original)
+    insert(qdoc, utf16_len("s = '😀"), '!')
+    insert(qdoc, utf16_len("s = '😀!'\nt = '𝔘𝔫"), '😺')
+    remove(qdoc, utf16_len("s = '😀!'\nt = '𝔘𝔫😺𝔦' + '"), utf16_len('😀'))
+    edited = qdoc.toPlainText()
+    assert edited == "s = '😀!'\nt = '𝔘𝔫😺𝔦' + '😀'"
+    while history.can_undo():
+        history.undo()
+    assert qdoc.toPlainText() == original
+    assert tracker.lines == original.split('\n')
+    while history.can_redo():
+        history.redo()
+    assert qdoc.toPlainText() == edited
+
+
+def test_typing_and_backspacing_emoji_merge_into_one_step(qapp):
+    qdoc, _tracker, history = make_document("x = ''")
+    position = utf16_len("x = '")
+    for char in '😀a😀':
+        insert(qdoc, position, char)
+        position += utf16_len(char)
+    assert len(history.undo_entries) == 1
+    for char in reversed('a😀'):
+        position -= utf16_len(char)
+        remove(qdoc, position, utf16_len(char))
+    assert qdoc.toPlainText() == "x = '😀'"
+    history.undo()
+    assert qdoc.toPlainText() == "x = '😀a😀'"
+    history.undo()
+    assert qdoc.toPlainText() == "x = ''"
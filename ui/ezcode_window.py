@@ -1,19 +1,39 @@
-import sys
-import subprocess
+import re
+import shlex
 import logging
 from PyQt5.QtWidgets import (
-    QMainWindow, QPlainTextEdit, QFileDialog, QMessageBox, QDockWidget, QSplitter, QToolBar, QAction, QWidget, QInputDialog, QProgressBar, QTableWidget, QPushButton, QTableWidgetItem, QVBoxLayout, QFileSystemModel, QTreeView, QDialog, QLineEdit, QListWidget, QListWidgetItem, QSlider, QLabel, QHBoxLayout, QComboBox, QShortcut, QProgressDialog, QGraphicsOpacityEffect, QListView, QAbstractItemView
+    QMainWindow, QPlainTextEdit, QTabBar, QFileDialog, QMessageBox, QDockWidget, QSplitter, QToolBar, QAction, QWidget, QInputDialog, QProgressBar, QTableWidget, QPushButton, QTableWidgetItem, QVBoxLayout, QDialog, QLineEdit, QListWidget, QListWidgetItem, QSlider, QLabel, QHBoxLayout, QComboBox, QShortcut, QProgressDialog, QGraphicsOpacityEffect, QListView, QAbstractItemView
 )
 from PyQt5.QtGui import QFont, QIcon, QTextCursor, QKeySequence
-from PyQt5.QtCore import Qt, QProcess, QSize, QThread, pyqtSignal, QPropertyAnimation, QTimer
+from PyQt5.QtCore import Qt, QSize, QPropertyAnimation, QTimer, QByteArray
 import qtawesome as qta
 import os
 import time
-import glob
 
 from editor.code_editor import CodeEditor
+from editor.command_runner import CommandRunner
+from editor.workspace_index import WorkspaceIndex
+from editor.file_watcher import FALLBACK_ENCODING, FileWatcher, read_file_state
+from editor.document import Document, remove_stale_caches
+from editor.diff_gutter import LineDiff
+from editor.highlighter import shared_engine
+from editor.interpreters import InterpreterManager
+from editor.recovery import recoverable_journals, discard_journals
+from editor.undo import UndoHistory
 from editor.output import QtHandler, StreamToLogger
+from ui.problems_panel import ProblemsPanel
+from ui.search_panel import SearchPanel
+from ui.file_explorer import FileExplorer
+from ui.perf_hud import PerfHud
+from ui.themes import THEMES, compiled_theme
 from utils.helpers import validate_input, confirm_action, show_error_message, extract_error_line
+from utils.interpreters import imported_modules, import_profile_script, parse_importtime
+from utils.traceback_parser import TracebackParser, traceback_diagnostics
+from utils.background import thread_tasks, shutdown_background_tasks
+from utils.perf import StallWatchdog, timed
+from utils.session import initial_workspace_root, load_session, save_session
+from utils.settings import get_setting, set_setting
+from utils.workspace import DEFAULT_EXCLUDES, iter_files
 
 class CommandPalette(QDialog):
     def __init__(self, parent, actions):
@@ -107,7 +127,7 @@ class SettingsDialog(QDialog):
         theme_layout = QHBoxLayout()
         theme_label = QLabel("Theme:")
         self.theme_combo = QComboBox()
-        self.theme_combo.addItems(["Light", "Dark"])
+        self.theme_combo.addItems(list(THEMES))
         self.theme_combo.setCurrentText(current_theme)
         theme_layout.addWidget(theme_label)
         theme_layout.addWidget(self.theme_combo)
@@ -140,13 +160,52 @@ class SettingsDialog(QDialog):
     def get_settings(self):
         return self.theme_combo.currentText(), self.font_slider.value()
 
-class PackageListWorker(QThread):
-    result = pyqtSignal(str)
-    def run(self):
-        import subprocess
-        process = subprocess.Popen('pip list --format=columns', shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        stdout, stderr = process.communicate()
-        self.result.emit(stdout)
+def format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+class MemoryDiagnosticsDialog(QDialog):
+    """Per-document memory: the text buffer estimate and the undo history in RAM and on disk."""
+    COLUMNS = ["Document", "State", "Buffer", "Undo", "Redo", "Packed", "Spilled", "Undo RAM", "Undo disk"]
+
+    def __init__(self, parent, documents):
+        super().__init__(parent)
+        self.documents = documents
+        self.setWindowTitle("Memory Diagnostics")
+        self.resize(760, 360)
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.totals = QLabel(self)
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.refresh)
+        layout.addWidget(self.table)
+        layout.addWidget(self.totals)
+        layout.addWidget(refresh_btn)
+        self.refresh()
+
+    def refresh(self):
+        documents = self.documents()
+        self.table.setRowCount(len(documents))
+        memory = disk = 0
+        for row, document in enumerate(documents):
+            stats = document.undo_history.stats()
+            memory += document.memory_estimate() if document.loaded else stats['memory']
+            disk += stats['disk']
+            state = 'loaded' if document.loaded else 'not yet loaded' if document.deferred else 'unloaded'
+            buffer = format_size(document.memory_estimate() - stats['memory']) if document.loaded else '-'
+            values = [document.title, state, buffer, stats['undo'], stats['redo'], stats['packed'], stats['spilled'],
+                      format_size(stats['memory']), format_size(stats['disk'])]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(str(value)))
+        self.table.resizeColumnsToContents()
+        self.totals.setText(f"{len(documents)} documents: about {format_size(memory)} in memory, "
+                            f"{format_size(disk)} of undo history on disk")
 
 class QuickFileSwitcher(QDialog):
     def __init__(self, parent, root_path):
@@ -160,8 +219,9 @@ class QuickFileSwitcher(QDialog):
         layout = QVBoxLayout(self)
         self.list_widget = QListWidget(self)
         layout.addWidget(self.list_widget)
-        # Recursively find all .py files
-        py_files = [os.path.relpath(f, root_path) for f in glob.glob(os.path.join(root_path, '**', '*.py'), recursive=True)]
+        self.root_path = root_path
+        # Recursively find all .py files, skipping virtualenvs, build output and ignored files
+        py_files = sorted(os.path.relpath(path, root_path) for path, _mtime, _size in iter_files(root_path, respect_gitignore=True))
         self.list_widget.addItems(py_files)
         self.list_widget.setCurrentRow(0)
         self.list_widget.itemDoubleClicked.connect(self.accept)
@@ -178,20 +238,107 @@ class QuickFileSwitcher(QDialog):
     def selected_file(self):
         item = self.list_widget.currentItem()
         if item:
-            return os.path.abspath(item.text())
+            return os.path.join(self.root_path, item.text())
+        return None
+
+class SymbolSearchDialog(QDialog):
+    """Go to symbol in workspace; also lists candidates when a definition is ambiguous."""
+    def __init__(self, parent, index, root_path, query='', symbols=None):
+        super().__init__(parent)
+        self.setWindowTitle("Go to Symbol in Workspace")
+        self.setModal(True)
+        self.setWindowFlags(self.windowFlags() | Qt.FramelessWindowHint)
+        self.setStyleSheet("QDialog { background: #23263a; border: 2px solid #00c896; border-radius: 16px; } QLineEdit { font-size: 16px; padding: 6px; border-radius: 8px; background: #181c2a; color: #fff; border: 1px solid #00c896; } QListWidget { background: #23263a; color: #fff; font-size: 15px; border-radius: 8px; }")
+        self.setFixedWidth(560)
+        self.setFixedHeight(380)
+        self.index = index
+        self.root_path = root_path
+        self.symbols = []
+        layout = QVBoxLayout(self)
+        self.search = QLineEdit(self)
+        self.search.setPlaceholderText("Type a class, function or variable name...")
+        self.list_widget = QListWidget(self)
+        layout.addWidget(self.search)
+        layout.addWidget(self.list_widget)
+        self.search.textChanged.connect(self.update_results)
+        self.search.returnPressed.connect(self.accept)
+        self.list_widget.itemActivated.connect(self.accept)
+        self.list_widget.itemDoubleClicked.connect(self.accept)
+        self.search.installEventFilter(self)
+        self.search.setText(query)
+        if symbols is not None:
+            self.show_symbols(symbols)
+
+    def update_results(self, text):
+        # Also for an empty query, whose [] must not be overtaken by a search still running
+        self.index.search_async(text.strip(), self.show_symbols)
+
+    def show_symbols(self, symbols):
+        self.symbols = symbols
+        self.list_widget.clear()
+        for name, kind, path, line, _col, container in symbols:
+            qualified = f"{container}.{name}" if container else name
+            location = os.path.relpath(path, self.root_path) if path.startswith(self.root_path) else path
+            self.list_widget.addItem(f"{qualified}  ({kind})  —  {location}:{line}")
+        if self.symbols:
+            self.list_widget.setCurrentRow(0)
+
+    def eventFilter(self, obj, event):
+        # Up/Down in the search box move through the results
+        if obj is self.search and event.type() == event.KeyPress and event.key() in (Qt.Key_Up, Qt.Key_Down):
+            row = self.list_widget.currentRow() + (1 if event.key() == Qt.Key_Down else -1)
+            if 0 <= row < self.list_widget.count():
+                self.list_widget.setCurrentRow(row)
+            return True
+        return super().eventFilter(obj, event)
+
+    def selected_symbol(self):
+        row = self.list_widget.currentRow()
+        if 0 <= row < len(self.symbols):
+            return self.symbols[row]
         return None
 
 class EZCode(QMainWindow):
-    def __init__(self):
+    def __init__(self, workspace_root=None):
         super().__init__()
-        self.file_path = ''
         self.log_capture = False
         self.debugging = False
         self.pdb = None
         self.notification_label = None
-        self.run_process = None
+        self.run_job = None
+        self.run_document = None
+        self.traceback_parser = None
+        self.run_diagnostics = []
+        self.package_job = None
         self.stop_action = None
+        # Known before anything is indexed, so start-up never scans a folder only to re-root
+        self.workspace_root = os.path.abspath(workspace_root or initial_workspace_root())
+        self.symbol_index = WorkspaceIndex(self.workspace_root, self)
+        self.interpreters = InterpreterManager(self.workspace_root, self)
+        self.file_watcher = FileWatcher(self)
+        self.file_watcher.file_changed.connect(self.on_file_changed_on_disk)
+        self.file_watcher.file_removed.connect(self.on_file_removed_from_disk)
+        self.runner = CommandRunner(self, max_concurrent=get_setting('jobs/max_concurrent'),
+                                    buffer_bytes=get_setting('jobs/output_buffer_bytes'))
+        self.theme = None  # Name of the applied theme, a key of ui.themes.THEMES
+        UndoHistory.memory_budget = get_setting('undo/memory_budget_mb') * 1024 * 1024
+        UndoHistory.disk_budget = get_setting('undo/disk_budget_mb') * 1024 * 1024
+        Document.long_line_chars = get_setting('editor/long_line_chars')
+        CodeEditor.show_minimap = get_setting('editor/minimap')
+        LineDiff.base_mode = get_setting('diff/base')
+        self.saved_session = None
+        self.session_timer = QTimer(self)
+        self.session_timer.setSingleShot(True)
+        self.session_timer.setInterval(1000)
+        self.session_timer.timeout.connect(self.write_session)
+        self.watchdog = StallWatchdog(self, threshold=get_setting('perf/stall_threshold_ms') / 1000)
+        self.watchdog.stalled.connect(self.on_stall)
         self.init_ui()
+        self.interpreters.interpreters_changed.connect(self.update_interpreter_label)
+        self.update_interpreter_label()
+        self.perf_hud = PerfHud(self.editor, self.watchdog)
+        if get_setting('perf/stall_watchdog'):
+            self.watchdog.start()
 
         # Add a logging handler
         self.logger = logging.getLogger()
@@ -216,33 +363,85 @@ class EZCode(QMainWindow):
         self.editor = CodeEditor()
         self.output = QPlainTextEdit(self)
         self.output.setReadOnly(True)
+        self.output.setMaximumBlockCount(get_setting('output/max_lines'))
 
         # File Explorer Panel
-        self.file_model = QFileSystemModel()
-        self.file_model.setRootPath(os.getcwd())
-        self.file_model.setNameFilters(["*.py"])
-        self.file_model.setNameFilterDisables(False)
-        self.file_tree = QTreeView()
-        self.file_tree.setModel(self.file_model)
-        self.file_tree.setRootIndex(self.file_model.index(os.getcwd()))
-        self.file_tree.setColumnHidden(1, True)
-        self.file_tree.setColumnHidden(2, True)
-        self.file_tree.setColumnHidden(3, True)
-        self.file_tree.setHeaderHidden(True)
+        self.file_tree = FileExplorer(self.workspace_root,
+                                      patterns=get_setting('explorer/name_filters') or None,
+                                      excludes=DEFAULT_EXCLUDES | set(get_setting('explorer/excludes')),
+                                      max_loaded_dirs=get_setting('explorer/max_loaded_dirs'))
         self.file_tree.setStyleSheet("QTreeView { background: #f4f7fa; border-radius: 10px; font-size: 15px; } QTreeView::item:selected { background: #e0e7ef; color: #00c896; }")
-        self.file_tree.clicked.connect(self.open_file_from_explorer)
+        self.file_tree.file_activated.connect(self.load_file)
         self.file_tree.setMinimumWidth(220)
 
         self.dock_file_explorer = QDockWidget("File Explorer", self)
+        self.dock_file_explorer.setObjectName('dock_file_explorer')
         self.dock_file_explorer.setWidget(self.file_tree)
         self.addDockWidget(Qt.LeftDockWidgetArea, self.dock_file_explorer)
 
         self.dock_output = QDockWidget("Output Console", self)
+        self.dock_output.setObjectName('dock_output')
         self.dock_output.setWidget(self.output)
         self.addDockWidget(Qt.BottomDockWidgetArea, self.dock_output)
 
+        self.editor.definition_requested.connect(self.go_to_definition)
+
+        self.problems = ProblemsPanel(self)
+        self.problems.problem_activated.connect(self.go_to_problem)
+
+        self.tab_bar = QTabBar(self)
+        self.tab_bar.setTabsClosable(True)
+        self.tab_bar.setMovable(True)
+        self.tab_bar.setDocumentMode(True)
+        self.tab_bar.setExpanding(False)
+        self.tab_bar.setElideMode(Qt.ElideMiddle)
+        self.tab_bar.tabCloseRequested.connect(self.close_tab)
+        self.add_tab(self.editor.doc)
+        self.tab_bar.currentChanged.connect(self.on_tab_changed)
+        self.editor.buffer_changed.connect(self.on_buffer_changed)
+        for signal in (self.tab_bar.currentChanged, self.tab_bar.tabMoved, self.editor.cursorPositionChanged,
+                       self.editor.verticalScrollBar().valueChanged, self.editor.breakpoints_changed):
+            signal.connect(self.schedule_session_save)
+        remove_stale_caches()
+        self.dock_problems = QDockWidget("Problems", self)
+        self.dock_problems.setObjectName('dock_problems')
+        self.dock_problems.setWidget(self.problems)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.dock_problems)
+        self.dock_problems.hide()
+
+        self.search_panel = SearchPanel(self.workspace_root, self)
+        self.search_panel.match_activated.connect(self.go_to_problem)
+        self.search_panel.files_replaced.connect(self.on_files_replaced)
+        self.dock_search = QDockWidget("Search", self)
+        self.dock_search.setObjectName('dock_search')
+        self.dock_search.setWidget(self.search_panel)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.dock_search)
+        self.dock_search.hide()
+        self.docks = (self.dock_file_explorer, self.dock_output, self.dock_problems, self.dock_search)
+        for dock in self.docks:
+            dock.visibilityChanged.connect(self.schedule_session_save)
+            dock.dockLocationChanged.connect(self.schedule_session_save)
+
+        self.long_line_bar = QWidget(self)
+        long_line_layout = QHBoxLayout(self.long_line_bar)
+        long_line_layout.setContentsMargins(8, 2, 8, 2)
+        self.long_line_label = QLabel(self.long_line_bar)
+        show_full_btn = QPushButton("Show Full Text", self.long_line_bar)
+        show_full_btn.clicked.connect(lambda: self.editor.doc.expand_all())
+        long_line_layout.addWidget(self.long_line_label, 1)
+        long_line_layout.addWidget(show_full_btn)
+        self.long_line_bar.hide()
+
+        self.editor_area = QWidget(self)
+        editor_layout = QVBoxLayout(self.editor_area)
+        editor_layout.setContentsMargins(0, 0, 0, 0)
+        editor_layout.setSpacing(0)
+        editor_layout.addWidget(self.tab_bar)
+        editor_layout.addWidget(self.long_line_bar)
+        editor_layout.addWidget(self.editor)
+
         self.splitter = QSplitter(Qt.Vertical)
-        self.splitter.addWidget(self.editor)
+        self.splitter.addWidget(self.editor_area)
         self.editor.setMinimumHeight(400)
         self.output.setMinimumHeight(200)
         self.splitter.addWidget(self.dock_output)
@@ -252,35 +451,38 @@ class EZCode(QMainWindow):
         self.create_toolbar()
         self.create_menu()
         self.create_status_bar()
-        self.apply_modern_stylesheet()
         self.set_light_mode()
         self.show_welcome_if_no_file()
         self.show()
 
-    def create_toolbar(self, mode='light'):
+    def create_toolbar(self):
         self.toolbar = QToolBar("Main Toolbar")
+        self.toolbar.setObjectName('main_toolbar')
         self.toolbar.setIconSize(QSize(32, 32))
-        self.toolbar.setStyleSheet("QToolBar { spacing: 12px; border-radius: 12px; padding: 8px; background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 #f8fafc, stop:1 #e0e7ef); }")
         self.addToolBar(self.toolbar)
-        color = '#222' if mode == "light" else '#f8f8f2'
-        color_active = '#00c896' if mode == 'light' else '#80c0ff'
+        # Icons come from the theme (see apply_theme): action -> (icon name, color, active color)
+        self.toolbar_icons = {}
 
-        open_action = QAction(qta.icon('fa.folder-open', color=color, color_active=color_active), "Open", self)
+        open_action = QAction("Open", self)
         open_action.setShortcut('Ctrl+O')
         open_action.setToolTip("Open File (Ctrl+O)")
         open_action.triggered.connect(self.open_file)
-        save_action = QAction(qta.icon('fa.save', color=color, color_active=color_active), "Save", self)
+        self.toolbar_icons[open_action] = ('fa.folder-open', None, None)
+        save_action = QAction("Save", self)
         save_action.setShortcut('Ctrl+S')
         save_action.setToolTip("Save File (Ctrl+S)")
         save_action.triggered.connect(self.save_file)
-        run_action = QAction(qta.icon('fa.play-circle', color='#00c896', color_active='#00e6b8'), "Run", self)
+        self.toolbar_icons[save_action] = ('fa.save', None, None)
+        run_action = QAction("Run", self)
         run_action.setShortcut('F5')
         run_action.setToolTip("Run Code (F5)")
         run_action.triggered.connect(self.run_code)
-        debug_action = QAction(qta.icon('fa.bug', color='#e67e22', color_active='#f39c12'), "Debug", self)
+        self.toolbar_icons[run_action] = ('fa.play-circle', '#00c896', '#00e6b8')
+        debug_action = QAction("Debug", self)
         debug_action.setShortcut('F9')
         debug_action.setToolTip("Toggle Debug Mode (F9)")
         debug_action.triggered.connect(self.toggle_debugging_mode)
+        self.toolbar_icons[debug_action] = ('fa.bug', '#e67e22', '#f39c12')
 
         self.toolbar.addAction(open_action)
         self.toolbar.addAction(save_action)
@@ -295,6 +497,9 @@ class EZCode(QMainWindow):
         open_action.setShortcut('Ctrl+O')
         open_action.setToolTip('Open File (Ctrl+O)')
         open_action.triggered.connect(self.open_file)
+        open_folder_action = QAction('Open Folder...', self)
+        open_folder_action.setToolTip('Choose the workspace folder shown in the File Explorer')
+        open_folder_action.triggered.connect(self.open_folder)
         save_action = QAction('Save', self)
         save_action.setShortcut('Ctrl+S')
         save_action.setToolTip('Save File (Ctrl+S)')
@@ -308,6 +513,7 @@ class EZCode(QMainWindow):
         exit_action.triggered.connect(self.close)
 
         file_menu.addAction(open_action)
+        file_menu.addAction(open_folder_action)
         file_menu.addAction(save_action)
         file_menu.addAction(save_as_action)
         file_menu.addAction(exit_action)
@@ -318,6 +524,18 @@ class EZCode(QMainWindow):
         run_action.setToolTip('Run Code (F5)')
         run_action.triggered.connect(self.run_code)
         run_menu.addAction(run_action)
+        run_tests_action = QAction('Run Tests', self)
+        run_tests_action.setToolTip('Run the project test suite with pytest')
+        run_tests_action.triggered.connect(self.run_tests)
+        run_menu.addAction(run_tests_action)
+        profile_imports_action = QAction('Profile Imports', self)
+        profile_imports_action.setToolTip("Time the imports of the current file with the project's interpreter")
+        profile_imports_action.triggered.connect(self.profile_imports)
+        run_menu.addAction(profile_imports_action)
+        run_menu.addSeparator()
+        select_interpreter_action = QAction('Select Interpreter...', self)
+        select_interpreter_action.triggered.connect(self.select_interpreter)
+        run_menu.addAction(select_interpreter_action)
 
         debug_menu = menubar.addMenu('Debug')
         debug_action = QAction('Debug', self)
@@ -334,9 +552,28 @@ class EZCode(QMainWindow):
         reset_layout_action = QAction('Reset Layout', self)
         reset_layout_action.triggered.connect(self.reset_layout)
         view_menu.addAction(reset_layout_action)
+        toggle_problems_action = QAction('Toggle Problems', self)
+        toggle_problems_action.triggered.connect(self.toggle_problems_panel)
+        view_menu.addAction(toggle_problems_action)
+        toggle_minimap_action = QAction('Toggle Minimap', self)
+        toggle_minimap_action.triggered.connect(self.toggle_minimap)
+        view_menu.addAction(toggle_minimap_action)
+        search_action = QAction('Search in Workspace', self)
+        search_action.setShortcut('Ctrl+Shift+F')
+        search_action.triggered.connect(self.show_search_panel)
+        view_menu.addAction(search_action)
         clear_output_action = QAction('Clear Output Console', self)
         clear_output_action.triggered.connect(self.clear_output_console)
         view_menu.addAction(clear_output_action)
+        memory_action = QAction('Memory Diagnostics', self)
+        memory_action.triggered.connect(self.show_memory_diagnostics)
+        view_menu.addAction(memory_action)
+        perf_hud_action = QAction('Toggle Performance HUD', self)
+        perf_hud_action.triggered.connect(self.toggle_perf_hud)
+        view_menu.addAction(perf_hud_action)
+        perf_report_action = QAction('Dump Performance Report', self)
+        perf_report_action.triggered.connect(self.dump_perf_report)
+        view_menu.addAction(perf_report_action)
 
         settings_menu = menubar.addMenu('Settings')
         light_mode_action = QAction('Light Mode', self)
@@ -366,89 +603,558 @@ class EZCode(QMainWindow):
         self.font_slider.valueChanged.connect(self.set_editor_font_size)
         self.status_bar.addPermanentWidget(QLabel("Font Size:"))
         self.status_bar.addPermanentWidget(self.font_slider)
+        self.interpreter_label = QLabel()
+        self.status_bar.addPermanentWidget(self.interpreter_label)
 
     def set_editor_font_size(self, value):
         self.editor.setFont(QFont("Courier", value))
+        self.schedule_session_save()
 
     def open_file(self):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(self, "Open Python File", "", "Python Files (*.py);;All Files (*)", options=options)
         if file_path:
-            with open(file_path, 'r') as file:
-                self.editor.setPlainText(file.read())
-                self.file_path = file_path
-            self.status_bar.showMessage(f"Opened: {file_path}")
+            self.load_file(file_path)
         else:
             self.show_welcome_if_no_file()
 
+    def open_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Open Folder", self.workspace_root)
+        if folder:
+            self.set_workspace_root(folder)
+
+    def set_workspace_root(self, root):
+        """Re-roots the explorer, the symbol index, workspace search and test runs at ``root``."""
+        self.workspace_root = os.path.abspath(root)
+        self.file_tree.set_root(self.workspace_root)
+        self.symbol_index.set_root(self.workspace_root)
+        self.search_panel.set_root(self.workspace_root)
+        self.interpreters.set_root(self.workspace_root)
+        self.dock_file_explorer.setWindowTitle(f"File Explorer — {os.path.basename(self.workspace_root) or self.workspace_root}")
+        self.status_bar.showMessage(f"Workspace: {self.workspace_root}")
+
+    @property
+    def file_path(self):
+        """Path of the document in the current tab ('' for an untitled buffer)."""
+        editor = getattr(self, 'editor', None)
+        return editor.doc.path or '' if editor is not None else ''
+
+    def documents(self):
+        return [self.tab_bar.tabData(index) for index in range(self.tab_bar.count())]
+
+    def find_document(self, path):
+        path = os.path.abspath(path)
+        return next((document for document in self.documents() if document.path == path), None)
+
+    def tab_index(self, document):
+        return next((index for index in range(self.tab_bar.count()) if self.tab_bar.tabData(index) is document), -1)
+
+    def add_tab(self, document):
+        index = self.tab_bar.addTab(document.title)
+        self.tab_bar.setTabData(index, document)
+        self.tab_bar.setTabToolTip(index, document.path or document.title)
+        document.last_used = time.monotonic()
+        document.modification_changed.connect(lambda _modified, document=document: self.update_tab_title(document))
+        document.diagnostics_changed.connect(lambda document=document: self.on_document_diagnostics(document))
+        document.preview_changed.connect(lambda document=document: self.update_long_line_bar(document))
+        return index
+
+    def update_tab_title(self, document):
+        index = self.tab_index(document)
+        if index >= 0:
+            self.tab_bar.setTabText(index, ('● ' if document.is_modified() else '') + document.title)
+            self.tab_bar.setTabToolTip(index, document.path or document.title)
+
+    def activate_document(self, document):
+        self.tab_bar.setCurrentIndex(self.tab_index(document))
+
+    def on_tab_changed(self, index):
+        if index < 0:
+            return
+        document = self.tab_bar.tabData(index)
+        document.last_used = time.monotonic()
+        deferred = document.deferred
+        self.editor.set_buffer(document)
+        if deferred and document.path:
+            self.file_watcher.watch(document.path, document.digest)
+            self.warn_fallback_encoding(document)
+        self.unload_inactive_documents()
+
+    def warn_fallback_encoding(self, document):
+        if document.encoding == FALLBACK_ENCODING:
+            self.status_bar.showMessage(f"{document.title} is not valid UTF-8 and was opened as Latin-1; saving keeps"
+                                        f" its bytes, but non-ASCII characters may show wrongly", 10000)
+
+    def update_long_line_bar(self, document):
+        if document is not self.editor.doc:
+            return
+        count = len(document.preview_lines)
+        self.long_line_label.setText(
+            f"{document.title} has very long lines; {count} {'is' if count == 1 else 'are'} shown truncated and the"
+            f" file is read-only. Double-click a line to expand it.")
+        self.long_line_bar.setVisible(document.preview)
+
+    def on_buffer_changed(self, document):
+        self.update_long_line_bar(document)
+        self.problems.set_buffer_name(document.title)
+        self.problems.set_diagnostics('lint', 'Lint', document.diagnostics.get('lint', []))
+        self.update_tab_title(document)
+
+    def on_document_diagnostics(self, document):
+        if document is self.editor.doc:
+            self.problems.set_diagnostics('lint', 'Lint', document.diagnostics.get('lint', []))
+
+    def unload_inactive_documents(self):
+        """Unloads least recently used background documents while open documents exceed the memory budget."""
+        budget = get_setting('documents/memory_budget_mb') * 1024 * 1024
+        loaded = sorted((document for document in self.documents() if document.loaded),
+                        key=lambda document: document.last_used)
+        total = sum(document.memory_estimate() for document in loaded)
+        for document in loaded:
+            if total <= budget:
+                break
+            if document is self.editor.doc:
+                continue
+            total -= document.memory_estimate()
+            document.unload()
+
+    def close_tab(self, index):
+        document = self.tab_bar.tabData(index)
+        if document.is_modified():
+            self.activate_document(document)
+            reply = QMessageBox.question(self, 'Unsaved Changes', f"Save changes to {document.title}?",
+                                         QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel, QMessageBox.Save)
+            if reply == QMessageBox.Cancel:
+                return
+            if reply == QMessageBox.Save:
+                self.save_file()
+                if document.is_modified():
+                    return  # Save As was cancelled
+        if self.tab_bar.count() == 1:
+            # Never leave the editor without a document
+            self.add_tab(Document(parent=self))
+        if document.path:
+            self.file_watcher.unwatch(document.path)
+        if document is self.run_document:
+            self.run_document = None
+        self.tab_bar.removeTab(self.tab_index(document))
+        document.close()
+        self.show_welcome_if_no_file()
+        self.schedule_session_save()
+
+    def close_current_tab(self):
+        self.close_tab(self.tab_bar.currentIndex())
+
+    def cycle_tabs(self, step):
+        if self.tab_bar.count() > 1:
+            self.tab_bar.setCurrentIndex((self.tab_bar.currentIndex() + step) % self.tab_bar.count())
+
+    @timed('open file')
+    def load_file(self, file_path):
+        existing = self.find_document(file_path)
+        if existing is not None:
+            self.activate_document(existing)
+            return
+        state = read_file_state(file_path)
+        if state is None:
+            show_error_message(f"Could not read {file_path}", self)
+            return
+        _mtime, _size, digest, text, encoding = state
+        self.file_watcher.watch(file_path, digest)
+        document = Document(file_path, text, parent=self, digest=digest, encoding=encoding)
+        self.open_documents([document])
+        self.status_bar.showMessage(f"Opened: {file_path}")
+        self.warn_fallback_encoding(document)
+
+    def open_documents(self, documents, current=None):
+        """Adds tabs for ``documents`` and shows ``current`` (default: the last one)."""
+        # An untouched untitled buffer (the welcome text) gives way to the first documents opened
+        replaced = self.editor.doc if not self.editor.doc.path and not self.editor.doc.is_modified() else None
+        for document in documents:
+            self.add_tab(document)
+        self.activate_document(current or documents[-1])
+        if replaced is not None and self.tab_bar.count() > 1:
+            self.tab_bar.removeTab(self.tab_index(replaced))
+            replaced.close()
+        self.schedule_session_save()
+
+    def schedule_session_save(self, *_args):
+        self.session_timer.start()
+
+    def session_state(self):
+        documents = []
+        for document in self.documents():
+            if document.path is None:
+                continue  # Untitled buffers are covered by the recovery journal, not the session
+            view_state = self.editor.view_state() if document is self.editor.doc else document.view_state
+            documents.append({'path': document.path, 'view_state': list(view_state),
+                              'breakpoints': sorted(document.breakpoints)})
+        return {
+            'workspace_root': self.workspace_root,
+            'documents': documents,
+            'current': self.editor.doc.path,
+            'theme': self.theme,
+            'font_size': self.editor.font().pointSize(),
+            'geometry': bytes(self.saveGeometry().toBase64()).decode('ascii'),
+            'window_state': bytes(self.saveState().toBase64()).decode('ascii'),
+            # The output console lives in the splitter, outside what saveState() records
+            'visible_docks': [dock.objectName() for dock in self.docks if not dock.isHidden()],
+        }
+
+    def write_session(self):
+        self.session_timer.stop()
+        state = self.session_state()
+        if state == self.saved_session:
+            return
+        try:
+            save_session(state)
+        except OSError as error:
+            self.logger.warning(f"Could not save the session: {error}")
+            return
+        self.saved_session = state
+
+    def restore_session(self):
+        """Reopens the last session's tabs, markers, layout and theme.
+
+        Only the active document is read (and highlighted) now. The other tabs start
+        deferred: their files are read ahead on a worker thread and turned into documents
+        when first shown.
+        """
+        session = load_session()
+        if not session:
+            return
+        if session.get('theme') in THEMES:
+            self.apply_theme(session['theme'])
+        if session.get('font_size'):
+            self.font_slider.setValue(session['font_size'])
+        if session.get('geometry'):
+            self.restoreGeometry(QByteArray.fromBase64(session['geometry'].encode('ascii')))
+        if session.get('window_state'):
+            self.restoreState(QByteArray.fromBase64(session['window_state'].encode('ascii')))
+        if 'visible_docks' in session:
+            for dock in self.docks:
+                dock.setVisible(dock.objectName() in session['visible_docks'])
+        documents = []
+        for entry in session.get('documents', []):
+            path = entry['path']
+            if not os.path.isfile(path) or self.find_document(path) is not None:
+                continue
+            document = Document(path, None, parent=self)
+            document.view_state = tuple(entry['view_state'])
+            document.breakpoints = set(entry['breakpoints'])
+            documents.append(document)
+        if not documents:
+            return
+        current = next((document for document in documents if document.path == session.get('current')), documents[0])
+        self.open_documents(documents, current)
+        for document in documents:
+            if document is not current:
+                thread_tasks().submit(read_file_state, document.path,
+                                      callback=lambda state, document=document: self.on_read_ahead(document, state))
+        self.saved_session = self.session_state()
+
+    def on_read_ahead(self, document, state):
+        if state is None or not document.deferred or document.pending_disk_text is not None or self.tab_index(document) < 0:
+            return  # Shown, closed or changed on disk meanwhile
+        _mtime, _size, document.digest, document.pending_disk_text, document.encoding = state
+        self.file_watcher.watch(document.path, document.digest)
+
+    def offer_recovery(self):
+        """Offers to reopen the unsaved edits journaled by an editor that crashed or was killed."""
+        journals = recoverable_journals()
+        if not journals:
+            return
+        titles = ', '.join(header['title'] for _path, header, _text in journals)
+        reply = QMessageBox.question(self, 'Recover Unsaved Changes',
+                                     f"EZap did not shut down cleanly. Recover unsaved changes to {titles}?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if reply == QMessageBox.Yes:
+            for _path, header, text in journals:
+                path = header['path']
+                document = self.find_document(path) if path else None
+                if document is not None:
+                    # Already reopened by the session: bring it up to the journaled text
+                    self.activate_document(document)
+                    self.editor.apply_external_text(text)
+                else:
+                    state = read_file_state(path) if path else None
+                    document = Document(path, text, parent=self, encoding=state[4] if state else 'utf-8')
+                    if state is not None:
+                        self.file_watcher.watch(path, state[2])
+                    self.open_documents([document])
+                document.qdoc.setModified(True)  # Starts this process's own journal for it
+                document.line_diff.reload_base()  # The recovered text is not what is saved
+            self.status_bar.showMessage(f"Recovered unsaved changes to {titles}", 5000)
+        discard_journals(path for path, _header, _text in journals)
+
+    def open_path(self, file_path, line=None, column=None):
+        if not os.path.isfile(file_path):
+            self.status_bar.showMessage(f"File not found: {file_path}")
+            return
+        if os.path.abspath(file_path) != os.path.abspath(self.file_path or ''):
+            self.load_file(file_path)
+        if line:
+            self.go_to_line(line, column)
+
+    def go_to_line(self, line, column=None):
+        block = self.editor.document().findBlockByNumber(max(line - 1, 0))
+        if not block.isValid():
+            block = self.editor.document().lastBlock()
+        cursor = self.editor.textCursor()
+        cursor.setPosition(block.position() + min(max((column or 1) - 1, 0), block.length() - 1))
+        self.editor.setTextCursor(cursor)
+        self.editor.centerCursor()
+        self.editor.setFocus()
+
+    def open_requested_files(self, files):
+        # Files handed over from the command line or from a second editor invocation
+        for file_path, line, column in files:
+            if os.path.isdir(file_path):
+                if os.path.abspath(file_path) != self.workspace_root:
+                    self.set_workspace_root(file_path)
+            else:
+                self.open_path(file_path, line, column)
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
     def save_file(self):
         if not self.file_path:
             self.save_as()
         else:
-            with open(self.file_path, 'w') as file:
-                code = self.editor.toPlainText()
-                file.write(code)
+            if self.file_watcher.changed_on_disk(self.file_path) and not confirm_action(
+                    f"overwrite the changes another program made to {os.path.basename(self.file_path)}", self):
+                return
+            if not self.write_document(self.file_path):
+                return
+            self.file_watcher.watch(self.file_path)
+            self.editor.document().setModified(False)
+            self.symbol_index.refresh([self.file_path])
             self.status_bar.showMessage(f"Saved: {self.file_path}")
             self.show_notification("File saved!")
 
+    @timed('file write')
+    def write_document(self, file_path):
+        """Writes the current document in its encoding; returns False if it cannot be encoded."""
+        document = self.editor.doc
+        try:
+            data = document.text().replace('\n', os.linesep).encode(document.encoding)
+        except UnicodeEncodeError as error:
+            character = error.object[error.start]
+            show_error_message(f"{document.title} contains {character!r}, which {document.encoding} cannot"
+                               f" encode. Remove it to save the file.", self)
+            return False
+        with open(file_path, 'wb') as file:
+            file.write(data)
+        return True
+
     def save_as(self):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getSaveFileName(self, "Save Python File", "", "Python Files (*.py);;All Files (*)", options=options)
         if file_path:
-            with open(file_path, 'w') as file:
-                code = self.editor.toPlainText()
-                file.write(code)
-                self.file_path = file_path
+            if not self.write_document(file_path):
+                return
+            if self.file_path:
+                self.file_watcher.unwatch(self.file_path)
+            self.editor.doc.set_path(file_path)
+            self.file_watcher.watch(file_path)
+            self.editor.document().setModified(False)
+            self.symbol_index.refresh([file_path])
+            self.update_tab_title(self.editor.doc)
+            self.problems.set_buffer_name(self.editor.doc.title)
             self.status_bar.showMessage(f"Saved as: {file_path}")
             self.show_notification("File saved!")
 
+    def show_search_panel(self):
+        self.dock_search.show()
+        self.dock_search.raise_()
+        selected = self.editor.textCursor().selectedText()
+        self.search_panel.focus_query(selected if '\u2029' not in selected else '')
+
+    def on_files_replaced(self, counts):
+        # The file watcher picks up the change if the current file was among them
+        self.symbol_index.refresh(list(counts))
+        self.status_bar.showMessage(f"Replaced {sum(counts.values())} matches in {len(counts)} files")
+
+    def on_file_changed_on_disk(self, path, text, encoding):
+        document = self.find_document(path)
+        if document is None:
+            return
+        name = document.title
+        if document.is_modified():
+            box = QMessageBox(QMessageBox.Warning, "File Changed on Disk",
+                              f"{name} was changed by another program, and you have unsaved changes.", parent=self)
+            reload_button = box.addButton("Reload from Disk", QMessageBox.DestructiveRole)
+            box.addButton("Keep My Version", QMessageBox.RejectRole)
+            box.exec_()
+            if box.clickedButton() is not reload_button:
+                return
+        document.encoding = encoding
+        self.warn_fallback_encoding(document)
+        if not document.loaded:
+            document.pending_disk_text = text  # Applied when the tab is restored
+            self.on_reloaded(document)
+        elif document is self.editor.doc:
+            # Diff-applied, so undo history, cursor and scroll position survive the reload
+            self.editor.apply_external_text(text, lambda: self.on_reloaded(document))
+        else:
+            document.apply_text(text, lambda: self.on_reloaded(document))
+
+    def on_reloaded(self, document):
+        if document.loaded:
+            document.qdoc.setModified(False)
+        else:
+            document.unloaded_modified = False
+        self.update_tab_title(document)
+        self.status_bar.showMessage(f"Reloaded {document.title} (changed on disk)", 5000)
+
+    def on_file_removed_from_disk(self, path):
+        document = self.find_document(path)
+        if document is not None:
+            if document.loaded:
+                document.qdoc.setModified(True)
+            else:
+                document.unloaded_modified = True
+            self.update_tab_title(document)
+            self.status_bar.showMessage(f"{document.title} was deleted on disk; save to keep it")
+
     def run_code(self):
-        if self.run_process is not None:
+        if self.run_job is not None:
             self.show_notification("A script is already running!")
             return
         if self.debugging:
             self.stop_debugging()
-        code = self.editor.toPlainText()
+        code = self.editor.doc.text()
         self.output.clear()
         # Write code to a temp file
         import tempfile
         self.temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.py', mode='w', encoding='utf-8')
         self.temp_file.write(code)
         self.temp_file.close()
-        # Start QProcess
-        self.run_process = QProcess(self)
-        self.run_process.setProcessChannelMode(QProcess.MergedChannels)
-        self.run_process.readyReadStandardOutput.connect(self.handle_run_stdout)
-        self.run_process.readyReadStandardError.connect(self.handle_run_stderr)
-        self.run_process.finished.connect(self.handle_run_finished)
-        self.run_process.start(sys.executable, [self.temp_file.name])
+        # Frames in the temp file are reported against the buffer
+        self.start_run_job(self.python(), [self.temp_file.name], "Running script...", path_map={self.temp_file.name: None})
+
+    def run_tests(self):
+        if self.run_job is not None:
+            self.show_notification("A script is already running!")
+            return
+        self.output.clear()
+        path_map = {self.file_path: None} if self.file_path else {}
+        self.start_run_job(self.python(), ['-m', 'pytest', '-q'], "Running tests...", cwd=self.workspace_root, path_map=path_map)
+
+    def python(self):
+        """The interpreter selected for the workspace, used by run, test, package and profiling commands."""
+        return self.interpreters.selected()
+
+    def update_interpreter_label(self):
+        python = self.python()
+        self.interpreter_label.setText(self.interpreters.describe(python))
+        self.interpreter_label.setToolTip(f"{python}\nRun → Select Interpreter... to change it")
+
+    def select_interpreter(self):
+        interpreters = self.interpreters.interpreters()
+        if not interpreters:
+            self.show_notification("Still looking for Python interpreters...")
+            return
+        labels = [self.interpreters.describe(path)
+                  + ("" if entry else " (not run until selected)" if self.interpreters.unchecked(path) else " (checking...)")
+                  for path, entry in interpreters]
+        paths = [path for path, _entry in interpreters]
+        current = paths.index(self.python()) if self.python() in paths else 0
+        label, ok = QInputDialog.getItem(self, 'Select Interpreter', f"Python for {self.workspace_root}:", labels, current, False)
+        if ok:
+            self.interpreters.select(paths[labels.index(label)])
+            self.status_bar.showMessage(f"Interpreter: {paths[labels.index(label)]}", 5000)
+
+    def profile_imports(self):
+        """Imports what the current file imports under ``-X importtime`` and lists the slowest modules."""
+        modules = imported_modules(self.editor.doc.text())
+        if not modules:
+            self.show_notification("The current file has no imports to profile")
+            return
+        self.output.clear()
+        self.write_text_to_output(f"Profiling {len(modules)} imports with {self.python()}...")
+        cwd = os.path.dirname(self.file_path) if self.file_path else self.workspace_root
+        job = self.runner.submit(self.python(), ['-X', 'importtime', '-c', import_profile_script(modules)], cwd=cwd, timeout=120)
+        job.finished.connect(lambda *_: self.show_import_profile(job.output_text()))
+
+    def show_import_profile(self, output):
+        rows = parse_importtime(output)
+        lines = [line for line in output.splitlines() if line.startswith('could not import')]
+        if rows:
+            lines.append(f"{'cumulative':>12} {'self':>10}  module")
+            for cumulative_us, self_us, module in rows[:30]:
+                lines.append(f"{cumulative_us / 1000:>9.1f} ms {self_us / 1000:>7.1f} ms  {module}")
+            lines.append(f"{len(rows)} modules imported in {sum(row[1] for row in rows) / 1000:.1f} ms")
+        elif not lines:
+            lines.append(output.strip() or "No import timings were reported")
+        self.write_text_to_output('\n'.join(lines))
+
+    def start_run_job(self, program, arguments, message, cwd=None, path_map=None):
+        self.traceback_parser = TracebackParser(path_map)
+        self.run_diagnostics = []
+        if self.run_document is not None and self.run_document.loaded:
+            self.run_document.set_diagnostics('run', [])
+        self.run_document = self.editor.doc  # Frames reported against the buffer belong to it
+        self.editor.clear_diagnostics('run')
+        self.problems.clear_source('run')
+        self.run_job = self.runner.submit(program, arguments, cwd=cwd)
+        self.run_job.output.connect(self.handle_run_stdout)
+        self.run_job.finished.connect(self.handle_run_finished)
         # Add Stop button
         if not self.stop_action:
             self.stop_action = QAction(qta.icon('fa.stop', color='#e74c3c'), "Stop", self)
             self.stop_action.setToolTip("Stop Running Script")
             self.stop_action.triggered.connect(self.stop_run_code)
             self.toolbar.addAction(self.stop_action)
-        self.status_bar.showMessage("Running script...")
+        self.status_bar.showMessage(message)
 
-    def handle_run_stdout(self):
-        output = self.run_process.readAllStandardOutput().data().decode(errors='replace')
+    @timed('output append')
+    def handle_run_stdout(self, output):
         self.output.moveCursor(QTextCursor.End)
         self.output.insertPlainText(output)
         self.output.moveCursor(QTextCursor.End)
+        for traceback in self.traceback_parser.feed(output):
+            self.show_traceback(traceback)
+
+    def show_traceback(self, traceback):
+        diagnostics = traceback_diagnostics(traceback, source='run')
+        # Carets are reported against the dedented source line Python printed
+        document = self.run_document
+        for index, diagnostic in enumerate(diagnostics):
+            if diagnostic.path is None and diagnostic.column and document is not None and document.loaded:
+                text = document.qdoc.findBlockByNumber(diagnostic.line - 1).text()
+                diagnostics[index] = diagnostic._replace(column=diagnostic.column + len(text) - len(text.lstrip()))
+        self.run_diagnostics.extend(diagnostics)
+        if document is not None:
+            document.set_diagnostics('run', self.run_diagnostics)
+        self.problems.set_buffer_name(document.title if document is not None else 'untitled')
+        self.problems.add_traceback('run', 'Run', traceback, diagnostics)
+        self.dock_problems.show()
+
+    def go_to_problem(self, path, line, column, source=''):
+        if path is None:
+            if source == 'run' and self.run_document is not None and self.tab_index(self.run_document) >= 0:
+                self.activate_document(self.run_document)
+            self.go_to_line(line, column)
+        else:
+            self.open_path(path, line, column)
 
-    def handle_run_stderr(self):
-        error = self.run_process.readAllStandardError().data().decode(errors='replace')
-        self.output.moveCursor(QTextCursor.End)
-        self.output.insertPlainText(error)
-        self.output.moveCursor(QTextCursor.End)
+    def toggle_problems_panel(self):
+        self.dock_problems.setVisible(not self.dock_problems.isVisible())
 
-    def handle_run_finished(self):
-        self.status_bar.showMessage("Execution finished")
+    def handle_run_finished(self, exit_code, status, wall_time):
+        for traceback in self.traceback_parser.finish():
+            self.show_traceback(traceback)
+        if status == 'finished':
+            self.status_bar.showMessage(f"Execution finished (exit code {exit_code}, {wall_time:.2f}s)")
+        else:
+            self.status_bar.showMessage(f"Execution {status} after {wall_time:.2f}s")
         if self.stop_action:
             self.toolbar.removeAction(self.stop_action)
             self.stop_action = None
-        self.run_process = None
-        import os
+        self.run_job = None
         if hasattr(self, 'temp_file'):
             try:
                 os.unlink(self.temp_file.name)
@@ -456,8 +1162,8 @@ class EZCode(QMainWindow):
                 pass
 
     def stop_run_code(self):
-        if self.run_process:
-            self.run_process.kill()
+        if self.run_job:
+            self.runner.cancel(self.run_job)
             self.status_bar.showMessage("Script stopped.")
             self.show_notification("Script stopped!")
 
@@ -466,20 +1172,30 @@ class EZCode(QMainWindow):
         self.status_bar.showMessage("Debugging mode " + ("enabled" if self.editor.debugging_mode else "disabled"))
 
     def set_light_mode(self):
-        self.editor.setStyleSheet("QPlainTextEdit { background-color: white; color: black; }")
-        self.output.setStyleSheet("QPlainTextEdit { background-color: white; color: black; }")
-        self.setStyleSheet("QWidget { background-color: white; color: black; }")
-        self.splitter.setStyleSheet("QSplitter::handle { background-color: #cccccc; }")
-        self.removeToolBar(self.toolbar)
-        self.create_toolbar(mode='light')
+        self.apply_theme('Light')
 
     def set_dark_mode(self):
-        self.editor.setStyleSheet("QPlainTextEdit { background-color: #2b2b2b; color: #f8f8f2; }")
-        self.output.setStyleSheet("QPlainTextEdit { background-color: #2b2b2b; color: #f8f8f2; }")
-        self.setStyleSheet("QWidget { background-color: #2b2b2b; color: #f8f8f2; }")
-        self.splitter.setStyleSheet("QSplitter::handle { background-color: #3f3f3f; }")
-        self.removeToolBar(self.toolbar)
-        self.create_toolbar(mode='dark')
+        self.apply_theme('Dark')
+
+    @timed('theme switch')
+    def apply_theme(self, name):
+        """Switches to the theme ``name``, compiled once by ui.themes.
+
+        The window gets the theme's palette and its one cached stylesheet (a single re-polish,
+        where each widget used to get its own sheet and the toolbar was rebuilt); the shared
+        highlighter engine gets its formats, and only the visible lines are re-highlighted
+        now, the rest in the background.
+        """
+        theme = compiled_theme(name)
+        self.setPalette(theme.palette)
+        self.setStyleSheet(theme.stylesheet)
+        shared_engine().set_formats(theme.formats)
+        self.editor.set_gutter_colors(*theme.gutter)
+        self.editor.restyle_visible()
+        for action, (icon, color, color_active) in self.toolbar_icons.items():
+            action.setIcon(theme.icon(icon, color, color_active))
+        self.theme = name
+        self.schedule_session_save()
 
     def toggle_output_console(self):
         if self.dock_output.isVisible():
@@ -496,119 +1212,27 @@ class EZCode(QMainWindow):
         self.dock_output.show()
 
     def closeEvent(self, event):
-        reply = QMessageBox.question(self, 'Close', 'Are you sure you want to quit?',
+        unsaved = [document.title for document in self.documents() if document.is_modified()]
+        question = 'Are you sure you want to quit?'
+        if unsaved:
+            question = f"Unsaved changes in {', '.join(unsaved)} will be lost.\n{question}"
+        reply = QMessageBox.question(self, 'Close', question,
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
+            self.write_session()
+            self.watchdog.stop()
+            for document in self.documents():
+                document.close()
+            self.runner.cancel_all()
+            self.symbol_index.close()
+            self.interpreters.close()
+            shutdown_background_tasks()
             event.accept()
         else:
             event.ignore()
 
     def apply_modern_stylesheet(self):
-        self.setStyleSheet("""
-        QMainWindow {
-            background: qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 #181c2a, stop:1 #23263a);
-        }
-        QMenuBar {
-            background: rgba(24,28,42,0.95);
-            color: #00c896;
-            font-size: 15px;
-            border-radius: 8px;
-        }
-        QMenuBar::item {
-            background: transparent;
-            color: #00c896;
-            padding: 6px 18px;
-            border-radius: 8px;
-        }
-        QMenuBar::item:selected {
-            background: #23263a;
-            color: #fff;
-        }
-        QMenu {
-            background: rgba(24,28,42,0.98);
-            color: #00c896;
-            font-size: 15px;
-            border-radius: 8px;
-        }
-        QMenu::item {
-            padding: 6px 18px;
-            border-radius: 8px;
-        }
-        QMenu::item:selected {
-            background: #23263a;
-            color: #fff;
-        }
-        QToolBar {
-            background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 #23263a, stop:1 #00c896);
-            border-radius: 16px;
-            spacing: 12px;
-            border: 2px solid #00c896;
-        }
-        QToolButton {
-            background: rgba(24,28,42,0.8);
-            border-radius: 12px;
-            padding: 8px;
-            color: #00c896;
-            border: 1.5px solid #00c896;
-        }
-        QToolButton:hover {
-            background: #00c896;
-            color: #fff;
-        }
-        QStatusBar {
-            background: #181c2a;
-            color: #00c896;
-            font-size: 14px;
-            border-radius: 8px;
-        }
-        QDockWidget {
-            background: rgba(24,28,42,0.95);
-            border-radius: 16px;
-            border: 2px solid #00c896;
-        }
-        QPlainTextEdit {
-            background: #23263a;
-            color: #fff;
-            font-family: 'Fira Mono', 'Consolas', 'Courier New', monospace;
-            font-size: 16px;
-            border-radius: 12px;
-            padding: 8px;
-            border: 1.5px solid #00c896;
-        }
-        QSplitter::handle {
-            background: #00c896;
-        }
-        QPushButton {
-            background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 #00c896, stop:1 #23263a);
-            color: #fff;
-            border-radius: 12px;
-            padding: 8px 18px;
-            font-size: 15px;
-            border: 2px solid #00c896;
-        }
-        QPushButton:hover {
-            background: #00c896;
-            color: #23263a;
-        }
-        QTableWidget {
-            background: #23263a;
-            border-radius: 12px;
-            font-size: 15px;
-            color: #fff;
-            border: 1.5px solid #00c896;
-        }
-        QHeaderView::section {
-            background: #00c896;
-            color: #23263a;
-            border-radius: 8px;
-            font-size: 15px;
-        }
-        QMessageBox {
-            background: #23263a;
-            color: #00c896;
-            border-radius: 16px;
-        }
-        """)
+        self.apply_theme('Modern')
 
     def toggle_console_log(self, checked):
         self.log_capture = checked
@@ -660,7 +1284,7 @@ class EZCode(QMainWindow):
         if ok:
             if validate_input(package_name, self):
                 if confirm_action(f'install {package_name}', self):
-                    self.execute_command_async(f'pip install {package_name}')
+                    self.execute_command_async(self.python(), ['-m', 'pip', 'install', *shlex.split(package_name)])
 
     def uninstall_package(self):
         self.output.clear()
@@ -668,29 +1292,26 @@ class EZCode(QMainWindow):
         if ok:
             if validate_input(package_name, self):
                 if confirm_action(f'uninstall {package_name}', self):
-                    self.execute_command_async(f'pip uninstall {package_name}')
+                    self.execute_command_async(self.python(), ['-m', 'pip', 'uninstall', *shlex.split(package_name)])
         else:
             self.write_text_to_output("Uninstallation cancelled")
 
-    def execute_command_async(self, command):
-        self.process = QProcess()
-        self.process.readyReadStandardOutput.connect(self.handle_stdout)
-        self.process.readyReadStandardError.connect(self.handle_stderr)
-        self.process.finished.connect(self.handle_command_finished)
+    def execute_command_async(self, python, arguments):
+        """Runs ``python`` with ``arguments`` (a pip command) as the package job."""
+        self.package_job = self.runner.submit(python, arguments)
+        self.package_job.output.connect(self.handle_stdout)
+        self.package_job.finished.connect(lambda *result, python=python: self.handle_command_finished(python, *result))
 
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setRange(0, 0)  # Set indeterminate mode
         self.statusBar().addWidget(self.progress_bar)
         self.progress_bar.show()
 
-        self.process.start(command)
-        
-        
     def clear_output_console(self):
         self.output.clear()
     
-    def handle_stdout(self):
-        output = self.process.readAllStandardOutput().data().decode().strip()
+    def handle_stdout(self, output):
+        output = output.strip()
         self.write_text_to_output(output)
 
         # Check if the output contains a prompt that requires user input
@@ -703,34 +1324,35 @@ class EZCode(QMainWindow):
         # Check if the response is not one of the valid options
         if response not in ["Y", "N", "y", "n"]:
             self.write_text_to_output("Command terminated.\nResponse is " + response)
-            self.process.kill()
+            self.runner.cancel(self.package_job)
             return  # Exit the function to avoid further processing
 
         if ok:
             # Send user response as input to the ongoing process if response is "Y" or "y"
             if response in ["Y", "y"]:
-                self.process.write((response + '\n').encode())
+                self.runner.write(self.package_job, (response + '\n').encode())
             else:
                 self.write_text_to_output("Uninstallation canceled!")
-                self.process.kill()
+                self.runner.cancel(self.package_job)
         else:
             self.write_text_to_output("Uninstallation canceled!")
-            self.process.kill()
+            self.runner.cancel(self.package_job)
 
-    def handle_stderr(self):
-        error = self.process.readAllStandardError().data().decode().strip()
-        self.write_text_to_output(error)
-
-    def handle_command_finished(self):
+    def handle_command_finished(self, python, exit_code, status, wall_time):
         self.progress_bar.deleteLater()
-        self.process.deleteLater()
-        self.statusBar().clearMessage()  # Clear status bar message if any
+        self.package_job = None
+        self.interpreters.reprobe(python)  # Its package list is out of date
+        self.statusBar().showMessage(f"Command {status} (exit code {exit_code}, {wall_time:.2f}s)", 5000)
         # self.show_installed_packages()  # Update GUI as needed after command completion
 
     def show_installed_packages(self):
         self.setup_package_management()
         self.package_table.clearContents()
         self.package_table.setRowCount(0)
+        packages = self.interpreters.packages(self.python())
+        if packages is not None:
+            self.fill_package_table(packages)  # Listed by the interpreter's last probe
+            return
         # Show loading spinner overlay
         self.loading_dialog = QProgressDialog("Loading installed packages...", None, 0, 0, self)
         self.loading_dialog.setWindowModality(Qt.ApplicationModal)
@@ -738,30 +1360,28 @@ class EZCode(QMainWindow):
         self.loading_dialog.setMinimumDuration(0)
         self.loading_dialog.setStyleSheet("QProgressDialog { background: #222; color: #fff; border-radius: 12px; font-size: 16px; }")
         self.loading_dialog.show()
-        # Start worker thread
-        self.pkg_worker = PackageListWorker()
-        self.pkg_worker.result.connect(self.on_packages_loaded)
-        self.pkg_worker.start()
+        # List packages through the job runner so the GUI stays responsive
+        self.pkg_list_job = self.runner.submit(self.python(), ['-m', 'pip', 'list', '--format=columns'], timeout=120)
+        self.pkg_list_job.finished.connect(lambda *_, job=self.pkg_list_job: self.on_packages_loaded(job.output_text()))
 
     def on_packages_loaded(self, installed_packages):
         self.loading_dialog.close()
+        lines = installed_packages.splitlines()[2:]
+        self.fill_package_table([line.split()[:2] for line in lines if len(line.split()) >= 2])
+
+    def fill_package_table(self, packages):
         self.package_table.clearContents()
         self.package_table.setRowCount(0)
-        lines = installed_packages.splitlines()[2:]
-        for line in lines:
-            package_info = line.split()
-            if len(package_info) >= 2:
-                package_name = package_info[0]
-                package_version = package_info[1]
-                row_position = self.package_table.rowCount()
-                self.package_table.insertRow(row_position)
-                self.package_table.setItem(row_position, 0, QTableWidgetItem(package_name))
-                self.package_table.setItem(row_position, 1, QTableWidgetItem(package_version))
+        for package_name, package_version in packages:
+            row_position = self.package_table.rowCount()
+            self.package_table.insertRow(row_position)
+            self.package_table.setItem(row_position, 0, QTableWidgetItem(package_name))
+            self.package_table.setItem(row_position, 1, QTableWidgetItem(package_version))
 
+    @timed('command')
     def execute_command(self, command):
-        process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        stdout, stderr = process.communicate()
-        return stdout
+        program, *arguments = shlex.split(command)
+        return self.runner.run_command_sync(program, arguments, timeout=get_setting('jobs/sync_timeout_ms') / 1000)
 
     def write_text_to_output(self, text):
         cursor = self.output.textCursor()
@@ -774,20 +1394,17 @@ class EZCode(QMainWindow):
         self.output.setTextCursor(cursor)
         self.output.ensureCursorVisible()
 
-    def open_file_from_explorer(self, index):
-        file_path = self.file_model.filePath(index)
-        if os.path.isfile(file_path):
-            with open(file_path, 'r') as file:
-                self.editor.setPlainText(file.read())
-                self.file_path = file_path
-            self.status_bar.showMessage(f"Opened: {file_path}") 
-
     def setup_command_palette(self):
         self.palette_actions = {
             "Open File": self.open_file,
+            "Open Folder": self.open_folder,
             "Save File": self.save_file,
             "Save As": self.save_as,
             "Run Code": self.run_code,
+            "Run Tests": self.run_tests,
+            "Profile Imports": self.profile_imports,
+            "Select Interpreter": self.select_interpreter,
+            "Refresh Interpreters": self.interpreters.refresh,
             "Toggle Debug Mode": self.toggle_debugging_mode,
             "Light Mode": self.set_light_mode,
             "Dark Mode": self.set_dark_mode,
@@ -797,30 +1414,74 @@ class EZCode(QMainWindow):
             "Clear Output Console": self.clear_output_console,
             "Reset Layout": self.reset_layout,
             "Toggle Output Console": self.toggle_output_console,
+            "Toggle Problems": self.toggle_problems_panel,
+            "Toggle Minimap": self.toggle_minimap,
             "Exit": self.close,
             "Settings...": self.show_settings_dialog,
+            "Go to Symbol in Workspace": self.show_symbol_search,
+            "Close Tab": self.close_current_tab,
+            "Search in Workspace": self.show_search_panel,
+            "Memory Diagnostics": self.show_memory_diagnostics,
+            "Toggle Performance HUD": self.toggle_perf_hud,
+            "Dump Performance Report": self.dump_perf_report,
+            "Fold": lambda: self.editor.fold_current(),
+            "Unfold": lambda: self.editor.unfold_current(),
+            "Fold All": lambda: self.editor.fold_all(),
+            "Unfold All": lambda: self.editor.unfold_all(),
+            "Diff Gutter: Against Saved File": lambda: self.set_diff_base('disk'),
+            "Diff Gutter: Against Git HEAD": lambda: self.set_diff_base('head'),
         }
         self.palette_shortcut = QShortcut(QKeySequence("Ctrl+Shift+P"), self)
         self.palette_shortcut.activated.connect(self.show_command_palette)
 
+    def show_memory_diagnostics(self):
+        MemoryDiagnosticsDialog(self, self.documents).exec_()
+
+    def set_diff_base(self, mode):
+        """Compares documents with the saved file ('disk') or the last commit ('head') in the gutter."""
+        LineDiff.base_mode = mode
+        set_setting('diff/base', mode)
+        for document in self.documents():
+            if document.loaded:
+                document.line_diff.reload_base()
+
+    def toggle_minimap(self):
+        visible = not self.editor.show_minimap
+        self.editor.set_minimap_visible(visible)
+        set_setting('editor/minimap', visible)
+
+    def toggle_perf_hud(self):
+        self.perf_hud.set_active(not self.perf_hud.isVisible())
+
+    def dump_perf_report(self):
+        try:
+            path = self.watchdog.dump()
+        except OSError as error:
+            show_error_message(f"Could not write the performance report: {error}", self)
+            return
+        self.logger.info(f"Performance report written to {path}")
+        self.status_bar.showMessage(f"Performance report written to {path}")
+
+    def on_stall(self, stall):
+        where = f" in {stall['where']}" if stall['where'] else ''
+        self.logger.warning(f"GUI thread stalled for {stall['duration']:.2f}s{where}; "
+                            f"'Dump Performance Report' saves its stack")
+
     def show_command_palette(self):
         dlg = CommandPalette(self, self.palette_actions)
         dlg.move(self.geometry().center() - dlg.rect().center())
         dlg.exec_() 
 
     def show_settings_dialog(self):
-        current_theme = "Light" if self.editor.palette().color(self.editor.backgroundRole()).lightness() > 128 else "Dark"
-        dlg = SettingsDialog(self, self.editor.font().pointSize(), current_theme)
+        dlg = SettingsDialog(self, self.editor.font().pointSize(), self.theme)
         if dlg.exec_() == QDialog.Accepted:
             theme, font_size = dlg.get_settings()
-            if theme == "Light":
-                self.set_light_mode()
-            else:
-                self.set_dark_mode()
-            self.editor.setFont(QFont("Courier", font_size)) 
+            self.apply_theme(theme)
+            self.editor.setFont(QFont("Courier", font_size))
+            self.schedule_session_save()
 
     def show_welcome_if_no_file(self):
-        if not self.file_path:
+        if not self.file_path and not self.editor.doc.is_modified() and not self.editor.toPlainText():
             welcome = (
                 "Welcome to EZap Editor!\n"
                 "\n"
@@ -833,7 +1494,8 @@ class EZCode(QMainWindow):
                 "- Switch themes and font size in Settings.\n"
                 "\nHappy coding! 🚀"
             )
-            self.editor.setPlainText(welcome) 
+            self.editor.doc.set_lint_enabled(False)
+            self.editor.setPlainText(welcome)
 
     def setup_file_explorer_shortcut(self):
         self.explorer_shortcut = QShortcut(QKeySequence("Ctrl+B"), self)
@@ -889,9 +1551,61 @@ class EZCode(QMainWindow):
     def setup_quick_file_switcher(self):
         self.quick_switch_shortcut = QShortcut(QKeySequence("Ctrl+P"), self)
         self.quick_switch_shortcut.activated.connect(self.show_quick_file_switcher)
+        self.symbol_search_shortcut = QShortcut(QKeySequence("Ctrl+T"), self)
+        self.symbol_search_shortcut.activated.connect(self.show_symbol_search)
+        self.close_tab_shortcut = QShortcut(QKeySequence("Ctrl+W"), self)
+        self.close_tab_shortcut.activated.connect(self.close_current_tab)
+        self.next_tab_shortcut = QShortcut(QKeySequence("Ctrl+Tab"), self)
+        self.next_tab_shortcut.activated.connect(lambda: self.cycle_tabs(1))
+        self.previous_tab_shortcut = QShortcut(QKeySequence("Ctrl+Shift+Tab"), self)
+        self.previous_tab_shortcut.activated.connect(lambda: self.cycle_tabs(-1))
+
+    def show_symbol_search(self, query='', symbols=None):
+        dlg = SymbolSearchDialog(self, self.symbol_index, self.workspace_root, query, symbols)
+        dlg.move(self.geometry().center() - dlg.rect().center())
+        if dlg.exec_() == QDialog.Accepted:
+            symbol = dlg.selected_symbol()
+            if symbol:
+                _name, _kind, path, line, col, _container = symbol
+                self.open_path(path, line, col + 1)
+
+    def buffer_definitions(self, name):
+        # The buffer may be newer than the index, so look for definitions in it directly
+        definition = re.compile(rf'^(\s*)(?:async\s+)?(def|class)\s+{re.escape(name)}\b')
+        assignment = re.compile(rf'^(\s*){re.escape(name)}\s*(?::[^=]*)?=(?!=)')
+        path = os.path.abspath(self.file_path) if self.file_path else ''
+        found = []
+        for number, line in enumerate(self.editor.block_tracker.lines):
+            match = definition.match(line)
+            if match:
+                kind = 'class' if match.group(2) == 'class' else 'function'
+                found.append((name, kind, path, number + 1, len(match.group(1)), None))
+                continue
+            match = assignment.match(line)
+            if match:
+                found.append((name, 'variable', path, number + 1, len(match.group(1)), None))
+        return found
+
+    def go_to_definition(self, name):
+        local = self.buffer_definitions(name)
+        current = os.path.abspath(self.file_path) if self.file_path else ''
+        indexed = [symbol for symbol in self.symbol_index.definitions(name) if symbol[2] != current]
+        # Definitions (def/class) beat assignments; the current buffer beats other files
+        local_definitions = [symbol for symbol in local if symbol[1] != 'variable']
+        candidates = local_definitions + [symbol for symbol in local if symbol[1] == 'variable'] + indexed
+        if not candidates:
+            self.status_bar.showMessage(f"No definition found for '{name}'", 3000)
+        elif len(candidates) == 1 or len(local_definitions) == 1:
+            _name, _kind, path, line, col, _container = candidates[0]
+            if path != current:
+                self.open_path(path, line, col + 1)
+            else:
+                self.go_to_line(line, col + 1)
+        else:
+            self.show_symbol_search(name, candidates)
 
     def show_quick_file_switcher(self):
-        dlg = QuickFileSwitcher(self, os.getcwd())
+        dlg = QuickFileSwitcher(self, self.workspace_root)
         if dlg.exec_() == QDialog.Accepted:
             file_path = dlg.selected_file()
             if file_path:
@@ -906,10 +1620,7 @@ class EZCode(QMainWindow):
         anim.setStartValue(1)
         anim.setEndValue(0)
         def after_fade_out():
-            with open(file_path, 'r') as file:
-                self.editor.setPlainText(file.read())
-                self.file_path = file_path
-            self.status_bar.showMessage(f"Opened: {file_path}")
+            self.load_file(file_path)
             anim2 = QPropertyAnimation(effect, b"opacity")
             anim2.setDuration(200)
             anim2.setStartValue(0)
@@ -0,0 +1,315 @@
+import os
+import bisect
+from collections import OrderedDict, deque
+from PyQt5.QtWidgets import QTreeView, QFileIconProvider
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QFileSystemWatcher, QTimer, pyqtSignal
+
+from utils.background import thread_tasks
+from utils.workspace import DEFAULT_EXCLUDES, list_directory
+
+PATH_ROLE = Qt.UserRole
+
+
+def sort_key(name, is_dir):
+    return (not is_dir, name.lower())
+
+
+class ExplorerNode:
+    __slots__ = ('name', 'path', 'is_dir', 'parent', 'row', 'children', 'loading', 'ignore')
+
+    def __init__(self, name, path, is_dir, parent=None, row=0):
+        self.name = name
+        self.path = path
+        self.is_dir = is_dir
+        self.parent = parent
+        self.row = row
+        self.children = None  # None until listed; directories are listed on expand
+        self.loading = False
+        self.ignore = None  # GitIgnore in effect inside this directory
+
+    def key(self):
+        return sort_key(self.name, self.is_dir)
+
+
+class ExplorerModel(QAbstractItemModel):
+    """Lazily listed workspace tree.
+
+    Directories are listed on a worker thread the first time they are expanded and their
+    rows are inserted in batches. Listed directories are watched and re-listed (diffed
+    against the current rows) when they change. At most ``max_loaded_dirs`` listings are
+    kept; listings of collapsed directories are dropped least recently used first.
+    """
+
+    def __init__(self, root, parent=None, patterns=None, excludes=DEFAULT_EXCLUDES,
+                 max_loaded_dirs=256, insert_batch=500):
+        super().__init__(parent)
+        self.patterns = patterns
+        self.excludes = excludes
+        self.max_loaded_dirs = max_loaded_dirs
+        self.insert_batch = insert_batch
+        self.loaded = OrderedDict()  # path -> listed directory node, least recently used first
+        self.expanded = set()  # paths of directories expanded in the view
+        self.generation = 0  # Bumped on re-root so listings for the old tree are dropped
+        self.insert_queue = deque()  # (node, entries) still to be inserted
+        self.insert_timer = QTimer(self)
+        self.insert_timer.setInterval(0)
+        self.insert_timer.timeout.connect(self.insert_next_batch)
+        self.dirty = set()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(200)
+        self.refresh_timer.timeout.connect(self.refresh_dirty)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        icons = QFileIconProvider()
+        self.folder_icon = icons.icon(QFileIconProvider.Folder)
+        self.file_icon = icons.icon(QFileIconProvider.File)
+        self.root = None
+        self.set_root(root)
+
+    # Qt model interface
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+        if node.children is None or not 0 <= row < len(node.children) or column != 0:
+            return QModelIndex()
+        return self.createIndex(row, 0, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        node = self.node(parent)
+        return len(node.children) if node.children is not None else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        # Unlisted directories always get an expand arrow; listing them just to find out is the cost we avoid
+        return node.is_dir and (node.children is None or bool(node.children))
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return node.is_dir and node.children is None and not node.loading
+
+    def fetchMore(self, parent):
+        self.load(self.node(parent))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.name
+        if role == Qt.DecorationRole:
+            return self.folder_icon if node.is_dir else self.file_icon
+        if role in (Qt.ToolTipRole, PATH_ROLE):
+            return node.path
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable if index.isValid() else Qt.NoItemFlags
+
+    def node_index(self, node):
+        return QModelIndex() if node is self.root else self.createIndex(node.row, 0, node)
+
+    def filePath(self, index):
+        return self.node(index).path
+
+    # Loading
+
+    def set_root(self, root):
+        self.beginResetModel()
+        self.generation += 1
+        self.insert_queue.clear()
+        self.insert_timer.stop()
+        self.dirty.clear()
+        self.loaded.clear()
+        self.expanded.clear()
+        watched = self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+        root = os.path.abspath(root)
+        self.root = ExplorerNode(os.path.basename(root) or root, root, True)
+        self.endResetModel()
+        self.load(self.root)
+
+    def load(self, node):
+        if node.loading or node.children is not None:
+            return
+        node.loading = True
+        generation = self.generation
+        parent_ignore = node.parent.ignore if node.parent is not None else None
+        thread_tasks().submit(list_directory, node.path, parent_ignore, self.excludes, self.patterns,
+                              callback=lambda result: self.on_listed(generation, node, result),
+                              error_callback=lambda error: self.on_listed(generation, node, (None, [])))
+
+    def on_listed(self, generation, node, result):
+        if generation != self.generation or not node.loading:
+            return  # Re-rooted or evicted while listing
+        node.loading = False
+        node.ignore, entries = result
+        node.children = []
+        self.loaded[node.path] = node
+        self.watcher.addPath(node.path)
+        if not entries:
+            # Drop the expand arrow of an empty directory
+            index = self.node_index(node)
+            self.dataChanged.emit(index, index)
+            return
+        self.insert_queue.append((node, entries))
+        self.insert_next_batch()
+        if self.insert_queue:
+            self.insert_timer.start()
+        self.evict()
+
+    def insert_next_batch(self):
+        if not self.insert_queue:
+            self.insert_timer.stop()
+            return
+        node, entries = self.insert_queue[0]
+        if node.children is None:
+            self.insert_queue.popleft()  # Evicted before its rows were all in
+            return
+        start = len(node.children)
+        batch = entries[start:start + self.insert_batch]
+        self.beginInsertRows(self.node_index(node), start, start + len(batch) - 1)
+        for offset, (name, is_dir) in enumerate(batch):
+            node.children.append(ExplorerNode(name, os.path.join(node.path, name), is_dir, node, start + offset))
+        self.endInsertRows()
+        if len(node.children) >= len(entries):
+            self.insert_queue.popleft()
+
+    # Watching
+
+    def on_directory_changed(self, path):
+        self.dirty.add(path)
+        self.refresh_timer.start()  # Coalesce bursts (checkouts, builds) into one re-list
+
+    def is_queued(self, node):
+        return any(queued is node for queued, _ in self.insert_queue)
+
+    def refresh_dirty(self):
+        generation = self.generation
+        dirty, self.dirty = self.dirty, set()
+        for path in dirty:
+            node = self.loaded.get(path)
+            if node is None:
+                continue
+            if self.is_queued(node):
+                self.on_directory_changed(path)  # Still inserting the first listing; look again later
+                continue
+            parent_ignore = node.parent.ignore if node.parent is not None else None
+            thread_tasks().submit(list_directory, path, parent_ignore, self.excludes, self.patterns,
+                                  callback=lambda result, node=node: self.on_relisted(generation, node, result),
+                                  error_callback=lambda error, node=node: self.on_relisted(generation, node, (None, [])))
+
+    def on_relisted(self, generation, node, result):
+        if generation != self.generation or node.children is None:
+            return
+        if self.is_queued(node):
+            self.on_directory_changed(node.path)
+            return
+        node.ignore, entries = result
+        wanted = {name: is_dir for name, is_dir in entries}
+        parent_index = self.node_index(node)
+        for row in range(len(node.children) - 1, -1, -1):
+            child = node.children[row]
+            if wanted.get(child.name) != child.is_dir:
+                self.beginRemoveRows(parent_index, row, row)
+                self.unload(child)
+                del node.children[row]
+                self.renumber(node, row)
+                self.endRemoveRows()
+        existing = {child.name for child in node.children}
+        keys = [child.key() for child in node.children]
+        for name, is_dir in entries:
+            if name in existing:
+                continue
+            row = bisect.bisect_left(keys, sort_key(name, is_dir))
+            self.beginInsertRows(parent_index, row, row)
+            node.children.insert(row, ExplorerNode(name, os.path.join(node.path, name), is_dir, node, row))
+            keys.insert(row, sort_key(name, is_dir))
+            self.renumber(node, row)
+            self.endInsertRows()
+
+    @staticmethod
+    def renumber(node, start=0):
+        for row in range(start, len(node.children)):
+            node.children[row].row = row
+
+    # Eviction
+
+    def set_expanded(self, index, expanded):
+        node = self.node(index)
+        if expanded:
+            self.expanded.add(node.path)
+            if node.path in self.loaded:
+                self.loaded.move_to_end(node.path)
+        else:
+            self.expanded.discard(node.path)
+            self.evict()
+
+    def evict(self):
+        """Drops the listings of collapsed directories until at most max_loaded_dirs remain."""
+        if len(self.loaded) <= self.max_loaded_dirs:
+            return
+        for path in list(self.loaded):
+            if len(self.loaded) <= self.max_loaded_dirs:
+                break
+            node = self.loaded.get(path)
+            if node is None or node is self.root or path in self.expanded:
+                continue
+            if node.children:
+                self.beginRemoveRows(self.node_index(node), 0, len(node.children) - 1)
+                self.unload(node)
+                self.endRemoveRows()
+            else:
+                self.unload(node)
+
+    def unload(self, node):
+        """Forgets the listings of ``node`` and everything below it; ``node`` becomes unlisted."""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            current.loading = False
+            if current.children is not None:
+                stack.extend(current.children)
+                current.children = None
+                if self.loaded.pop(current.path, None) is not None:
+                    self.watcher.removePath(current.path)
+            if current is not node:
+                self.expanded.discard(current.path)
+
+
+class FileExplorer(QTreeView):
+    """Workspace tree backed by ExplorerModel; emits the path of clicked files."""
+    file_activated = pyqtSignal(str)
+
+    def __init__(self, root, parent=None, **model_options):
+        super().__init__(parent)
+        self.explorer_model = ExplorerModel(root, self, **model_options)
+        self.setModel(self.explorer_model)
+        self.setHeaderHidden(True)
+        self.setUniformRowHeights(True)
+        self.expanded.connect(lambda index: self.explorer_model.set_expanded(index, True))
+        self.collapsed.connect(lambda index: self.explorer_model.set_expanded(index, False))
+        self.clicked.connect(self.on_clicked)
+
+    def set_root(self, root):
+        self.explorer_model.set_root(root)
+
+    def on_clicked(self, index):
+        path = self.explorer_model.filePath(index)
+        if os.path.isfile(path):
+            self.file_activated.emit(path)
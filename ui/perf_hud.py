@@ -0,0 +1,71 @@
+from PyQt5.QtWidgets import QLabel
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QTimer
+
+from utils.perf import counters
+
+FRAME_COUNTER = 'editor paint'
+
+
+class PerfHud(QLabel):
+    """Overlay in the editor's top-right corner with live timings, refreshed every ``interval`` ms.
+
+    Shows the editor's frame (paint) time, the worst event-loop latency and the stall count
+    since the last refresh, and for each timed subsystem the calls and time spent in that
+    window. Only runs while shown.
+    """
+
+    def __init__(self, parent, watchdog, interval=500):
+        super().__init__(parent)
+        self.watchdog = watchdog
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setFont(QFont("Courier", 9))
+        self.setStyleSheet("QLabel { background: rgba(20, 20, 30, 0.8); color: #7fffd4; padding: 6px; border-radius: 6px; }")
+        self.previous = {}
+        self.new_stalls = 0  # Stalls that ended since the last refresh
+        watchdog.stalled.connect(self.on_stalled)
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def set_active(self, active):
+        if active:
+            self.previous = counters()
+            self.new_stalls = 0
+            self.watchdog.take_max_latency()
+            self.refresh()
+            self.show()
+            self.raise_()
+            self.timer.start()
+        else:
+            self.timer.stop()
+            self.hide()
+
+    def on_stalled(self, _stall):
+        self.new_stalls += 1
+
+    def refresh(self):
+        current = counters()
+        window = {}
+        for name, (count, total, _max) in current.items():
+            previous_count, previous_total, _previous_max = self.previous.get(name, (0, 0.0, 0.0))
+            if count > previous_count:
+                window[name] = (count - previous_count, total - previous_total)
+        self.previous = current
+        frames, frame_time = window.get(FRAME_COUNTER, (0, 0.0))
+        lines = [
+            f"frame     {frame_time / frames * 1000:7.1f} ms" if frames else "frame           -",
+            f"loop lag  {self.watchdog.take_max_latency() * 1000:7.1f} ms",
+            f"stalls    {self.new_stalls:7d}",
+        ]
+        self.new_stalls = 0
+        for name, (count, total) in sorted(window.items()):
+            lines.append(f"{name:<14}{count:6d}× {total * 1000:8.1f} ms")
+        self.setText('\n'.join(lines))
+        self.adjustSize()
+        self.reposition()
+
+    def reposition(self):
+        parent = self.parentWidget()
+        self.move(parent.width() - self.width() - 24, 8)
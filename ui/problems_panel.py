@@ -0,0 +1,79 @@
+from PyQt5.QtWidgets import QTreeWidget, QTreeWidgetItem
+from PyQt5.QtCore import Qt, pyqtSignal
+
+from utils.diagnostics import ERROR, WARNING
+
+SEVERITY_LABELS = {ERROR: '✖', WARNING: '⚠'}
+LOCATION_ROLE = Qt.UserRole
+# How a chained traceback relates to the one listed before it
+CHAIN_LABELS = {'cause': 'caused by the previous exception', 'context': 'raised while handling the previous exception'}
+
+
+class ProblemsPanel(QTreeWidget):
+    """Clickable list of problems, grouped by the source that reported them."""
+    problem_activated = pyqtSignal(object, int, object, str)  # path (None = buffer), line, column, source
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setHeaderHidden(True)
+        self.setColumnCount(1)
+        self.setStyleSheet("QTreeWidget { background: #23263a; color: #fff; font-size: 14px; border-radius: 8px; }")
+        self.source_items = {}
+        self.buffer_name = 'untitled'
+        self.itemActivated.connect(self.on_item_activated)
+
+    def set_buffer_name(self, name):
+        self.buffer_name = name
+
+    def source_item(self, source, title):
+        item = self.source_items.get(source)
+        if item is None:
+            item = QTreeWidgetItem(self, [title])
+            item.setExpanded(True)
+            self.source_items[source] = item
+        return item
+
+    def location_text(self, path, line):
+        return f"{path or self.buffer_name}:{line}"
+
+    def make_item(self, parent, diagnostic, text=None):
+        label = SEVERITY_LABELS.get(diagnostic.severity, 'ℹ')
+        text = text or f"{label} {diagnostic.message}  ({self.location_text(diagnostic.path, diagnostic.line)})"
+        item = QTreeWidgetItem(parent, [text])
+        item.setData(0, LOCATION_ROLE, (diagnostic.path, diagnostic.line, diagnostic.column, diagnostic.source))
+        item.setToolTip(0, diagnostic.message)
+        return item
+
+    def clear_source(self, source):
+        item = self.source_items.pop(source, None)
+        if item is not None:
+            self.invisibleRootItem().removeChild(item)
+
+    def set_diagnostics(self, source, title, diagnostics):
+        self.clear_source(source)
+        if not diagnostics:
+            return
+        parent = self.source_item(source, title)
+        for diagnostic in diagnostics:
+            self.make_item(parent, diagnostic)
+
+    def add_traceback(self, source, title, traceback, diagnostics):
+        """Adds one exception entry whose children are the frames, innermost first."""
+        parent = self.source_item(source, title)
+        link = CHAIN_LABELS.get(traceback.chained)
+        summary = traceback.summary() if link is None else f"{traceback.summary()}  [{link}]"
+        # The exception itself jumps to the innermost frame in the buffer, or the innermost one overall
+        target = next((d for d in diagnostics if d.path is None), diagnostics[0])
+        exception_item = self.make_item(parent, target, f"{SEVERITY_LABELS[ERROR]} {summary}")
+        for diagnostic, frame in zip(diagnostics, reversed(traceback.frames)):
+            function = f" in {frame.function}" if frame.function else ''
+            source_text = f" — {frame.source}" if frame.source else ''
+            self.make_item(exception_item, diagnostic,
+                           f"{self.location_text(diagnostic.path, diagnostic.line)}{function}{source_text}")
+        exception_item.setExpanded(True)
+
+    def on_item_activated(self, item, _column=0):
+        location = item.data(0, LOCATION_ROLE)
+        if location:
+            path, line, column, source = location
+            self.problem_activated.emit(path, line, column, source)
@@ -0,0 +1,223 @@
+import os
+import re
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QCheckBox, QPushButton, QLabel, QTreeView, QMessageBox
+)
+from PyQt5.QtGui import QStandardItemModel, QStandardItem
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+
+from utils.background import thread_tasks, process_tasks
+from utils.search import SearchSpec, compile_spec, search_files, replace_in_files, workspace_files
+
+LOCATION_ROLE = Qt.UserRole
+# Files per worker task; small enough to stream early results, large enough to amortise pickling
+SEARCH_BATCH = 64
+
+
+class SearchPanel(QWidget):
+    """Find and replace across the workspace.
+
+    Files are listed on a worker thread and scanned in batches on the process pool;
+    each batch's matches are added to the tree as soon as it completes. Changing the
+    query bumps a generation counter, cancels batches that haven't started and drops
+    results that still arrive for the old query.
+    """
+    match_activated = pyqtSignal(object, int, object)  # path, line, column
+    files_replaced = pyqtSignal(object)  # {path: replacement count}
+
+    def __init__(self, root, parent=None, max_matches=5000, delay=300):
+        super().__init__(parent)
+        self.root = os.path.abspath(root)
+        self.max_matches = max_matches
+        self.generation = 0
+        self.futures = []
+        self.pending_batches = 0
+        self.match_count = 0
+        self.truncated = False
+        self.spec = None
+
+        self.query_edit = QLineEdit(self)
+        self.query_edit.setPlaceholderText("Search in workspace")
+        self.replace_edit = QLineEdit(self)
+        self.replace_edit.setPlaceholderText("Replace with")
+        self.regex_box = QCheckBox("Regex", self)
+        self.case_box = QCheckBox("Match Case", self)
+        self.word_box = QCheckBox("Whole Word", self)
+        self.replace_button = QPushButton("Replace All", self)
+        self.replace_button.setEnabled(False)
+        self.status_label = QLabel(self)
+        self.model = QStandardItemModel(self)
+        self.tree = QTreeView(self)
+        self.tree.setModel(self.model)
+        self.tree.setHeaderHidden(True)
+        self.tree.setUniformRowHeights(True)
+        self.tree.setEditTriggers(QTreeView.NoEditTriggers)
+
+        options = QHBoxLayout()
+        for widget in (self.regex_box, self.case_box, self.word_box):
+            options.addWidget(widget)
+        options.addStretch()
+        replace_row = QHBoxLayout()
+        replace_row.addWidget(self.replace_edit)
+        replace_row.addWidget(self.replace_button)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.addWidget(self.query_edit)
+        layout.addLayout(replace_row)
+        layout.addLayout(options)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.tree)
+
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(delay)
+        self.debounce.timeout.connect(self.start_search)
+        self.query_edit.textChanged.connect(self.debounce.start)
+        self.query_edit.returnPressed.connect(self.start_search)
+        for box in (self.regex_box, self.case_box, self.word_box):
+            box.toggled.connect(self.start_search)
+        self.replace_button.clicked.connect(self.replace_all)
+        self.tree.activated.connect(self.on_item_activated)
+        self.tree.clicked.connect(self.on_item_activated)
+
+    def set_root(self, root):
+        self.root = os.path.abspath(root)
+        self.start_search()
+
+    def focus_query(self, text=''):
+        if text:
+            self.query_edit.setText(text)
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+
+    def current_spec(self):
+        return SearchSpec(self.query_edit.text(), self.regex_box.isChecked(),
+                          self.case_box.isChecked(), self.word_box.isChecked())
+
+    def cancel(self):
+        self.generation += 1
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+        self.pending_batches = 0
+
+    def start_search(self):
+        self.debounce.stop()
+        self.cancel()
+        self.model.clear()
+        self.match_count = 0
+        self.truncated = False
+        self.replace_button.setEnabled(False)
+        self.status_label.setToolTip('')
+        spec = self.current_spec()
+        self.spec = None
+        if not spec.pattern:
+            self.status_label.setText('')
+            return
+        if spec.regex:
+            try:
+                compile_spec(spec)
+            except re.error as error:
+                self.status_label.setText(f"Invalid pattern: {error}")
+                return
+        self.spec = spec
+        self.status_label.setText("Searching…")
+        generation = self.generation
+        self.futures.append(thread_tasks().submit(
+            workspace_files, self.root,
+            callback=lambda paths: self.on_files_listed(generation, spec, paths),
+            error_callback=lambda error: self.on_search_failed(generation, error)))
+
+    def on_files_listed(self, generation, spec, paths):
+        if generation != self.generation:
+            return
+        batches = [paths[i:i + SEARCH_BATCH] for i in range(0, len(paths), SEARCH_BATCH)]
+        self.pending_batches = len(batches)
+        if not batches:
+            self.finish_search()
+        for batch in batches:
+            self.futures.append(process_tasks().submit(
+                search_files, batch, spec,
+                callback=lambda results: self.on_batch_done(generation, results),
+                error_callback=lambda error: self.on_search_failed(generation, error)))
+
+    def on_batch_done(self, generation, results):
+        if generation != self.generation:
+            return  # A stale batch that had already started when the query changed
+        self.pending_batches -= 1
+        for path, matches in results:
+            self.add_file_results(path, matches)
+        if self.match_count >= self.max_matches and self.pending_batches:
+            self.truncated = True
+            self.cancel()
+        if not self.pending_batches:
+            self.finish_search()
+        else:
+            self.status_label.setText(f"Searching… {self.match_count} matches")
+
+    def on_search_failed(self, generation, error):
+        if generation != self.generation:
+            return
+        self.cancel()
+        self.status_label.setText(f"Search failed: {error}")
+
+    def add_file_results(self, path, matches):
+        relative = os.path.relpath(path, self.root)
+        file_item = QStandardItem(f"{relative}  ({len(matches)})")
+        file_item.setData((path, matches[0].line, matches[0].column), LOCATION_ROLE)
+        file_item.setToolTip(path)
+        for match in matches:
+            child = QStandardItem(f"{match.line}: {match.text.strip()}")
+            child.setData((path, match.line, match.column), LOCATION_ROLE)
+            file_item.appendRow(child)
+        self.model.appendRow(file_item)
+        self.match_count += len(matches)
+
+    def finish_search(self):
+        files = self.model.rowCount()
+        text = f"{self.match_count} matches in {files} files"
+        if self.truncated:
+            text += f" (stopped after {self.max_matches})"
+        self.status_label.setText(text)
+        self.replace_button.setEnabled(files > 0)
+        if files <= 20:
+            self.tree.expandAll()
+
+    def result_paths(self):
+        return [self.model.item(row).data(LOCATION_ROLE)[0] for row in range(self.model.rowCount())]
+
+    def replace_all(self):
+        if self.spec is None:
+            return
+        paths = self.result_paths()
+        replacement = self.replace_edit.text()
+        message = f"Replace {self.match_count} matches of '{self.spec.pattern}' with '{replacement}' in {len(paths)} files?"
+        if self.truncated:
+            message += "\n\nThe search stopped early; only the listed files will be changed."
+        if QMessageBox.question(self, "Replace All", message, QMessageBox.Yes | QMessageBox.No) != QMessageBox.Yes:
+            return
+        self.cancel()
+        self.replace_button.setEnabled(False)
+        self.status_label.setText("Replacing…")
+        thread_tasks().submit(replace_in_files, paths, self.spec, replacement,
+                              callback=self.on_replaced, error_callback=self.on_replace_failed)
+
+    def on_replaced(self, result):
+        counts, skipped = result
+        text = f"Replaced {sum(counts.values())} matches in {len(counts)} files"
+        if skipped:
+            text += f"; skipped {len(skipped)} unreadable or non-UTF-8 files"
+        self.status_label.setText(text)
+        self.status_label.setToolTip('\n'.join(skipped))
+        self.model.clear()
+        self.files_replaced.emit(counts)
+
+    def on_replace_failed(self, error):
+        self.status_label.setText(f"Replace failed: {error}")
+        self.replace_button.setEnabled(True)
+
+    def on_item_activated(self, index):
+        location = index.data(LOCATION_ROLE)
+        if location:
+            path, line, column = location
+            self.match_activated.emit(path, line, column)
@@ -0,0 +1,201 @@
+from string import Template
+from PyQt5.QtGui import QColor, QPalette, QTextCharFormat
+import qtawesome as qta
+
+# Light and Dark: plain window colors, with the editor and output following the theme
+BASIC_STYLESHEET = """
+QWidget { background-color: $Window; color: $WindowText; }
+QPlainTextEdit { background-color: $Base; color: $Text; }
+QSplitter::handle { background-color: $splitter; }
+QToolBar#main_toolbar {
+    spacing: 12px;
+    border-radius: 12px;
+    padding: 8px;
+    background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 $toolbar_from, stop:1 $toolbar_to);
+}
+"""
+
+MODERN_STYLESHEET = """
+QMainWindow {
+    background: qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 $Window, stop:1 $Base);
+}
+QMenuBar {
+    background: rgba(24,28,42,0.95);
+    color: $Highlight;
+    font-size: 15px;
+    border-radius: 8px;
+}
+QMenuBar::item {
+    background: transparent;
+    color: $Highlight;
+    padding: 6px 18px;
+    border-radius: 8px;
+}
+QMenuBar::item:selected {
+    background: $Base;
+    color: $Text;
+}
+QMenu {
+    background: rgba(24,28,42,0.98);
+    color: $Highlight;
+    font-size: 15px;
+    border-radius: 8px;
+}
+QMenu::item {
+    padding: 6px 18px;
+    border-radius: 8px;
+}
+QMenu::item:selected {
+    background: $Base;
+    color: $Text;
+}
+QToolBar {
+    background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 $toolbar_from, stop:1 $toolbar_to);
+    border-radius: 16px;
+    spacing: 12px;
+    border: 2px solid $Highlight;
+}
+QToolButton {
+    background: rgba(24,28,42,0.8);
+    border-radius: 12px;
+    padding: 8px;
+    color: $Highlight;
+    border: 1.5px solid $Highlight;
+}
+QToolButton:hover {
+    background: $Highlight;
+    color: $Text;
+}
+QStatusBar {
+    background: $Window;
+    color: $Highlight;
+    font-size: 14px;
+    border-radius: 8px;
+}
+QDockWidget {
+    background: rgba(24,28,42,0.95);
+    border-radius: 16px;
+    border: 2px solid $Highlight;
+}
+QPlainTextEdit {
+    background: $Base;
+    color: $Text;
+    font-family: 'Fira Mono', 'Consolas', 'Courier New', monospace;
+    font-size: 16px;
+    border-radius: 12px;
+    padding: 8px;
+    border: 1.5px solid $Highlight;
+}
+QSplitter::handle {
+    background: $splitter;
+}
+QPushButton {
+    background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 $Highlight, stop:1 $Base);
+    color: $Text;
+    border-radius: 12px;
+    padding: 8px 18px;
+    font-size: 15px;
+    border: 2px solid $Highlight;
+}
+QPushButton:hover {
+    background: $Highlight;
+    color: $Base;
+}
+QTableWidget {
+    background: $Base;
+    border-radius: 12px;
+    font-size: 15px;
+    color: $Text;
+    border: 1.5px solid $Highlight;
+}
+QHeaderView::section {
+    background: $Highlight;
+    color: $Base;
+    border-radius: 8px;
+    font-size: 15px;
+}
+QMessageBox {
+    background: $Base;
+    color: $Highlight;
+    border-radius: 16px;
+}
+"""
+
+# Each theme is plain data: QPalette roles, extra stylesheet colors, the highlighter's
+# formats, toolbar icon colors (normal, active) and gutter colors (background, numbers)
+THEMES = {
+    'Light': {
+        'palette': {'Window': '#ffffff', 'WindowText': '#000000', 'Base': '#ffffff', 'AlternateBase': '#f4f7fa',
+                    'Text': '#000000', 'Button': '#f0f0f0', 'ButtonText': '#000000', 'Highlight': '#00c896',
+                    'HighlightedText': '#ffffff', 'ToolTipBase': '#ffffdc', 'ToolTipText': '#000000'},
+        'colors': {'splitter': '#cccccc', 'toolbar_from': '#f8fafc', 'toolbar_to': '#e0e7ef'},
+        'stylesheet': BASIC_STYLESHEET,
+        'syntax': {'keyword': {'foreground': 'blue'}, 'error': {'background': 'red'}},
+        'icons': ('#222', '#00c896'),
+        'gutter': ('#c0c0c0', '#000000'),
+    },
+    'Dark': {
+        'palette': {'Window': '#2b2b2b', 'WindowText': '#f8f8f2', 'Base': '#2b2b2b', 'AlternateBase': '#323232',
+                    'Text': '#f8f8f2', 'Button': '#3c3f41', 'ButtonText': '#f8f8f2', 'Highlight': '#80c0ff',
+                    'HighlightedText': '#000000', 'ToolTipBase': '#3c3f41', 'ToolTipText': '#f8f8f2'},
+        'colors': {'splitter': '#3f3f3f', 'toolbar_from': '#f8fafc', 'toolbar_to': '#e0e7ef'},
+        'stylesheet': BASIC_STYLESHEET,
+        'syntax': {'keyword': {'foreground': '#66d9ef'}, 'error': {'background': '#8b1a1a'}},
+        'icons': ('#f8f8f2', '#80c0ff'),
+        'gutter': ('#313335', '#a9b7c6'),
+    },
+    'Modern': {
+        'palette': {'Window': '#181c2a', 'WindowText': '#ffffff', 'Base': '#23263a', 'AlternateBase': '#1e2132',
+                    'Text': '#ffffff', 'Button': '#23263a', 'ButtonText': '#ffffff', 'Highlight': '#00c896',
+                    'HighlightedText': '#23263a', 'ToolTipBase': '#23263a', 'ToolTipText': '#ffffff'},
+        'colors': {'splitter': '#00c896', 'toolbar_from': '#23263a', 'toolbar_to': '#00c896'},
+        'stylesheet': MODERN_STYLESHEET,
+        'syntax': {'keyword': {'foreground': '#00c896', 'bold': True}, 'error': {'background': '#a8323e'}},
+        'icons': ('#00c896', '#ffffff'),
+        'gutter': ('#181c2a', '#00c896'),
+    },
+}
+
+
+def char_format(spec):
+    text_format = QTextCharFormat()
+    if 'foreground' in spec:
+        text_format.setForeground(QColor(spec['foreground']))
+    if 'background' in spec:
+        text_format.setBackground(QColor(spec['background']))
+    if spec.get('bold'):
+        text_format.setFontWeight(75)
+    return text_format
+
+
+class Theme:
+    """A theme from ``THEMES`` compiled once: QPalette, highlighter formats, stylesheet, icons and gutter colors."""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.palette = QPalette()
+        for role, color in data['palette'].items():
+            self.palette.setColor(getattr(QPalette, role), QColor(color))
+        self.formats = {kind: char_format(spec) for kind, spec in data['syntax'].items()}
+        self.stylesheet = Template(data['stylesheet']).substitute(data['palette'], **data['colors'])
+        self.icon_color, self.icon_active_color = data['icons']
+        self.gutter = tuple(QColor(color) for color in data['gutter'])
+        self.icons = {}
+
+    def icon(self, name, color=None, color_active=None):
+        """qtawesome icon ``name`` in this theme's toolbar colors (unless given), rendered once per theme."""
+        key = (name, color, color_active)
+        if key not in self.icons:
+            self.icons[key] = qta.icon(name, color=color or self.icon_color,
+                                       color_active=color_active or self.icon_active_color)
+        return self.icons[key]
+
+
+_compiled = {}
+
+
+def compiled_theme(name):
+    theme = _compiled.get(name)
+    if theme is None:
+        theme = _compiled[name] = Theme(name, THEMES[name])
+    return theme
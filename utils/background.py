@@ -0,0 +1,89 @@
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, BrokenExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTasks(QObject):
+    """Runs functions on a thread or process pool and calls back on the GUI thread.
+
+    Callbacks receive the function's result; ``error_callback`` receives the exception.
+    Process pools need picklable, module-level functions and use the 'spawn' start
+    method so workers never inherit Qt state from the GUI process.
+    """
+    done = pyqtSignal(object, object, object)  # callback, result, error_callback/error pair
+
+    def __init__(self, parent=None, processes=False, max_workers=None):
+        super().__init__(parent)
+        self.max_workers = max_workers
+        if processes:
+            self.executor = ProcessPoolExecutor(max_workers=max_workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.done.connect(self.dispatch)
+
+    def submit(self, fn, *args, callback=None, error_callback=None):
+        try:
+            future = self.executor.submit(fn, *args)
+        except (BrokenExecutor, RuntimeError) as error:
+            # Worker processes can't be started (frozen build, sandbox, killed pool): degrade to threads
+            logger.warning(f"Process pool unavailable ({error!r}); falling back to threads")
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self.on_future_done(f, callback, error_callback))
+        return future
+
+    def on_future_done(self, future, callback, error_callback):
+        # Runs on a pool thread; the signal hops back to the thread that owns this object
+        if future.cancelled():
+            return
+        error = future.exception()
+        try:
+            if error is not None:
+                self.done.emit(None, None, (error_callback, error))
+            else:
+                self.done.emit(callback, future.result(), None)
+        except RuntimeError:
+            pass  # The application is shutting down and this object is already gone
+
+    def dispatch(self, callback, result, failure):
+        if failure is not None:
+            error_callback, error = failure
+            if error_callback is not None:
+                error_callback(error)
+            else:
+                logger.error(f"Background task failed: {error!r}")
+        elif callback is not None:
+            callback(result)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_thread_tasks = None
+_process_tasks = None
+
+
+def thread_tasks():
+    """Shared pool for I/O-bound work (subprocesses, file reads)."""
+    global _thread_tasks
+    if _thread_tasks is None:
+        _thread_tasks = BackgroundTasks(max_workers=4)
+    return _thread_tasks
+
+
+def process_tasks():
+    """Shared pool for CPU-bound work that must not hold the GUI thread's GIL."""
+    global _process_tasks
+    if _process_tasks is None:
+        _process_tasks = BackgroundTasks(processes=True, max_workers=max(2, min(4, multiprocessing.cpu_count() - 1)))
+    return _process_tasks
+
+
+def shutdown_background_tasks():
+    for tasks in (_thread_tasks, _process_tasks):
+        if tasks is not None:
+            tasks.shutdown()
@@ -0,0 +1,7 @@
+from collections import namedtuple
+
+ERROR, WARNING, INFO = 'error', 'warning', 'info'
+
+# A problem at a 1-based ``line`` (and optional 1-based ``column``) of ``path``.
+# ``path`` is None when the diagnostic refers to the buffer in the editor.
+Diagnostic = namedtuple('Diagnostic', ['path', 'line', 'column', 'message', 'severity', 'source'])
@@ -0,0 +1,44 @@
+import ast
+
+TAB_WIDTH = 4
+BLANK = -1  # Indent of a blank line, which never starts or ends a fold
+BODY_FIELDS = ('body', 'orelse', 'finalbody', 'handlers', 'cases')
+
+
+def line_indent(line):
+    """Columns of leading whitespace in ``line`` (tabs count TAB_WIDTH), or BLANK for a blank line."""
+    indent = 0
+    for char in line:
+        if char == ' ':
+            indent += 1
+        elif char == '\t':
+            indent += TAB_WIDTH - indent % TAB_WIDTH
+        else:
+            return indent
+    return BLANK
+
+
+def ast_fold_ranges(text):
+    """{first line: last line} (0-based) of the multi-line statements and expressions in ``text``.
+
+    A compound statement folds to the end of its first body, so ``if`` stops before its
+    ``else``; brackets and strings fold to their closing line, where indentation says
+    nothing. Returns None if the text does not parse. Runs in a worker process, so it
+    must stay free of Qt imports.
+    """
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+    ranges = {}
+    for node in ast.walk(tree):
+        first = getattr(node, 'lineno', None)
+        last = getattr(node, 'end_lineno', None)
+        if first is None or last is None or last <= first:
+            continue
+        body = next((getattr(node, field) for field in BODY_FIELDS if getattr(node, field, None)), None)
+        if body is not None and isinstance(node, ast.stmt):
+            last = max(body[-1].end_lineno, first + 1) if body[0].lineno > first else last
+        if last > first and last - 1 > ranges.get(first - 1, -1):
+            ranges[first - 1] = last - 1
+    return ranges
@@ -1,6 +1,9 @@
+import os
 import re
 from PyQt5.QtWidgets import QMessageBox
 
+from utils.traceback_parser import TracebackParser
+
 def validate_input(text, parent=None):
     if not text.strip():
         show_error_message("Input cannot be empty", parent)
@@ -21,7 +24,22 @@ def show_error_message(message, parent=None):
     msg.exec_()
 
 def extract_error_line(error_message):
+    # Prefer the innermost frame of the last traceback over the first "File ... line N"
+    tracebacks = TracebackParser().feed(error_message + '\n')
+    if tracebacks:
+        return tracebacks[-1].innermost().line
     match = re.search(r'File.*line (\d+)', error_message)
     if match:
         return int(match.group(1))
-    return None 
\ No newline at end of file
+    return None
+
+
+def parse_file_argument(argument):
+    # Accepts "path", "path:line" and "path:line:column" (as printed by tracebacks and linters)
+    if os.path.exists(argument):
+        return os.path.abspath(argument), None, None
+    match = re.match(r'^(.+?)(?::(\d+))?(?::(\d+))?$', argument)
+    if match is None:
+        return os.path.abspath(argument), None, None  # e.g. an empty argument
+    path, line, column = match.groups()
+    return os.path.abspath(path), int(line) if line else None, int(column) if column else None
@@ -0,0 +1,226 @@
+import ast
+import glob
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+from utils.paths import data_dir
+
+VENV, CONDA, PYENV, SYSTEM = 'venv', 'conda', 'pyenv', 'system'
+PROBE_TIMEOUT = 20  # Seconds; an interpreter that takes longer is treated as broken
+CONDA_HOMES = ('miniconda3', 'anaconda3', 'miniforge3', 'mambaforge')
+
+# Runs inside the probed interpreter, which may be any Python 3
+PROBE_SCRIPT = r'''
+import json, site, sys, sysconfig
+packages = []
+try:
+    from importlib import metadata
+    packages = sorted({(d.metadata['Name'], d.version) for d in metadata.distributions() if d.metadata['Name']})
+except Exception:
+    pass
+paths = []
+try:
+    paths = site.getsitepackages()
+except Exception:
+    pass
+purelib = sysconfig.get_paths().get('purelib')
+if purelib and purelib not in paths:
+    paths.append(purelib)
+print(json.dumps({'version': '.'.join(map(str, sys.version_info[:3])), 'prefix': sys.prefix,
+                  'site_packages': [path for path in paths if path], 'packages': packages}))
+'''
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|\s*(\S+)')
+
+
+def env_python(prefix):
+    """The interpreter of the environment at ``prefix``, or None if there is none."""
+    for relative in (('bin', 'python'), ('bin', 'python3'), ('Scripts', 'python.exe'), ('python.exe',)):
+        path = os.path.join(prefix, *relative)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def env_kind(prefix):
+    if os.path.isdir(os.path.join(prefix, 'conda-meta')):
+        return CONDA
+    if os.path.isfile(os.path.join(prefix, 'pyvenv.cfg')):
+        return VENV
+    return None
+
+
+def candidate_interpreters(root):
+    """[(path, kind)] of the Pythons in the workspace ``root`` and the usual install locations.
+
+    Only looks at the file system; nothing is run. Environments inside the workspace come
+    first, so the default for a project is the environment it ships with.
+    """
+    home = os.path.expanduser('~')
+    found = []
+    seen = set()
+    installs = set()  # Real paths of full installs, which PATH may list again under other names
+
+    def add(path, kind):
+        path = os.path.abspath(path)
+        if path in seen:
+            return
+        if kind != VENV:
+            # A venv's python links to the install it was made from, yet is an environment of its own
+            real = os.path.realpath(path)
+            if kind == SYSTEM and real in installs:
+                return
+            installs.add(real)
+        seen.add(path)
+        found.append((path, kind))
+
+    def add_env(prefix, kind=None):
+        kind = kind or env_kind(prefix)
+        path = env_python(prefix) if kind else None
+        if path is not None:
+            add(path, kind)
+
+    if root and os.path.isdir(root):
+        add_env(root)
+        for entry in sorted(os.scandir(root), key=lambda entry: entry.name):
+            if entry.is_dir(follow_symlinks=False):
+                add_env(entry.path)
+    for pattern in ('.virtualenvs/*', '.local/share/virtualenvs/*', '.venvs/*'):
+        for prefix in sorted(glob.glob(os.path.join(home, pattern))):
+            add_env(prefix)
+    conda_prefixes = [os.environ.get('CONDA_PREFIX', '')]
+    for base in [os.path.join(home, name) for name in CONDA_HOMES] + ['/opt/conda']:
+        conda_prefixes.append(base)
+        conda_prefixes.extend(sorted(glob.glob(os.path.join(base, 'envs', '*'))))
+    try:
+        with open(os.path.join(home, '.conda', 'environments.txt'), encoding='utf-8') as file:
+            conda_prefixes.extend(line.strip() for line in file)
+    except OSError:
+        pass
+    for prefix in conda_prefixes:
+        if prefix:
+            add_env(prefix, CONDA if os.path.isdir(os.path.join(prefix, 'conda-meta')) else None)
+    for prefix in sorted(glob.glob(os.path.join(home, '.pyenv', 'versions', '*'))):
+        add_env(prefix, env_kind(prefix) or PYENV)
+    names = ['python3', 'python'] + [f'python3.{minor}' for minor in range(20, 5, -1)]
+    for name in names:
+        path = shutil.which(name)
+        if path:
+            add(path, SYSTEM)
+    if sys.executable:
+        add(sys.executable, env_kind(sys.prefix) or SYSTEM)
+    return found
+
+
+def probe_key(path, site_packages=()):
+    """What a cached probe of ``path`` depends on: the interpreter's and its site-packages' mtimes.
+
+    Installing or removing a package touches site-packages, so its mtime is part of the key.
+    """
+    try:
+        key = [os.stat(path).st_mtime]
+    except OSError:
+        return None
+    for directory in site_packages:
+        try:
+            key.append(os.stat(directory).st_mtime)
+        except OSError:
+            key.append(None)
+    return key
+
+
+def probe_interpreter(path, kind):
+    """Worker: runs ``path`` once to learn its version, prefix, site-packages and packages.
+
+    Returns the cache entry; a broken interpreter gets one with ``version`` None, so it
+    is not run again until it changes.
+    """
+    entry = {'kind': kind, 'version': None, 'prefix': None, 'site_packages': [], 'packages': []}
+    try:
+        # -E: PYTHON* variables of the editor's environment must not leak into the probe
+        result = subprocess.run([path, '-E', '-c', PROBE_SCRIPT], capture_output=True, timeout=PROBE_TIMEOUT,
+                                cwd=os.path.dirname(path))
+        if result.returncode == 0:
+            entry.update(json.loads(result.stdout.decode('utf-8', 'replace').strip().splitlines()[-1]))
+    except (OSError, subprocess.SubprocessError, ValueError, IndexError):
+        pass
+    entry['key'] = probe_key(path, entry['site_packages'])
+    return entry
+
+
+def discover_interpreters(root, probes):
+    """Worker: splits the interpreters found for ``root`` into cached and to-probe.
+
+    ``probes`` is the cache ({path: entry}). Returns ([(path, kind)] found, [(path, kind)]
+    whose cached entry is missing or out of date); only the second list needs running.
+    """
+    found = candidate_interpreters(root)
+    stale = []
+    for path, kind in found:
+        entry = probes.get(path)
+        if entry is None or entry.get('key') != probe_key(path, entry.get('site_packages', ())):
+            stale.append((path, kind))
+    return found, stale
+
+
+def cache_path():
+    return os.path.join(data_dir(), 'interpreters.json')
+
+
+def load_interpreter_cache():
+    """{'probes': {path: entry}, 'selected': {workspace root: path}}, empty if there is no cache yet."""
+    try:
+        with open(cache_path(), encoding='utf-8') as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        cache = {}
+    return {'probes': cache.get('probes', {}), 'selected': cache.get('selected', {})}
+
+
+def save_interpreter_cache(cache):
+    path = cache_path()
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(cache, file)
+    os.replace(temporary, path)
+
+
+def imported_modules(source):
+    """Absolute module names imported anywhere in ``source``, in order; [] if it does not parse."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def import_profile_script(modules):
+    """Source that imports each of ``modules``, carrying on past the ones that fail."""
+    return ('import importlib\n'
+            f'for name in {modules!r}:\n'
+            '    try:\n'
+            '        importlib.import_module(name)\n'
+            '    except Exception as error:\n'
+            '        print(f"could not import {name}: {error!r}")\n')
+
+
+def parse_importtime(output):
+    """[(cumulative µs, self µs, module)] from ``python -X importtime`` output, slowest first."""
+    rows = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, module = match.groups()
+            rows.append((int(cumulative_us), int(self_us), module))
+    rows.sort(key=lambda row: row[0], reverse=True)
+    return rows
@@ -0,0 +1,195 @@
+import ast
+import builtins
+
+from utils.diagnostics import Diagnostic, ERROR, WARNING, INFO
+
+MODULE_NAMES = {'__name__', '__file__', '__doc__', '__builtins__', '__spec__', '__loader__',
+                '__package__', '__path__', '__annotations__', '__dict__', '__debug__'}
+BUILTIN_NAMES = set(dir(builtins)) | MODULE_NAMES
+TERMINATORS = (ast.Return, ast.Raise, ast.Continue, ast.Break)
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+SCOPE_NODES = FUNCTIONS + (ast.ClassDef,) + COMPREHENSIONS
+
+
+def analyze_source(text):
+    """Compiles ``text`` and runs the ast checks; returns a list of Diagnostic for the buffer.
+
+    Runs in a worker process, so it must stay free of Qt imports.
+    """
+    try:
+        tree = ast.parse(text)
+        compile(tree, '<buffer>', 'exec')
+    except SyntaxError as error:
+        return [Diagnostic(None, error.lineno or 1, error.offset, f"{type(error).__name__}: {error.msg}", ERROR, 'lint')]
+    except ValueError as error:  # e.g. source containing null bytes
+        return [Diagnostic(None, 1, None, str(error), ERROR, 'lint')]
+    checker = Checker()
+    checker.check_module(tree)
+    checker.check_unreachable(tree)
+    return sorted(checker.diagnostics, key=lambda d: (d.line, d.column or 0))
+
+
+class Scope:
+    def __init__(self, node, parent, is_class=False):
+        self.node = node
+        self.parent = parent
+        self.is_class = is_class
+        self.bindings = set()
+
+
+def outer_and_inner(node):
+    """Splits a scope-creating node into children evaluated outside and inside its scope."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        args = node.args
+        outer = list(args.defaults) + [d for d in args.kw_defaults if d is not None]
+        if not isinstance(node, ast.Lambda):
+            outer += list(node.decorator_list)
+            outer += [a.annotation for a in args.posonlyargs + args.args + args.kwonlyargs if a.annotation]
+            outer += [a.annotation for a in (args.vararg, args.kwarg) if a is not None and a.annotation]
+            if node.returns:
+                outer.append(node.returns)
+        inner = [node.body] if isinstance(node, ast.Lambda) else list(node.body)
+        return outer, inner
+    if isinstance(node, ast.ClassDef):
+        return list(node.decorator_list) + list(node.bases) + [k.value for k in node.keywords], list(node.body)
+    # Comprehensions: only the first iterable is evaluated in the enclosing scope
+    generators = node.generators
+    inner = [generators[0].target] + list(generators[0].ifs)
+    for generator in generators[1:]:
+        inner += [generator.target, generator.iter] + list(generator.ifs)
+    inner += [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+    return [generators[0].iter], inner
+
+
+def iter_scope(nodes):
+    """Yields every node belonging to the current scope, plus nested scope nodes themselves."""
+    stack = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, SCOPE_NODES):
+            stack.extend(reversed(outer_and_inner(node)[0]))
+        else:
+            stack.extend(reversed(list(ast.iter_child_nodes(node))))
+
+
+def scope_arguments(node):
+    if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        return set()
+    args = node.args
+    names = {a.arg for a in args.posonlyargs + args.args + args.kwonlyargs}
+    names |= {a.arg for a in (args.vararg, args.kwarg) if a is not None}
+    return names
+
+
+class Checker:
+    def __init__(self):
+        self.diagnostics = []
+        self.star_import = False
+        self.imports = {}  # bound name -> import node, for module-level imports
+        self.used = set()
+
+    def report(self, node, message, severity):
+        self.diagnostics.append(Diagnostic(None, node.lineno, node.col_offset + 1, message, severity, 'lint'))
+
+    def collect(self, scope, nodes, module_scope):
+        loads = []
+        nested = []
+        for node in iter_scope(nodes):
+            if isinstance(node, ast.Name):
+                if isinstance(node.ctx, ast.Load):
+                    loads.append(node)
+                    self.used.add(node.id)
+                else:
+                    scope.bindings.add(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                scope.bindings.add(node.name)
+                nested.append(node)
+            elif isinstance(node, SCOPE_NODES):
+                nested.append(node)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    if alias.name == '*':
+                        self.star_import = True
+                        continue
+                    name = alias.asname or alias.name.split('.')[0]
+                    scope.bindings.add(name)
+                    if scope is module_scope and not (isinstance(node, ast.ImportFrom) and node.module == '__future__'):
+                        self.imports.setdefault(name, node)
+            elif isinstance(node, ast.NamedExpr) and isinstance(scope.node, COMPREHENSIONS):
+                # An assignment expression in a comprehension binds in the scope around it
+                target = scope
+                while isinstance(target.node, COMPREHENSIONS):
+                    target = target.parent
+                target.bindings.add(node.target.id)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                scope.bindings.add(node.name)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                scope.bindings.update(node.names)
+                if isinstance(node, ast.Global):
+                    module_scope.bindings.update(node.names)
+            elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+                scope.bindings.add(node.name)
+            elif isinstance(node, ast.MatchMapping) and node.rest:
+                scope.bindings.add(node.rest)
+            elif isinstance(node, ast.Attribute):
+                # Dotted uses of "import a.b" still count as using "a"
+                base = node
+                while isinstance(base, ast.Attribute):
+                    base = base.value
+                if isinstance(base, ast.Name):
+                    self.used.add(base.id)
+        return loads, nested
+
+    def check_module(self, tree):
+        module_scope = Scope(tree, None)
+        pending = [(module_scope, tree.body)]
+        checks = []
+        while pending:
+            scope, nodes = pending.pop()
+            loads, nested = self.collect(scope, nodes, module_scope)
+            checks.append((scope, loads))
+            for node in nested:
+                child = Scope(node, scope, is_class=isinstance(node, ast.ClassDef))
+                child.bindings |= scope_arguments(node)
+                pending.append((child, outer_and_inner(node)[1]))
+        # Bindings are collected for every scope first, so use-before-assignment is not flagged
+        if not self.star_import:
+            for scope, loads in checks:
+                for node in loads:
+                    if not self.resolves(scope, node.id):
+                        self.report(node, f"Undefined name '{node.id}'", WARNING)
+        exported = self.exported_names(tree)
+        for name, node in self.imports.items():
+            if name not in self.used and name not in exported:
+                self.report(node, f"'{name}' imported but unused", INFO)
+
+    def resolves(self, scope, name):
+        current = scope
+        while current is not None:
+            # Class bodies are only visible from the class body itself, not from its methods
+            if name in current.bindings and (current is scope or not current.is_class):
+                return True
+            if name == '__class__' and isinstance(current.node, FUNCTIONS) and current.parent.is_class:
+                return True  # The implicit closure cell of methods (used by super())
+            current = current.parent
+        return name in BUILTIN_NAMES
+
+    def exported_names(self, tree):
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == '__all__' for t in node.targets):
+                if isinstance(node.value, (ast.List, ast.Tuple)):
+                    return {e.value for e in node.value.elts if isinstance(e, ast.Constant) and isinstance(e.value, str)}
+        return set()
+
+    def check_unreachable(self, tree):
+        for node in ast.walk(tree):
+            for field in ('body', 'orelse', 'finalbody'):
+                statements = getattr(node, field, None)
+                if not isinstance(statements, list):
+                    continue
+                for index, statement in enumerate(statements[:-1]):
+                    if isinstance(statement, TERMINATORS):
+                        self.report(statements[index + 1], "Unreachable code", INFO)
+                        break
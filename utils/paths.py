@@ -0,0 +1,28 @@
+import os
+
+
+def data_dir(*parts):
+    """Per-user directory for caches, indexes and recovery data (created on demand).
+
+    ``EZAP_DATA_DIR`` overrides the location, e.g. for benchmarks or a portable install.
+    """
+    base = os.environ.get('EZAP_DATA_DIR') or os.path.join(os.path.expanduser('~'), '.ezap')
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def stale_files(directory):
+    """Files in ``directory`` named '<pid>-…' whose owning editor process has exited."""
+    stale = []
+    for name in os.listdir(directory):
+        pid = name.split('-', 1)[0]
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            stale.append(os.path.join(directory, name))
+        except OSError:
+            pass  # Alive but not ours (or no permission to ask)
+    return stale
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import traceback
+import functools
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, QT_VERSION_STR
+
+from utils.paths import data_dir
+
+MAX_STALLS = 20
+MAX_STACKS = 8  # Stacks sampled per stall; a long stall keeps its first ones
+
+
+class Counter:
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+_counters = {}
+_counters_lock = threading.Lock()  # read_file_state and friends also run on pool threads
+
+
+def record(name, seconds):
+    """Adds one timing of ``seconds`` to the counter ``name``."""
+    with _counters_lock:
+        counter = _counters.get(name)
+        if counter is None:
+            counter = _counters[name] = Counter()
+        counter.count += 1
+        counter.total += seconds
+        if seconds > counter.max:
+            counter.max = seconds
+
+
+def timed(name):
+    """Decorator: records every call of the function under the counter ``name``."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def counters():
+    """{name: (count, total seconds, max seconds)} since the process started."""
+    with _counters_lock:
+        return {name: (counter.count, counter.total, counter.max) for name, counter in _counters.items()}
+
+
+def reports_dir():
+    return data_dir('reports')
+
+
+class StallWatchdog(QObject):
+    """Notices when the GUI thread stops running its event loop, and records what it was doing.
+
+    A timer on the GUI thread stamps a heartbeat every ``interval``; how late each beat
+    arrives is the event-loop latency. A daemon thread checks the heartbeat, and once it is
+    older than ``threshold`` samples the GUI thread's Python stack through
+    ``sys._current_frames()`` for as long as the stall lasts. ``stalled`` is emitted on the
+    GUI thread when the stall ends.
+    """
+    stalled = pyqtSignal(object)  # The stall's record, as in ``stalls``
+
+    def __init__(self, parent=None, threshold=0.25, interval=0.05):
+        super().__init__(parent)
+        self.threshold = threshold
+        self.interval = interval
+        self.gui_thread = threading.get_ident()
+        self.beat = time.monotonic()
+        self.latency = 0.0  # Of the last beat
+        self.max_latency = 0.0  # Since the last ``take_max_latency()``
+        self.stalls = deque(maxlen=MAX_STALLS)
+        self.current = None  # The stall in progress, shared with the watchdog thread
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(interval * 1000))
+        self.timer.timeout.connect(self.heartbeat)
+        self.thread = None
+
+    def start(self):
+        self.beat = time.monotonic()
+        self.timer.start()
+        self.thread = threading.Thread(target=self.watch, name='stall-watchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.stopped.set()
+
+    def heartbeat(self):
+        now = time.monotonic()
+        with self.lock:
+            self.latency = max(0.0, now - self.beat - self.interval)
+            self.max_latency = max(self.max_latency, self.latency)
+            self.beat = now
+            stall, self.current = self.current, None
+            if stall is not None:
+                stall['duration'] = self.latency + self.interval
+        if stall is not None:
+            self.stalled.emit(stall)
+
+    def take_max_latency(self):
+        with self.lock:
+            latency, self.max_latency = self.max_latency, 0.0
+        return latency
+
+    def watch(self):
+        # Sample a long stall about once per threshold, so it yields a handful of stacks
+        next_sample = 0.0
+        while not self.stopped.wait(self.interval):
+            now = time.monotonic()
+            with self.lock:
+                late = now - self.beat
+                if late < self.threshold or now < next_sample:
+                    continue
+                if self.current is None:
+                    self.current = {'time': time.time() - late, 'duration': late, 'where': '', 'stacks': []}
+                    self.stalls.append(self.current)
+                stall = self.current
+            # Only code positions are taken: holding the frames would keep their locals (e.g. an
+            # active QPainter) alive after the GUI thread has returned from them
+            frame = sys._current_frames().get(self.gui_thread)
+            positions = []
+            while frame is not None:
+                positions.append(traceback.FrameSummary(frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name))
+                frame = frame.f_back
+            positions.reverse()
+            stack = ''.join(traceback.format_list(positions))
+            with self.lock:
+                stall['duration'] = late
+                if positions and not stall['where']:
+                    innermost = positions[-1]
+                    stall['where'] = f"{innermost.name} ({os.path.basename(innermost.filename)}:{innermost.lineno})"
+                if len(stall['stacks']) < MAX_STACKS:
+                    stall['stacks'].append({'after': round(late, 3), 'stack': stack})
+            next_sample = now + self.threshold
+
+    def report(self):
+        with self.lock:
+            stalls = [dict(stall, stacks=list(stall['stacks'])) for stall in self.stalls]
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'qt': QT_VERSION_STR,
+            'platform': platform.platform(),
+            'stall_threshold': self.threshold,
+            'event_loop_latency': self.latency,
+            'counters': {name: {'count': count, 'total': total, 'max': longest}
+                         for name, (count, total, longest) in sorted(counters().items())},
+            'stalls': stalls,
+        }
+
+    def dump(self, path=None):
+        """Writes ``report()`` as JSON (by default to a new file in ``reports_dir()``); returns the path."""
+        if path is None:
+            path = os.path.join(reports_dir(), f"perf-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json")
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=2)
+        return path
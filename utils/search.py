@@ -0,0 +1,125 @@
+import mmap
+import os
+import re
+import tempfile
+from collections import namedtuple
+
+from utils.workspace import iter_files
+
+SearchSpec = namedtuple('SearchSpec', ['pattern', 'regex', 'case_sensitive', 'whole_word'])
+# 1-based line and column of a match, its length in characters and the text of its line
+Match = namedtuple('Match', ['line', 'column', 'length', 'text'])
+
+BINARY_SNIFF_BYTES = 8192
+MAX_FILE_BYTES = 20 * 1024 * 1024
+MAX_MATCHES_PER_FILE = 1000
+MAX_LINE_PREVIEW = 300
+
+
+def compile_spec(spec, binary=True):
+    """Compiles ``spec`` to a bytes pattern (for files) or a str pattern (for editor buffers).
+
+    Workspace search and replace both use the bytes form, so Replace All changes exactly
+    the matches the search listed.
+    """
+    pattern = spec.pattern if spec.regex else re.escape(spec.pattern)
+    if spec.whole_word:
+        pattern = rf'\b(?:{pattern})\b'
+    flags = re.MULTILINE | (0 if spec.case_sensitive else re.IGNORECASE)
+    return re.compile(pattern.encode('utf-8') if binary else pattern, flags)
+
+
+def search_file(path, compiled):
+    """Scans one file through a memory map; returns a list of Match (empty for binary files)."""
+    try:
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0 or size > MAX_FILE_BYTES:
+                return []
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data.find(b'\0', 0, BINARY_SNIFF_BYTES) != -1:
+                    return []
+                matches = []
+                line = 1
+                counted_to = 0
+                for found in compiled.finditer(data):
+                    start = found.start()
+                    line += data[counted_to:start].count(b'\n')
+                    counted_to = start
+                    line_start = data.rfind(b'\n', 0, start) + 1
+                    line_end = data.find(b'\n', start)
+                    if line_end == -1:
+                        line_end = len(data)
+                    text = data[line_start:min(line_end, line_start + MAX_LINE_PREVIEW)].decode('utf-8', 'replace')
+                    column = len(data[line_start:start].decode('utf-8', 'replace')) + 1
+                    length = len(found.group().decode('utf-8', 'replace'))
+                    matches.append(Match(line, column, length, text.rstrip('\r')))
+                    if len(matches) >= MAX_MATCHES_PER_FILE:
+                        break
+                return matches
+    except (OSError, ValueError):
+        return []
+
+
+def search_files(paths, spec):
+    """Worker: searches ``paths``; returns [(path, [Match, ...]), ...] for files with matches."""
+    compiled = compile_spec(spec)
+    results = []
+    for path in paths:
+        matches = search_file(path, compiled)
+        if matches:
+            results.append((path, matches))
+    return results
+
+
+def replace_in_files(paths, spec, replacement):
+    """Replaces every match in ``paths``; returns ({path: replacement count}, [skipped path]).
+
+    Files that can no longer be read or are not UTF-8 are skipped, since the UTF-8
+    replacement would corrupt them. All new contents are written to temporary files next
+    to their originals first and only then renamed over them, so a failure part-way
+    leaves every file untouched.
+    """
+    compiled = compile_spec(spec)
+    if not spec.regex:
+        replacement = replacement.replace('\\', '\\\\')
+    replacement = replacement.encode('utf-8')
+    staged = []
+    counts = {}
+    skipped = []
+    try:
+        for path in paths:
+            try:
+                with open(path, 'rb') as file:
+                    data = file.read()
+                data.decode('utf-8')
+            except (OSError, UnicodeDecodeError):
+                skipped.append(path)
+                continue
+            new_data, count = compiled.subn(replacement, data)
+            if not count:
+                continue
+            mode = os.stat(path).st_mode
+            handle, temp_path = tempfile.mkstemp(prefix='.ezap-', suffix='.tmp', dir=os.path.dirname(path))
+            staged.append((temp_path, path))
+            with os.fdopen(handle, 'wb') as file:
+                file.write(new_data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.chmod(temp_path, mode)
+            counts[path] = count
+    except BaseException:
+        for temp_path, _path in staged:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+        raise
+    for temp_path, path in staged:
+        os.replace(temp_path, path)
+    return counts, skipped
+
+
+def workspace_files(root):
+    """Worker: every searchable file below ``root``, honouring the default excludes and .gitignore."""
+    return [path for path, _mtime, _size in iter_files(root, extensions=None, respect_gitignore=True)]
@@ -0,0 +1,45 @@
+import os
+import json
+
+from utils.paths import data_dir
+
+
+def session_path():
+    return os.path.join(data_dir(), 'session.json')
+
+
+def load_session():
+    """The last saved session, or None if there is none (or it cannot be read)."""
+    try:
+        with open(session_path(), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def initial_workspace_root(paths=()):
+    """The workspace to start in, given the files and folders ``paths`` to open.
+
+    A folder among ``paths`` wins. Otherwise the last session's root is kept if it holds
+    the first file (or if there is none); failing that the file's own folder is used,
+    and the working directory only when nothing else applies.
+    """
+    paths = [os.path.abspath(path) for path in paths]
+    for path in paths:
+        if os.path.isdir(path):
+            return path
+    session = load_session() or {}
+    root = session.get('workspace_root')
+    root = os.path.abspath(root) if root and os.path.isdir(root) else None
+    if paths and not (root and paths[0].startswith(root + os.sep)) and os.path.isdir(os.path.dirname(paths[0])):
+        return os.path.dirname(paths[0])
+    return root or os.getcwd()
+
+
+def save_session(session):
+    # Written aside and moved into place, so a crash mid-write keeps the previous session
+    path = session_path()
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(session, file)
+    os.replace(temporary, path)
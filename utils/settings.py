@@ -0,0 +1,41 @@
+from PyQt5.QtCore import QSettings
+
+# Every tunable the editor reads lives here so defaults are documented in one place
+DEFAULTS = {
+    'jobs/max_concurrent': 4,
+    'jobs/output_buffer_bytes': 2 * 1024 * 1024,
+    'jobs/sync_timeout_ms': 30000,
+    'output/max_lines': 20000,
+    'explorer/name_filters': ['*.py'],
+    'explorer/excludes': [],  # Directory names hidden on top of utils.workspace.DEFAULT_EXCLUDES
+    'explorer/max_loaded_dirs': 256,
+    'documents/memory_budget_mb': 256,  # Least recently used background tabs are unloaded beyond this
+    'undo/memory_budget_mb': 16,  # Per document; older undo steps spill to disk beyond this
+    'undo/disk_budget_mb': 256,  # Per document; the oldest undo steps are dropped beyond this
+    'editor/long_line_chars': 10000,  # Files with a longer line open truncated, without wrapping
+    'editor/minimap': True,
+    'diff/base': 'disk',  # The gutter marks changes against the saved file ('disk') or git HEAD ('head')
+    'perf/stall_watchdog': True,
+    'perf/stall_threshold_ms': 250,  # GUI-thread stalls longer than this are logged with the thread's stack
+}
+
+
+def settings():
+    return QSettings('EZap', 'EZap Editor')
+
+
+def get_setting(key):
+    default = DEFAULTS[key]
+    value = settings().value(key, default)
+    # QSettings hands back strings from ini/registry backends; coerce to the default's type
+    if isinstance(default, bool):
+        return value in (True, 'true', '1', 1)
+    if isinstance(default, list) and isinstance(value, str):
+        return [value]  # Single-item lists come back as a bare string
+    if isinstance(default, (list, dict)) or value is None:
+        return value if value is not None else default
+    return type(default)(value)
+
+
+def set_setting(key, value):
+    settings().setValue(key, value)
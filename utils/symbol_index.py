@@ -0,0 +1,237 @@
+import ast
+import hashlib
+import itertools
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.paths import data_dir
+from utils.workspace import iter_directories, iter_files
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    container TEXT
+);
+CREATE INDEX IF NOT EXISTS symbols_name_lower ON symbols (name_lower);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+"""
+# Files per worker task; small enough to keep all workers busy, large enough to amortise pickling
+PARSE_BATCH = 32
+# Below this many changed files a process pool costs more than it saves
+POOL_THRESHOLD = 64
+# File system watches per workspace; inotify's per-user limit is as low as 8192 on some systems
+WATCH_LIMIT = 4096
+
+
+def database_path(root):
+    key = hashlib.sha1(os.path.abspath(root).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(data_dir('index'), f"{key}.sqlite")
+
+
+def file_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def collect_symbols(tree):
+    """(name, kind, line, col, container) for classes, functions, methods and assignments."""
+    symbols = []
+    stack = [(node, None) for node in tree.body]
+    while stack:
+        node, container = stack.pop()
+        if isinstance(node, ast.ClassDef):
+            symbols.append((node.name, 'class', node.lineno, node.col_offset, container))
+            stack.extend((child, node.name) for child in node.body)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            kind = 'method' if container else 'function'
+            symbols.append((node.name, kind, node.lineno, node.col_offset, container))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                for name in ast.walk(target):
+                    if isinstance(name, ast.Name):
+                        symbols.append((name.id, 'variable', name.lineno, name.col_offset, container))
+        elif isinstance(node, (ast.If, ast.Try, ast.With)):
+            # Definitions guarded by "if TYPE_CHECKING", try/except ImportError and the like
+            children = list(node.body) + list(getattr(node, 'orelse', [])) + list(getattr(node, 'finalbody', []))
+            for handler in getattr(node, 'handlers', []):
+                children.extend(handler.body)
+            stack.extend((child, container) for child in children)
+    return symbols
+
+
+def parse_files(entries):
+    """Worker: for each (path, known_hash) returns (path, hash, symbols or None if unchanged)."""
+    results = []
+    for path, known_hash in entries:
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            continue
+        digest = file_hash(data)
+        if digest == known_hash:
+            results.append((path, digest, None))  # Touched but identical: nothing to re-parse
+            continue
+        try:
+            symbols = collect_symbols(ast.parse(data))
+        except (SyntaxError, ValueError):
+            symbols = []
+        results.append((path, digest, symbols))
+    return results
+
+
+class SymbolDatabase:
+    def __init__(self, path, readonly=False):
+        if readonly:
+            # Searches only read; they never wait on the indexer's write lock
+            self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=10)
+            return
+        self.connection = sqlite3.connect(path, timeout=10)
+        # WAL lets the GUI query while the indexer thread writes
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def file_states(self):
+        return {path: (mtime, size, digest) for path, mtime, size, digest in
+                self.connection.execute('SELECT path, mtime_ns, size, hash FROM files')}
+
+    def store(self, path, mtime_ns, size, digest, symbols):
+        if symbols is not None:
+            self.connection.execute('DELETE FROM symbols WHERE path = ?', (path,))
+            self.connection.executemany(
+                'INSERT INTO symbols (name, name_lower, kind, path, line, col, container) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(name, name.lower(), kind, path, line, col, container) for name, kind, line, col, container in symbols])
+        self.connection.execute('INSERT OR REPLACE INTO files (path, mtime_ns, size, hash) VALUES (?, ?, ?, ?)',
+                                (path, mtime_ns, size, digest))
+
+    def remove(self, paths):
+        self.connection.executemany('DELETE FROM symbols WHERE path = ?', [(path,) for path in paths])
+        self.connection.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in paths])
+
+    def commit(self):
+        self.connection.commit()
+
+    def search(self, query, limit=200):
+        """Prefix matches first (index range scan), then substring matches to fill up."""
+        query = query.lower()
+        columns = 'SELECT name, kind, path, line, col, container FROM symbols'
+        if not query:
+            return []
+        rows = self.connection.execute(
+            f'{columns} WHERE name_lower >= ? AND name_lower < ? ORDER BY length(name), name LIMIT ?',
+            (query, query + '￿', limit)).fetchall()
+        if len(rows) < limit:
+            escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            rows += self.connection.execute(
+                f"{columns} WHERE name_lower LIKE ? ESCAPE '\\' AND name_lower NOT LIKE ? ESCAPE '\\' LIMIT ?",
+                (f'%{escaped}%', f'{escaped}%', limit - len(rows))).fetchall()
+        return rows
+
+    def paths(self):
+        return [path for (path,) in self.connection.execute('SELECT path FROM files')]
+
+    def definitions(self, name):
+        return self.connection.execute(
+            "SELECT name, kind, path, line, col, container FROM symbols WHERE name_lower = ? AND name = ? "
+            "ORDER BY kind = 'variable', path", (name.lower(), name)).fetchall()
+
+
+def search_symbols(db_path, query, limit=200):
+    """Worker: ``SymbolDatabase.search`` on a read-only connection of its own.
+
+    The substring fallback scans the whole table, which takes tens of milliseconds on a
+    large workspace; SQLite releases the GIL meanwhile, so the GUI thread keeps running.
+    """
+    database = SymbolDatabase(db_path, readonly=True)
+    try:
+        return database.search(query, limit)
+    finally:
+        database.close()
+
+
+def sync_index(root, db_path, paths=None, directories=()):
+    """Brings the index for ``root`` up to date; returns (parsed, unchanged, removed) counts.
+
+    Files whose mtime and size match the index are skipped without being read; files
+    whose content hash still matches are only re-stamped. ``paths`` and ``directories``
+    limit the sync to those files (e.g. after a save) and to the files under those
+    directories (e.g. after files appeared or vanished there). Runs on a worker thread
+    with its own connection.
+    """
+    database = SymbolDatabase(db_path)
+    try:
+        known = database.file_states()
+        if paths is None and not directories:
+            current = {path: (mtime, size) for path, mtime, size in iter_files(root)}
+            removed = [path for path in known if path not in current]
+        else:
+            current = {}
+            removed = []
+            for directory in directories:
+                current.update((path, (mtime, size)) for path, mtime, size in iter_files(directory))
+                removed.extend(path for path in known if path.startswith(directory + os.sep) and path not in current)
+            for path in paths or ():
+                try:
+                    stat = os.stat(path)
+                    current[path] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    if path in known:
+                        removed.append(path)
+        stale = [(path, known[path][2] if path in known else None) for path, (mtime, size) in current.items()
+                 if path not in known or known[path][:2] != (mtime, size)]
+
+        batches = [stale[i:i + PARSE_BATCH] for i in range(0, len(stale), PARSE_BATCH)]
+        if len(stale) >= POOL_THRESHOLD:
+            with ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = pool.map(parse_files, batches)
+                parsed = store_results(database, current, results)
+        else:
+            parsed = store_results(database, current, map(parse_files, batches))
+        database.remove(removed)
+        database.commit()
+        return parsed, len(current) - parsed, len(removed)
+    finally:
+        database.close()
+
+
+def watch_paths(root, db_path, limit=WATCH_LIMIT):
+    """Worker: the directories of ``root`` and, while they fit in ``limit``, its indexed files.
+
+    Watching the directories catches files created, deleted or replaced by a rename, which
+    is how most tools save; watching the files as well catches writes in place.
+    """
+    directories = [root] + list(itertools.islice(iter_directories(root), limit - 1))
+    database = SymbolDatabase(db_path, readonly=True)
+    try:
+        files = database.paths()
+    finally:
+        database.close()
+    return directories, files[:limit - len(directories)]
+
+
+def store_results(database, current, results):
+    parsed = 0
+    for batch in results:
+        for path, digest, symbols in batch:
+            mtime, size = current[path]
+            database.store(path, mtime, size, digest, symbols)
+            parsed += symbols is not None
+        database.commit()
+    return parsed
@@ -0,0 +1,105 @@
+from bisect import bisect_left
+from difflib import SequenceMatcher
+
+
+def line_edits(old, new):
+    """Worker: line replacements turning the ``old`` line list into ``new``.
+
+    Returns (first, old_count, new_lines) tuples in ascending order, with ``first``
+    relative to ``old``. The common head and tail are trimmed first, so the usual small
+    external change costs little; the rest is a patience diff (``diff_hunks``), which
+    stays fast on large rewrites where SequenceMatcher alone goes quadratic.
+    """
+    head = 0
+    limit = min(len(old), len(new))
+    while head < limit and old[head] == new[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and old[len(old) - 1 - tail] == new[len(new) - 1 - tail]:
+        tail += 1
+    old_middle = old[head:len(old) - tail]
+    new_middle = new[head:len(new) - tail]
+    if not old_middle and not new_middle:
+        return []
+    if not old_middle or not new_middle:
+        return [(head, len(old_middle), new_middle)]
+    return [(head + old_start, old_count, new_middle[new_start:new_start + new_count])
+            for old_start, old_count, new_start, new_count in diff_hunks(old_middle, new_middle)]
+
+
+def diff_hunks(old, new):
+    """Worker: the changed regions between two sequences, as (old_start, old_count, new_start, new_count).
+
+    Items only need equality (the gutter diffs line hashes). Patience diff: items that
+    occur exactly once on both sides anchor the alignment, the longest run of anchors in
+    order splits the problem, and stretches with no such items fall back to
+    SequenceMatcher. Hunks come back sorted and never adjacent.
+    """
+    hunks = []
+    stack = [(0, len(old), 0, len(new))]
+    while stack:
+        old_lo, old_hi, new_lo, new_hi = stack.pop()
+        while old_lo < old_hi and new_lo < new_hi and old[old_lo] == new[new_lo]:
+            old_lo += 1
+            new_lo += 1
+        while old_lo < old_hi and new_lo < new_hi and old[old_hi - 1] == new[new_hi - 1]:
+            old_hi -= 1
+            new_hi -= 1
+        if old_lo == old_hi or new_lo == new_hi:
+            if old_lo < old_hi or new_lo < new_hi:
+                hunks.append((old_lo, old_hi - old_lo, new_lo, new_hi - new_lo))
+            continue
+        anchors = unique_anchors(old, old_lo, old_hi, new, new_lo, new_hi)
+        if not anchors:
+            matcher = SequenceMatcher(None, old[old_lo:old_hi], new[new_lo:new_hi], autojunk=False)
+            hunks.extend((old_lo + i1, i2 - i1, new_lo + j1, j2 - j1)
+                         for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal')
+            continue
+        # Each stretch between consecutive anchors is diffed on its own
+        previous_old, previous_new = old_lo, new_lo
+        for old_index, new_index in anchors:
+            stack.append((previous_old, old_index, previous_new, new_index))
+            previous_old, previous_new = old_index + 1, new_index + 1
+        stack.append((previous_old, old_hi, previous_new, new_hi))
+    hunks.sort()
+    merged = []
+    for hunk in hunks:
+        if merged and merged[-1][0] + merged[-1][1] == hunk[0] and merged[-1][2] + merged[-1][3] == hunk[2]:
+            last = merged.pop()
+            hunk = (last[0], last[1] + hunk[1], last[2], last[3] + hunk[3])
+        merged.append(hunk)
+    return merged
+
+
+def unique_anchors(old, old_lo, old_hi, new, new_lo, new_hi):
+    """Longest in-order run of (old index, new index) pairs of items unique to both ranges."""
+    counts = {}
+    for index in range(old_lo, old_hi):
+        entry = counts.get(old[index])
+        counts[old[index]] = [index, None] if entry is None else [None, None]
+    for index in range(new_lo, new_hi):
+        entry = counts.get(new[index])
+        if entry is not None and entry[0] is not None:
+            # A second occurrence on the new side disqualifies the item
+            entry[1] = index if entry[1] is None else -1
+    pairs = sorted((new_index, old_index) for old_index, new_index in counts.values()
+                   if old_index is not None and new_index is not None and new_index >= 0)
+    # Longest increasing subsequence of old indexes (patience sorting)
+    tops, top_olds, links = [], [], {}
+    for new_index, old_index in pairs:
+        pair = (old_index, new_index)
+        position = bisect_left(top_olds, old_index)
+        links[pair] = tops[position - 1] if position else None
+        if position == len(tops):
+            tops.append(pair)
+            top_olds.append(old_index)
+        else:
+            tops[position] = pair
+            top_olds[position] = old_index
+    run = []
+    pair = tops[-1] if tops else None
+    while pair is not None:
+        run.append(pair)
+        pair = links[pair]
+    run.reverse()
+    return run
@@ -0,0 +1,146 @@
+import os
+import re
+
+from utils.diagnostics import Diagnostic, ERROR, INFO
+
+FRAME_RE = re.compile(r'^\s*File "(?P<path>.+)", line (?P<line>\d+)(?:, in (?P<func>.+))?\s*$')
+EXCEPTION_RE = re.compile(r'^(?P<type>[A-Za-z_][\w.]*)(?::\s?(?P<message>.*))?$')
+CARET_RE = re.compile(r'^\s*[~^]+\s*$')
+CHAIN_MARKERS = {
+    'During handling of the above exception, another exception occurred:': 'context',
+    'The above exception was the direct cause of the following exception:': 'cause',
+}
+TRACEBACK_HEADER = 'Traceback (most recent call last):'
+
+
+class Frame:
+    def __init__(self, path, line, function=None):
+        self.path = path
+        self.line = line
+        self.function = function
+        self.source = None
+        self.column = None  # Only known when Python printed a caret under the source line
+
+
+class Traceback:
+    def __init__(self, chained=None):
+        self.frames = []
+        self.exception_type = None
+        self.message = ''
+        self.chained = chained  # 'cause' / 'context' when linked to the previous traceback
+
+    def innermost(self):
+        return self.frames[-1] if self.frames else None
+
+    def innermost_in_buffer(self):
+        for frame in reversed(self.frames):
+            if frame.path is None:
+                return frame
+        return None
+
+    def summary(self):
+        return f"{self.exception_type}: {self.message}" if self.message else self.exception_type
+
+
+class TracebackParser:
+    """Incrementally recognises Python tracebacks in streamed process output.
+
+    ``feed`` takes arbitrary chunks and returns the tracebacks completed by them; only the
+    unfinished last line is carried over, so the console is never rescanned. ``path_map``
+    maps paths as printed (e.g. the temp file written by run_code) to the paths they stand
+    for; mapping to None marks the editor buffer.
+    """
+
+    def __init__(self, path_map=None):
+        self.path_map = {self.normalize(path): target for path, target in (path_map or {}).items()}
+        self.partial = ''
+        self.current = None
+        self.pending_chain = None
+
+    @staticmethod
+    def normalize(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def map_path(self, path):
+        return self.path_map.get(self.normalize(path), path)
+
+    def feed(self, chunk):
+        lines = (self.partial + chunk).split('\n')
+        self.partial = lines.pop()
+        completed = []
+        for line in lines:
+            traceback = self.feed_line(line.rstrip('\r'))
+            if traceback is not None:
+                completed.append(traceback)
+        return completed
+
+    def finish(self):
+        # Flush an unterminated last line once the process has exited
+        completed = self.feed(self.partial + '\n') if self.partial else []
+        self.current = None
+        return completed
+
+    def feed_line(self, line):
+        if line == TRACEBACK_HEADER:
+            self.current = Traceback(self.pending_chain)
+            self.pending_chain = None
+            return None
+        if line in CHAIN_MARKERS:
+            self.pending_chain = CHAIN_MARKERS[line]
+            return None
+
+        frame_match = FRAME_RE.match(line)
+        if frame_match:
+            # Compile errors of the main script are printed without a traceback header
+            if self.current is None:
+                self.current = Traceback(self.pending_chain)
+                self.pending_chain = None
+            frame = Frame(self.map_path(frame_match.group('path')), int(frame_match.group('line')),
+                          frame_match.group('func'))
+            self.current.frames.append(frame)
+            return None
+
+        if self.current is None:
+            return None
+        if line.startswith((' ', '\t')):
+            frame = self.current.frames[-1] if self.current.frames else None
+            if frame is None:
+                return None
+            if CARET_RE.match(line) and frame.source is not None:
+                # The source line is printed dedented after four spaces; carets line up with it
+                frame.column = line.index(line.strip()[0]) - 4 + 1
+            elif frame.source is None:
+                frame.source = line.strip()
+            return None
+
+        exception_match = EXCEPTION_RE.match(line)
+        if exception_match and self.current.frames:
+            traceback = self.current
+            traceback.exception_type = exception_match.group('type')
+            traceback.message = exception_match.group('message') or ''
+            self.current = None
+            return traceback
+        # Something unrelated interrupted the traceback (e.g. interleaved program output)
+        if not line.strip():
+            return None
+        self.current = None
+        return None
+
+
+def traceback_diagnostics(traceback, source='run'):
+    """Converts a traceback into diagnostics, innermost frame first.
+
+    The innermost frame and the innermost frame in the editor buffer are errors; the
+    rest of the call chain is informational.
+    """
+    diagnostics = []
+    buffer_frame = traceback.innermost_in_buffer()
+    for index, frame in enumerate(reversed(traceback.frames)):
+        if index == 0 or frame is buffer_frame:
+            diagnostics.append(Diagnostic(frame.path, frame.line, frame.column, traceback.summary(), ERROR, source))
+        else:
+            message = f"called from here ({traceback.exception_type})"
+            if frame.function:
+                message = f"in {frame.function}: {message}"
+            diagnostics.append(Diagnostic(frame.path, frame.line, frame.column, message, INFO, source))
+    return diagnostics
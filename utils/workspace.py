@@ -0,0 +1,140 @@
+import os
+import re
+import fnmatch
+
+# Directory names never worth descending into when scanning a workspace
+DEFAULT_EXCLUDES = {
+    '.git', '.hg', '.svn', '__pycache__', '.venv', 'venv', 'env', 'node_modules', '.tox', '.nox',
+    '.mypy_cache', '.pytest_cache', '.ruff_cache', '.eggs', 'build', 'dist', '.idea', '.vscode',
+}
+
+
+class GitIgnore:
+    """The subset of .gitignore semantics that matters for skipping files.
+
+    Supports comments, negation (``!``), directory-only patterns (trailing ``/``),
+    anchored patterns (containing ``/``) and ``**``. Each instance holds the patterns of
+    one .gitignore file; ``parent`` chains to the .gitignore files above it.
+    """
+
+    def __init__(self, base, lines=(), parent=None):
+        self.base = base
+        self.parent = parent
+        self.rules = []
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            directory_only = line.endswith('/')
+            line = line.rstrip('/')
+            anchored = '/' in line  # A leading or inner slash anchors to this .gitignore's directory
+            self.rules.append((self.compile(line.lstrip('/'), anchored), negate, directory_only))
+
+    @staticmethod
+    def compile(pattern, anchored):
+        parts = []
+        for segment in re.split(r'(\*\*/?)', pattern):
+            if segment.startswith('**'):
+                parts.append('(?:.*/)?' if segment.endswith('/') else '.*')
+            elif segment:
+                # fnmatch's translation lets '*' cross '/', which .gitignore doesn't allow
+                parts.append(fnmatch.translate(segment)[4:-3].replace('.*', '[^/]*'))
+        body = ''.join(parts)
+        return re.compile(('^' if anchored else '^(?:.*/)?') + body + '$')
+
+    @classmethod
+    def load(cls, directory, parent=None):
+        path = os.path.join(directory, '.gitignore')
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as file:
+                return cls(directory, file.readlines(), parent)
+        except OSError:
+            return parent
+
+    def ignored(self, path, is_dir):
+        verdict = self.parent.ignored(path, is_dir) if self.parent is not None else False
+        relative = os.path.relpath(path, self.base).replace(os.sep, '/')
+        for pattern, negate, directory_only in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if pattern.match(relative):
+                verdict = not negate
+        return verdict
+
+
+def iter_files(root, extensions=('.py',), excludes=DEFAULT_EXCLUDES, respect_gitignore=False):
+    """Yields (path, mtime_ns, size) for files under ``root`` with one of ``extensions``.
+
+    ``extensions=None`` yields every file. Uses os.scandir so the stat information comes
+    from the directory listing where the platform provides it.
+    """
+    stack = [(root, GitIgnore.load(root) if respect_gitignore else None)]
+    while stack:
+        directory, ignore = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in excludes or entry.name.endswith('.egg-info'):
+                        continue
+                    if ignore is not None and ignore.ignored(entry.path, True):
+                        continue
+                    stack.append((entry.path, GitIgnore.load(entry.path, ignore) if respect_gitignore else None))
+                elif (extensions is None or entry.name.endswith(extensions)) and entry.is_file():
+                    if ignore is not None and ignore.ignored(entry.path, False):
+                        continue
+                    stat = entry.stat()
+                    yield entry.path, stat.st_mtime_ns, stat.st_size
+            except OSError:
+                continue
+
+
+def iter_directories(root, excludes=DEFAULT_EXCLUDES):
+    """Yields the directories under ``root`` that ``iter_files`` descends into, shallowest first."""
+    queue = [root]
+    for directory in queue:
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if (entry.is_dir(follow_symlinks=False) and entry.name not in excludes
+                        and not entry.name.endswith('.egg-info')):
+                    queue.append(entry.path)
+                    yield entry.path
+            except OSError:
+                continue
+
+
+def list_directory(directory, parent_ignore=None, excludes=DEFAULT_EXCLUDES, patterns=None):
+    """Lists one directory for the explorer; returns (GitIgnore for it, [(name, is_dir), ...]).
+
+    Directories come first, then files, each sorted case-insensitively. Files are kept only
+    if they match one of the fnmatch ``patterns`` (all files when None). Raises OSError if
+    the directory can't be read.
+    """
+    ignore = GitIgnore.load(directory, parent_ignore)
+    entries = []
+    with os.scandir(directory) as scanner:
+        for entry in scanner:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name in excludes or entry.name.endswith('.egg-info'):
+                    continue
+            elif patterns and not any(fnmatch.fnmatch(entry.name, pattern) for pattern in patterns):
+                continue
+            if ignore is not None and ignore.ignored(entry.path, is_dir):
+                continue
+            entries.append((entry.name, is_dir))
+    entries.sort(key=lambda item: (not item[1], item[0].lower()))
+    return ignore, entries